@@ -0,0 +1,47 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+# Native single-sweep curvature against the fused lazy expressions of
+# `curv`, with and without a histogram, in single precision. Run from the
+# repository root:
+#
+#     python -m bench.curvature
+
+import numpy as np
+from timeit import default_timer as timer
+from field.basefield import Precision
+from field.cascade import Cascade3D
+from field.stencils import stencils
+
+repeat = 3
+
+
+def timeit(func):
+    func()
+    start = timer()
+    for _ in range(repeat):
+        func()
+    return (timer() - start) / repeat
+
+
+native = stencils.supported
+edges = np.geomspace(1e-2, 1e4, 100)
+for n in (128, 256):
+    field = Cascade3D("B", n, precision=Precision.SINGLE, wisdom_path="wisdom")
+    field.res[:] = np.random.default_rng(0).standard_normal(field.res.shape)
+    print(f"grid size {n}^3, {field.num_threads} threads")
+    for name, func in (
+        ("curv", lambda field=field: field.curv("e")),
+        ("histogram", lambda field=field: field.curv_histogram(edges)),
+    ):
+        stencils.supported = lambda *arrays: False
+        t_old = timeit(func)
+        stencils.supported = native
+        t_new = timeit(func)
+        print(
+            f"  {name:10s} lazy: {t_old:7.3f} s  native: {t_new:7.3f} s"
+            f"  speedup: {t_old/t_new:5.2f}"
+        )
+    del field
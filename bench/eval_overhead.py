@@ -0,0 +1,46 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+# Per-call overhead of `BaseField._eval` at small grid sizes, where the
+# string based `ne.evaluate` path (validation, name lookup, cache-key
+# hashing) dominates. Run from the repository root:
+#
+#     python -m bench.eval_overhead
+
+import numexpr_erf as ne
+from timeit import default_timer as timer
+from field.cascade import Cascade3D
+
+repeat = 200
+exprs = [
+    ("g*(scale*n)**dim*exp(-(kx**2+ky**2+kz**2)*scale**2)", {"scale": 0.1}, "g"),
+    ("exp(omega)*(sin(cos_theta)*cos(phi))", {}, "f"),
+    ("omega+f", {}, "omega"),
+    ("sum(cos_theta**2)", {}, None),
+]
+
+for n in (32, 48, 64):
+    field = Cascade3D("B", n, wisdom_path="wisdom", num_threads=1)
+    print(f"grid size {n}^3")
+    for expr, extra, out in exprs:
+        out_arr = field._variables[out] if out else None
+
+        start = timer()
+        for _ in range(repeat):
+            ne.evaluate(
+                expr, field._variables | extra, out=out_arr, casting="same_kind"
+            )
+        t_eval = (timer() - start) / repeat
+
+        field._eval(expr, extra, out=out)
+        start = timer()
+        for _ in range(repeat):
+            field._eval(expr, extra, out=out)
+        t_kernel = (timer() - start) / repeat
+
+        print(
+            f"  {expr[:40]:40s} evaluate: {1e6*t_eval:8.1f} us"
+            f"  kernel: {1e6*t_kernel:8.1f} us  speedup: {t_eval/t_kernel:5.2f}"
+        )
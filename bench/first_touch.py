@@ -0,0 +1,60 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+# Memory bandwidth of a threaded numexpr pass over field sized buffers,
+# allocated by the main thread or placed by parallel first touch. Compare
+# one and two sockets by pinning the threads, e.g. on a node with 2x32 cores
+#
+#     SYNTH_MAG_TURB_CORES=0-31 SYNTH_MAG_TURB_BIND=close python -m bench.first_touch
+#     SYNTH_MAG_TURB_CORES=0-63 SYNTH_MAG_TURB_BIND=spread python -m bench.first_touch
+
+import numpy as np
+import numexpr_erf as ne
+from pathlib import Path
+from timeit import default_timer as timer
+from field.first_touch import first_touch
+from field.utils import threads
+
+repeat = 10
+n = 512
+shape = (n, n, n)
+
+
+def sockets(cores):
+    topology = "/sys/devices/system/cpu/cpu{}/topology/physical_package_id"
+    try:
+        return len({Path(topology.format(core)).read_text() for core in cores})
+    except OSError:
+        return 1
+
+
+def bandwidth(alloc):
+    a, b, c = (alloc() for _ in range(3))
+    # written by the main thread, as field buffers are by `np.zeros` and
+    # the serial parts of the code; pages already placed do not move
+    a[...] = 1
+    b[...] = 2
+    nex = ne.NumExpr("a + 2*b", [("a", np.float64), ("b", np.float64)])
+    kwargs = dict(out=c, num_threads=min(nt, ne.MAX_THREADS), ex_uses_vml=False)
+    nex(a, b, **kwargs)
+    start = timer()
+    for _ in range(repeat):
+        nex(a, b, **kwargs)
+    return 3 * a.nbytes * repeat / (timer() - start) / 1e9
+
+
+settings = threads.settings()
+nt = settings["num_threads"]
+print(
+    f"{nt} threads on {sockets(settings['cores'])} socket(s), "
+    f"binding {settings['binding']}, grid size {n}^3"
+)
+allocators = {
+    "np.zeros": lambda: np.zeros(shape),
+    "first touch": lambda: first_touch.zeros(shape, np.float64, huge_pages=False),
+    "first touch, huge pages": lambda: first_touch.zeros(shape, np.float64),
+}
+for name, alloc in allocators.items():
+    print(f"  {name:24s} {bandwidth(alloc):7.1f} GB/s")
@@ -0,0 +1,36 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+# Repeated cascades with and without tabulated spectral kernels. Run from the
+# repository root:
+#
+#     python -m bench.kernel_cache
+
+from timeit import default_timer as timer
+from field.cascade import Cascade3D
+
+repeat = 3
+args = (6, 0.5, -5 / 3, 0.2)
+
+
+def timeit(field):
+    field(*args)
+    start = timer()
+    for _ in range(repeat):
+        field(*args)
+    return (timer() - start) / repeat
+
+
+for n in (32, 64):
+    fields = [
+        Cascade3D("B", n, wisdom_path="wisdom", num_threads=1, kernel_cache_size=size)
+        for size in (0, 1 << 30)
+    ]
+    t_old, t_new = map(timeit, fields)
+    tables = sum(t.nbytes for t in fields[1]._kernel_tables.values())
+    print(
+        f"grid size {n}^3  uncached: {t_old:7.3f} s  cached: {t_new:7.3f} s"
+        f"  speedup: {t_old/t_new:5.2f}  tables: {tables / 2**20:.1f} MiB"
+    )
@@ -0,0 +1,60 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+# Fused lazy expressions against the former one-sweep-per-line versions of
+# `mag` and `curv`. Run from the repository root:
+#
+#     python -m bench.lazy_fusion
+
+import numpy as np
+from timeit import default_timer as timer
+from field.cascade import Cascade3D
+
+repeat = 10
+
+
+def mag_unfused(field, in_="res", out="f"):
+    field._eval(f"sum({in_}**2, 0)", out=out)
+    field._eval(f"sqrt({out})", out=out)
+    return field._f
+
+
+def curv_unfused(field, out):
+    field._variables[out][:] = 0.0
+    for i in range(field.components):
+        for j in range(field.components):
+            field._fd(f"res{i}", j, out="f")
+            field._eval(f"{out}{i} + res{j} * f", out=f"{out}{i}")
+    mag_unfused(field)
+    for i in range(field.components):
+        field._eval(f"{out}{i} / f**3", out=f"{out}{i}")
+    field._cross("res", out, out=out)
+    field._eval(f"sum({out}**2, 0)", out="f")
+    field._eval("sqrt(f)", out="f")
+    return field._f
+
+
+def timeit(func, *args):
+    func(*args)
+    start = timer()
+    for _ in range(repeat):
+        func(*args)
+    return (timer() - start) / repeat
+
+
+for n in (32, 64, 128):
+    field = Cascade3D("B", n, wisdom_path="wisdom", num_threads=1)
+    field.res[:] = np.random.default_rng(0).standard_normal(field.res.shape)
+    print(f"grid size {n}^3")
+    for name, old, new, args in [
+        ("mag", mag_unfused, field.mag, ()),
+        ("curv", curv_unfused, field.curv, ("e",)),
+    ]:
+        t_old = timeit(old, field, *args)
+        t_new = timeit(new, *args)
+        print(
+            f"  {name:5s} unfused: {1e3*t_old:8.2f} ms  fused: {1e3*t_new:8.2f} ms"
+            f"  speedup: {t_old/t_new:5.2f}"
+        )
@@ -0,0 +1,36 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+# Thread scaling and float32 accuracy of the numexpr reductions used by the
+# fields (`_normalize_noise`, `_normalize_std`, `mag`). Run from the
+# repository root:
+#
+#     python -m bench.reductions
+
+import os
+import numpy as np
+import numexpr_erf as ne
+from timeit import default_timer as timer
+
+repeat = 5
+n = 256
+threads = sorted({1, 2, 4, os.cpu_count()})
+rng = np.random.default_rng(0)
+res = rng.standard_normal((3, n, n, n)).astype(np.float32)
+theta = res[0]
+exact = np.sum(theta.astype(np.float64) ** 2)
+
+for nt in threads:
+    ne.set_num_threads(nt)
+    print(f"{nt} threads, grid size {n}^3")
+    for expr in ("sum(theta**2)", "sum(res**2)", "sum(res**2, 0)"):
+        ne.evaluate(expr)
+        start = timer()
+        for _ in range(repeat):
+            r = ne.evaluate(expr)
+        t = (timer() - start) / repeat
+        print(f"  {expr:16s} {1e3*t:8.2f} ms")
+    err = abs(float(ne.evaluate("sum(theta**2)")) - exact) / exact
+    print(f"  relative error of the float32 sum(theta**2): {err:.1e}")
@@ -0,0 +1,59 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+# Radial spectra from cached shell indices against the former kmag array
+# and `np.histogram` per component, with the bare FFTs for reference, in
+# single precision. Run from the repository root:
+#
+#     python -m bench.spectrum
+
+import numpy as np
+from timeit import default_timer as timer
+from field.basefield import Precision
+from field.cascade import Cascade3D
+
+repeat = 3
+
+
+def spectrum_histogram(field, bins):
+    kmag = field._eval(
+        f"sqrt({field._kmag_squared})",
+        out=np.empty(field._bwd_tuple, dtype=field.ftype),
+    )
+    S_list = []
+    for i in range(field.components):
+        field._eval(f"res{i}", out="f")
+        field._fwd()
+        field._eval("abs(g)**2", out=field._g)
+        S_list += [np.histogram(kmag, bins, weights=field._g.real, density=True)[0]]
+    return S_list
+
+
+def ffts(field):
+    for i in range(field.components):
+        field._eval(f"res{i}", out="f")
+        field._fwd()
+
+
+def timeit(func, *args):
+    func(*args)
+    start = timer()
+    for _ in range(repeat):
+        func(*args)
+    return (timer() - start) / repeat
+
+
+for n in (128, 256):
+    field = Cascade3D("B", n, precision=Precision.SINGLE, wisdom_path="wisdom")
+    field.res[:] = np.random.default_rng(0).standard_normal(field.res.shape)
+    bins, _ = field.kbins()
+    t_old = timeit(spectrum_histogram, field, bins)
+    t_new = timeit(field.spectrum, bins)
+    t_fft = timeit(ffts, field)
+    print(
+        f"grid size {n}^3, {field.num_threads} threads: histogram {t_old:.3f} s"
+        f"  shells {t_new:.3f} s  FFTs alone {t_fft:.3f} s"
+    )
+    del field
@@ -0,0 +1,67 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+# Native periodic stencils against the numpy slicing of `_fd_inplace` for
+# `curl`, `div` and the three curl steps of `_curl` (without its FFTs), in
+# single precision. Run from the repository root:
+#
+#     python -m bench.stencils
+
+import numpy as np
+from timeit import default_timer as timer
+from field.stencils import stencils
+from field.utils import threads
+from field.utils.derivatives import Derivatives
+
+repeat = 3
+
+
+class Grid(Derivatives):
+    """The buffers `Derivatives` works on, without FFTW plans."""
+
+    def __init__(self, n):
+        rng = np.random.default_rng(0)
+        self.components = 3
+        self.dx = 1 / n
+        self.num_threads = threads.num_threads()
+        self.res = rng.standard_normal((3, n, n, n), dtype=np.float32)
+        self._e = np.zeros_like(self.res)
+        self._f = np.zeros_like(self.res[0])
+        self._variables = {"res": self.res, "e": self._e, "f": self._f} | {
+            f"{name}{i}": arr[i] for name, arr in (("res", self.res), ("e", self._e))
+            for i in range(3)
+        }
+
+    def curl_steps(self):
+        for i in range(3):
+            self._curl_step(i, in_=f"res{i}", out="e")
+
+
+def timeit(func):
+    func()
+    start = timer()
+    for _ in range(repeat):
+        func()
+    return (timer() - start) / repeat
+
+
+native = stencils.supported
+for n in (256, 512):
+    grid = Grid(n)
+    print(f"grid size {n}^3, {grid.num_threads} threads")
+    for name, func in (
+        ("curl", lambda grid=grid: grid.curl("e")),
+        ("div", lambda grid=grid: grid.div("f")),
+        ("_curl steps", grid.curl_steps),
+    ):
+        stencils.supported = lambda *arrays: False
+        t_old = timeit(func)
+        stencils.supported = native
+        t_new = timeit(func)
+        print(
+            f"  {name:12s} numpy: {t_old:7.3f} s  native: {t_new:7.3f} s"
+            f"  speedup: {t_old/t_new:5.2f}"
+        )
+    del grid
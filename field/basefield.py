@@ -19,16 +19,19 @@ please be so kind and cite this reference. Thank you!
 """
 )
 
-import os
 import numpy as np
 import numexpr_erf as ne
 import pyfftw
 import pickle
+from collections import OrderedDict
 from enum import Enum
 from pathlib import Path
-from typing import Union
-from .utils.derivatives import Derivatives
+from typing import Sequence, Tuple, Union
+from .first_touch import first_touch
+from .utils.derivatives import Derivative, Derivatives
 from .utils.fieldio import FieldIO, _get_writer_kwds
+from .utils import autotune, threads
+from .utils.lazy import LazyExpressions
 from .utils.statistics import Statistics
 from .utils.vectorutils import VectorUtils
 
@@ -48,7 +51,7 @@ class Precision(Enum):
     DOUBLE = (np.dtype("float64"), np.dtype("complex128"))
 
 
-class BaseField(Derivatives, FieldIO, Statistics, VectorUtils):
+class BaseField(Derivatives, FieldIO, LazyExpressions, Statistics, VectorUtils):
     _kind = None
 
     def __init__(
@@ -60,16 +63,19 @@ class BaseField(Derivatives, FieldIO, Statistics, VectorUtils):
         components: int,
         L_box: float = 1.0,
         precision: Precision = Precision.DOUBLE,
+        derivative: Derivative = Derivative.CENTRAL2,
         num_threads: int = None,
         wisdom_path: str = None,
         init_pyfftw: bool = True,
+        kernel_cache_size: int = 0,
     ):
         self.name = name
         self.wisdom_path = wisdom_path
-        self.num_threads = num_threads or os.cpu_count()
-        ne.set_num_threads(self.num_threads)
+        # the whole thread budget of the process by default, see `utils.threads`
+        self.num_threads = num_threads or threads.num_threads()
         self.precision = precision
         self.ftype, self.ctype = precision.value
+        self.derivative = derivative
         self.dimension = dimension
         self.components = components
         self.grid_size = grid_size
@@ -79,6 +85,17 @@ class BaseField(Derivatives, FieldIO, Statistics, VectorUtils):
         kx = np.fft.fftfreq(grid_size, self._dx).astype(self.ftype)
         ki_list = [kx] * (dimension - 1) + [kx[: grid_size // 2 + 1]]
         self._ki = np.meshgrid(*ki_list, sparse=True, copy=False, indexing="ij")
+        # wavenumbers of spectral derivatives, without the Nyquist mode whose
+        # derivative is not real
+        self._kd = [
+            np.where(
+                np.abs(k) == grid_size / 2, 0, 2 * np.pi / L_box * k
+            ).astype(self.ftype)
+            for k in self._ki
+        ]
+        # |k|^2 of the spectral buffers, computed by numexpr from the element
+        # index instead of broadcasting the kx, ky, kz grids
+        self._kmag_squared = f"kmag2({grid_size}, spacing)"
         self._origin = tuple([0] * dimension)
         self._fwd_tuple = tuple([grid_size] * dimension)
         self._bwd_tuple = tuple([grid_size] * (dimension - 1) + [grid_size // 2 + 1])
@@ -86,11 +103,21 @@ class BaseField(Derivatives, FieldIO, Statistics, VectorUtils):
         self._vbwd_tuple = tuple(
             [components] + [grid_size] * (dimension - 1) + [grid_size // 2 + 1]
         )
-        self.res = np.zeros(self._vfwd_tuple, dtype=self.ftype)
+        self.res = self._zeros(self._vfwd_tuple, self.ftype)
+        self._kernels = {}
+        # memory budget in bytes for tabulated spectral kernels
+        self.kernel_cache_size = kernel_cache_size
+        self._kernel_tables = OrderedDict()
+        # (bins, shell index, ...) of the last shells in k- ("k") and real
+        # space ("r"), see `Statistics`
+        self._shell_index = {}
+        self._scratch_pool = []
+        self._scratch_named = {}
         self._variables = (
             {
                 "dim": dimension,
                 "n": grid_size,
+                "spacing": self.ftype.type(self._dx),
                 "res": self.res,
             }
             | {f"k{c}": self._ki[i] for i, c in enumerate("xyz"[:dimension])}
@@ -98,59 +125,207 @@ class BaseField(Derivatives, FieldIO, Statistics, VectorUtils):
         )
 
         if init_pyfftw:
-            self._f = pyfftw.empty_aligned(self._fwd_tuple, dtype=self.ftype)
-            self._g = pyfftw.empty_aligned(self._bwd_tuple, dtype=self.ctype)
-            self._variables |= {"f": self._f, "g": self._g}
+            self._init_pyfftw()
 
-            wisdom_file = Path(
-                wisdom_path or "wisdom",
-                f"wisdom-{dimension}D-{grid_size}n-{self.num_threads}threads-{self.ctype.name}",
-            )
-            if wisdom_file.exists():
-                import_pyfftw_wisdom(wisdom_file)
-                flags = ("FFTW_WISDOM_ONLY",)
-                print(
-                    "initializing FFTW with wisdom from disk (if this step fails: delete wisdom file)",
-                    end="",
-                )
-            else:
-                wisdom_file.parent.mkdir(parents=True, exist_ok=True)
-                pyfftw.forget_wisdom()
-                flags = ("FFTW_MEASURE",)
-                print("initializing FFTW, generating wisdom", end="")
-            self._fwd = pyfftw.FFTW(
-                self._f,
-                self._g,
-                axes=tuple(range(dimension)),
-                direction="FFTW_FORWARD",
-                threads=self.num_threads,
-                flags=flags,
-            )
-            self._bwd = pyfftw.FFTW(
-                self._g,
-                self._f,
-                axes=tuple(range(dimension)),
-                direction="FFTW_BACKWARD",
-                threads=self.num_threads,
-                flags=flags,
+    def _init_pyfftw(self):
+        """Buffers `f`, `g` and the FFTW plans between them."""
+        self._f = self._zeros(self._fwd_tuple, self.ftype)
+        self._g = self._zeros(self._bwd_tuple, self.ctype)
+        self._variables |= {"f": self._f, "g": self._g}
+
+        wisdom_file = Path(
+            self.wisdom_path or "wisdom",
+            f"wisdom-{self.dimension}D-{self.grid_size}n-{self.num_threads}threads-{self.ctype.name}",
+        )
+        if wisdom_file.exists():
+            import_pyfftw_wisdom(wisdom_file)
+            flags = ("FFTW_WISDOM_ONLY",)
+            print(
+                "initializing FFTW with wisdom from disk (if this step fails: delete wisdom file)",
+                end="",
             )
-            if flags[0] == "FFTW_MEASURE":
-                print(f". writing new wisdom to {wisdom_file}", end="")
-                export_pyfftw_wisdom(wisdom_file)
-            print(".")
+        else:
+            wisdom_file.parent.mkdir(parents=True, exist_ok=True)
+            pyfftw.forget_wisdom()
+            flags = ("FFTW_MEASURE",)
+            print("initializing FFTW, generating wisdom", end="")
+        self._fwd = pyfftw.FFTW(
+            self._f,
+            self._g,
+            axes=tuple(range(self.dimension)),
+            direction="FFTW_FORWARD",
+            threads=self.num_threads,
+            flags=flags,
+        )
+        self._bwd = pyfftw.FFTW(
+            self._g,
+            self._f,
+            axes=tuple(range(self.dimension)),
+            direction="FFTW_BACKWARD",
+            threads=self.num_threads,
+            flags=flags,
+        )
+        if flags[0] == "FFTW_MEASURE":
+            print(f". writing new wisdom to {wisdom_file}", end="")
+            export_pyfftw_wisdom(wisdom_file)
+        print(".")
+
+    def _zeros(self, shape: tuple, dtype: np.dtype) -> np.ndarray:
+        """Buffer of zeros whose pages are first touched by the threads of
+        this field, in the order the threaded kernels traverse it."""
+        return first_touch.zeros(shape, dtype, num_threads=self.num_threads)
+
+    # numexpr context used for all kernels, equivalent to what `ne.evaluate`
+    # resolves for this module
+    _ne_context = {"optimization": "aggressive", "truediv": False}
+
+    def _kernel(self, expr: Union[str, Sequence[str]], extra_variables: dict) -> tuple:
+        """Compiled kernel for `expr`, cached per field instance.
+
+        `expr` may also be a sequence of expressions, compiled into a single
+        program with one output per expression.
+
+        Returns the `NumExpr` object, its arguments in fixed order with all
+        field buffers already bound (`None` marks an extra variable) and the
+        keyword arguments for the call."""
+        if not isinstance(expr, str):
+            expr = tuple(expr)
+        key = (expr,) + tuple(
+            (name, ne.necompiler.getType(np.asarray(value)))
+            for name, value in extra_variables.items()
+        )
+        try:
+            return self._kernels[key]
+        except KeyError:
+            pass
+        names, ex_uses_vml = ne.necompiler.getExprNames(expr, self._ne_context)
+        args = [
+            None if name in extra_variables else self._variables[name]
+            for name in names
+        ]
+        signature = [
+            (name, ne.necompiler.getType(np.asarray(extra_variables.get(name, arg))))
+            for name, arg in zip(names, args)
+        ]
+        kernel = (
+            ne.NumExpr(
+                expr if isinstance(expr, str) else list(expr),
+                signature,
+                # tuned for this machine by `python -m field.utils.autotune`
+                block_size=autotune.block_size(expr, signature),
+                **self._ne_context,
+            ),
+            names,
+            args,
+            {
+                "order": "K",
+                "casting": "same_kind",
+                # a thread budget per field instead of numexpr's global one,
+                # so fields can be evaluated from several threads at once
+                "num_threads": min(self.num_threads, ne.MAX_THREADS),
+                "ex_uses_vml": ex_uses_vml,
+            },
+        )
+        self._kernels[key] = kernel
+        return kernel
+
+    def _kernel_table(
+        self, key: tuple, expr: str, extra_variables: dict = None
+    ) -> Union[np.ndarray, None]:
+        """The real half-spectrum kernel `expr`, tabulated under `key`.
+
+        Tables are kept within `kernel_cache_size` bytes, evicting the least
+        recently used ones. Returns `None` if the budget does not allow for a
+        table at all."""
+        try:
+            self._kernel_tables.move_to_end(key)
+            return self._kernel_tables[key]
+        except KeyError:
+            pass
+        nbytes = int(np.prod(self._bwd_tuple)) * self.ftype.itemsize
+        if nbytes > self.kernel_cache_size:
+            return None
+        while (
+            sum(t.nbytes for t in self._kernel_tables.values()) + nbytes
+            > self.kernel_cache_size
+        ):
+            self._kernel_tables.popitem(last=False)
+        table = self._zeros(self._bwd_tuple, self.ftype)
+        self._eval(expr, extra_variables, out=table)
+        self._kernel_tables[key] = table
+        return table
+
+    def _spectral_kernel(
+        self, key: tuple, expr: str, extra_variables: dict = None
+    ) -> tuple:
+        """Expression text and variables for multiplying with the kernel
+        `expr`: its table if one is cached (see `_kernel_table`), `expr`
+        itself otherwise."""
+        table = self._kernel_table(key, expr, extra_variables)
+        if table is None:
+            return f"({expr})", dict(extra_variables or {})
+        return "table", {"table": table}
+
+    def _lowpass_kernel(self, k0: int = None, k1: int = None, p0: float = 0) -> tuple:
+        """`_spectral_kernel` of the low-pass filter k^p0 exp(-k^2 / 2k0^2),
+        cut off above k1."""
+        k0 = k0 or self.grid_size // 2
+        k1 = k1 or self.grid_size // 2
+        return self._spectral_kernel(
+            ("lowpass", k0, k1, p0),
+            f"where({self._kmag_squared}>k1**2, 0, "
+            f"{self._kmag_squared}**p*exp(-{self._kmag_squared}*a))",
+            {"p": p0 / 2, "a": 0.5 / k0**2, "k1": k1},
+        )
+
+    def _gaussian_kernel(self, scale: float) -> tuple:
+        """`_spectral_kernel` of the Gaussian (scale*n)^dim exp(-k^2 scale^2),
+        `scale` in units of the box."""
+        return self._spectral_kernel(
+            ("indicator", scale),
+            f"(scale*n)**dim*exp(-{self._kmag_squared}*scale**2)",
+            {"scale": scale},
+        )
+
+    def _mexican_hat_kernel(self, scale: float) -> tuple:
+        """`_spectral_kernel` of the Mexican hat wavelet
+        scale^(dim+2) k^2 exp(-k^2 scale^2), `scale` in units of the box."""
+        return self._spectral_kernel(
+            ("wavelet", scale),
+            f"scale**(dim+2)*{self._kmag_squared}*exp(-{self._kmag_squared}*scale**2)",
+            {"scale": scale},
+        )
+
+    def _bound_kernel(
+        self, expr: Union[str, Sequence[str]], extra_variables: dict = None
+    ) -> tuple:
+        """The `NumExpr` object for `expr`, its arguments with
+        `extra_variables` bound and the keyword arguments for the call."""
+        # python floats would make numexpr upcast single precision kernels
+        extra_variables = {
+            name: self.ftype.type(value) if isinstance(value, float) else value
+            for name, value in (extra_variables or {}).items()
+        }
+        nex, names, args, kwargs = self._kernel(expr, extra_variables)
+        if extra_variables:
+            args = [
+                extra_variables[name] if arg is None else arg
+                for name, arg in zip(names, args)
+            ]
+        return nex, args, kwargs
 
     def _eval(
         self,
-        expr: str,
+        expr: Union[str, Sequence[str]],
         extra_variables: dict = None,
-        out: Union[np.ndarray, str] = None,
-    ) -> np.ndarray:
-        variables = self._variables | (
-            {} if extra_variables is None else extra_variables
-        )
+        out: Union[np.ndarray, str, Sequence[Union[np.ndarray, str]]] = None,
+    ) -> Union[np.ndarray, Tuple[np.ndarray, ...]]:
         if isinstance(out, str):
             out = self._variables[out]
-        return ne.evaluate(expr, variables, out=out, casting="same_kind")
+        elif isinstance(out, (list, tuple)):
+            out = [self._variables[o] if isinstance(o, str) else o for o in out]
+        nex, args, kwargs = self._bound_kernel(expr, extra_variables)
+        return nex(*args, out=out, **kwargs)
 
     def __call__(self, *args, **kwds) -> np.ndarray:
         write_field, writer_kwds = _get_writer_kwds(kwds)
@@ -159,3 +334,47 @@ class BaseField(Derivatives, FieldIO, Statistics, VectorUtils):
         if write_field:
             self.write_field(*args, **writer_kwds, **kwds)
         return self.res
+
+    def project(self, **lowpass_kwds) -> np.ndarray:
+        """Make `res` solenoidal by removing the component of its spectrum
+        along the wavenumber of the `derivative` scheme, so `div` vanishes
+        up to rounding. Given `lowpass_kwds` (`k0`, `k1`, `p0`), the
+        low-pass filter of `_low_pass` is applied in the same pass.
+
+        Also works on fields read by `from_h5_dataset` without FFTW."""
+        if not hasattr(self, "_fwd"):
+            self._init_pyfftw()
+        print("projecting onto solenoidal fields", end="")
+        spectra = [
+            self._spectrum(f"res{i}", self._buffer(self._bwd_tuple, self.ctype))
+            for i in range(self.components)
+        ]
+        variables = {f"s{i}": s for i, s in enumerate(spectra)} | {
+            f"K{i}": K for i, K in enumerate(self._wavenumbers())
+        }
+        indices = range(self.components)
+        dot = " + ".join(f"K{i}*s{i}" for i in indices)
+        norm = " + ".join(f"K{i}**2" for i in indices)
+        scale = ""
+        if lowpass_kwds:
+            lowpass, lowpass_variables = self._lowpass_kernel(**lowpass_kwds)
+            variables |= lowpass_variables
+            scale = f"{lowpass}*"
+        self._eval(
+            [
+                f"{scale}(s{i} - K{i}*({dot})/where({norm} > 0, {norm}, 1))"
+                for i in indices
+            ],
+            variables,
+            out=spectra,
+        )
+        for i, spectrum in enumerate(spectra):
+            if lowpass_kwds:
+                spectrum[self._origin] = 0.0
+            self._eval("s", {"s": spectrum}, out="g")
+            self._bwd()
+            self._eval("f", out=f"res{i}")
+        self._release(spectra)
+        print(".")
+        return self.res
+
@@ -11,19 +11,20 @@ from .interp3d.idw import idw
 
 
 class Cascade3D(BaseField):
-    _kmag_squared = "(kx**2+ky**2+kz**2)"
     _kind = "intermittent"
 
     def __init__(self, name: str, grid_size: int, **kwds):
         super().__init__(name, grid_size, dimension=3, components=3, **kwds)
         self._cd = np.pi / 6.0
-        self._e = np.zeros(self._vfwd_tuple, dtype=self.ftype)
-        self._v = np.zeros(self._vbwd_tuple, dtype=self.ctype)
+        self._e = self._zeros(self._vfwd_tuple, self.ftype)
+        self._v = self._zeros(self._vbwd_tuple, self.ctype)
         self._variables |= {
             "e": self._e,
             "v": self._v,
             "omega": self._e[0],
-            "theta": self._e[1],
+            # Gaussian noise of the polar angle theta, replaced by cos(theta)
+            # in `_normalize_noise`; theta itself is never stored
+            "cos_theta": self._e[1],
             "phi": self._e[2],
             **{f"e{i}": self._e[i] for i in range(self.components)},
             **{f"v{i}": self._v[i] for i in range(self.components)},
@@ -58,6 +59,9 @@ class Cascade3D(BaseField):
         if apply_curl:
             print("transforming to real space and applying curl.")
             self._curl()
+        else:
+            # the wavelet steps leave their amplitudes in `res`
+            self.res[:] = 0
         if notify_done:
             print("done.")
         return self.res
@@ -66,7 +70,7 @@ class Cascade3D(BaseField):
         print(f"running scale {scale:g}. generating omega", end="")
         self._gaussian_noise("omega", scale, -variance / 2, variance, accumulate=True)
         print(", theta", end="")
-        self._gaussian_noise("theta", scale, 0, 1)
+        self._gaussian_noise("cos_theta", scale, 0, 1)
         print(", phi", end="")
         self._gaussian_noise("phi", scale, 0, 1)
         print(". normalizing", end="")
@@ -76,40 +80,54 @@ class Cascade3D(BaseField):
         print(".", end=end)
 
     def _gaussian_noise(self, name, scale, mean, variance, accumulate=False):
-        indicator = f"(scale*n)**dim*exp(-{self._kmag_squared}*scale**2)"
-        normal_rvs(self._g.view(self.ftype), 0, np.sqrt(variance))
+        indicator, variables = self._gaussian_kernel(scale)
+        normal_rvs(
+            self._g.view(self.ftype),
+            0,
+            np.sqrt(variance),
+            num_threads=self.num_threads,
+        )
         self._g[self._origin] = mean
-        self._eval(f"g*{indicator}", {"scale": scale}, out="g")
+        self._eval(f"g*{indicator}", variables, out="g")
         self._bwd()
         self._eval(f"{name}+f" if accumulate else "f", out=name)
 
     def _normalize_noise(self):
+        # theta = arccos(-erf(x/sqrt(2))) and phi = 2*pi*ndtr(x) are
+        # uniformly distributed on the sphere, the wavelet step only needs
+        # cos(theta)
         funcs = {
-            "theta": "arccos(-erf({}/sqrt(2)))",
-            "phi": f"{np.pi}*(1+erf({{}}/sqrt(2)))",
+            "cos_theta": "-erf({}/sqrt(2))",
+            "phi": f"{2 * np.pi}*ndtr({{}})",
         }
         for name, func in funcs.items():
             std = np.sqrt(
                 self._eval(f"sum({name}**2)") / self.grid_size**self.dimension
             )
-            func = func.format(f"{name}/{std}")
-            self._eval(func, out=name)
+            func = func.format(f"{name}/std")
+            self._eval(func, {"std": float(std)}, out=name)
 
     def _wavelet_convolution(self, scale, scalefactor):
-        wavelet = (
-            f"scale**(dim+2)*{self._kmag_squared}*exp(-{self._kmag_squared}*scale**2)"
+        """Adds the wavelet step at `scale` to the vector potential `v`.
+        Uses `f`, `res1` and `res2` as scratch."""
+        wavelet, variables = self._mexican_hat_kernel(scale)
+        # all three components in one pass, sharing exp, sqrt and sincos
+        amplitude = "exp(omega)*sqrt((1-cos_theta)*(1+cos_theta))"
+        self._eval(
+            [
+                f"{amplitude}*real(sincos(phi))",
+                f"{amplitude}*imag(sincos(phi))",
+                "exp(omega)*cos_theta",
+            ],
+            out=["f", "res1", "res2"],
         )
-        rij = [
-            "sin(theta)*cos(phi)",
-            "sin(theta)*sin(phi)",
-            "cos(theta)",
-        ]
         for k in range(3):
-            self._eval(f"exp(omega)*({rij[k]})", out="f")
+            if k:
+                self._eval(f"res{k}", out="f")
             self._fwd()
             self._eval(
                 f"v{k}+scalefactor*g*{wavelet}",
-                {"scale": scale, "scalefactor": scalefactor},
+                {"scalefactor": scalefactor, **variables},
                 out=f"v{k}",
             )
 
@@ -119,8 +137,10 @@ class Cascade3D(BaseField):
         print("randomizing phases", end="")
         self.res[:] = 0
         for i in range(self.components):
-            uniform_rvs(self._g.view(self.ftype), -np.pi, np.pi)
-            self._eval(f"abs(v{i})*exp(1j*real(g))", out="g")
+            uniform_rvs(
+                self._g.view(self.ftype), -np.pi, np.pi, num_threads=self.num_threads
+            )
+            self._eval(f"abs(v{i})*sincos(real(g))", out="g")
             self._bwd()
             self._curl_step(i)
         self._normalize_std()
@@ -142,8 +162,13 @@ class LagrangianMapping3D(Cascade3D):
         super().__init__(name, grid_size, **kwds)
         assert cfl != 0
         self.cfl = cfl
-        self._interp3d = partial(idw, query_spacing=query_spacing, weights=self._f)
-        self._c = np.zeros(self._vfwd_tuple, dtype=self.ftype)
+        self._interp3d = partial(
+            idw,
+            query_spacing=query_spacing,
+            weights=self._f,
+            num_threads=self.num_threads,
+        )
+        self._c = self._zeros(self._vfwd_tuple, self.ftype)
         self._reset_coords()
         self._variables |= {"c": self._c}
 
@@ -175,7 +200,11 @@ class LagrangianMapping3D(Cascade3D):
             self._curl()
             self.mag()
             norm = np.max(self._f)
-            self._eval(f"c+{self.cfl:g}*{scale:g}*res/{norm:g}", out="c")
+            self._eval(
+                "c+cfl*scale*res/norm",
+                {"cfl": self.cfl, "scale": scale, "norm": float(norm)},
+                out="c",
+            )
             print(".")
         else:
             super()._generate_step(scale, variance, scalefactor, end="\n")
@@ -199,13 +228,9 @@ class LagrangianMapping3D(Cascade3D):
         k0 = k0 or self.grid_size // 2
         k1 = k1 or self.grid_size // 2
         print(f". lowpass filtering with {k0=}, {k1=}, {p0=}", end="")
+        lowpass, variables = self._lowpass_kernel(k0, k1, p0)
         self._fwd()
-        self._eval(
-            f"g*{self._kmag_squared}**(p0/2.0)*exp(-{self._kmag_squared}/k0**2/2.0)",
-            {"k0": k0, "p0": p0},
-            out="g",
-        )
-        self._eval(f"where({self._kmag_squared}>k1**2, 0.0, g)", {"k1": k1}, out="g")
+        self._eval(f"g*{lowpass}", variables, out="g")
         self._g[0, 0, 0] = 0.0
         self._eval("g", out=f"v{i}")
         self._bwd()
@@ -0,0 +1,25 @@
+// Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+// Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+//
+// Distributed under the MIT License
+
+#include <cstddef>
+#include <cstring>
+#include <omp.h>
+
+extern "C"
+{
+    // Zeroes the pages of `buf` with the static partitioning of an OpenMP
+    // loop, each thread one contiguous range, so every page is placed on
+    // the NUMA node of the thread that works on it later on
+    void first_touch(char *buf, size_t size, size_t page_size, int num_threads)
+    {
+        size_t pages = (size + page_size - 1) / page_size;
+#pragma omp parallel for schedule(static) num_threads(num_threads)
+        for (size_t i = 0; i < pages; ++i)
+        {
+            size_t offset = i * page_size;
+            std::memset(buf + offset, 0, size - offset < page_size ? size - offset : page_size);
+        }
+    }
+}
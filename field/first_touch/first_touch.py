@@ -0,0 +1,56 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import ctypes
+import mmap
+import numpy as np
+from pathlib import Path
+from ..utils import threads
+from ..utils._build import build_library
+
+path = Path(__file__).parent.resolve()
+lib = ctypes.cdll.LoadLibrary(
+    build_library("first_touch", Path(path, "first_touch.cpp"))
+)
+_first_touch = lib.first_touch
+_first_touch.argtypes = [
+    ctypes.c_void_p,
+    ctypes.c_size_t,
+    ctypes.c_size_t,
+    ctypes.c_int,
+]
+
+# transparent huge pages on x86-64 Linux
+HUGE_PAGE_SIZE = 2 << 20
+
+
+def zeros(shape, dtype, *, num_threads=None, huge_pages=True) -> np.ndarray:
+    """Page aligned array of zeros, its pages touched first by `num_threads`
+    OpenMP threads in contiguous parts of whole pages.
+
+    With the threads pinned (see `utils.threads`), each part lands on the
+    NUMA node of the thread which also works on it in statically
+    partitioned loops. Arrays of at least one huge page ask the kernel for
+    transparent huge pages if `huge_pages` is set."""
+    dtype = np.dtype(dtype)
+    size = int(np.prod(shape)) * dtype.itemsize
+    page_size = mmap.PAGESIZE
+    if huge_pages and size >= HUGE_PAGE_SIZE and hasattr(mmap, "MADV_HUGEPAGE"):
+        page_size = HUGE_PAGE_SIZE
+    # mmap aligns to small pages only: map up to one huge page more and
+    # start the array at the first huge page boundary, so that the parts
+    # of the threads consist of whole huge pages
+    buf = mmap.mmap(-1, max(size, 1) + page_size - mmap.PAGESIZE)
+    if page_size == HUGE_PAGE_SIZE:
+        buf.madvise(mmap.MADV_HUGEPAGE)
+    offset = -np.frombuffer(buf, dtype=np.uint8).ctypes.data % page_size
+    out = np.frombuffer(buf, dtype=dtype, count=size // dtype.itemsize, offset=offset)
+    _first_touch(
+        out.ctypes.data,
+        size,
+        page_size,
+        num_threads or threads.num_threads(),
+    )
+    return out.reshape(shape)
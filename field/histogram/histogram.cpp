@@ -0,0 +1,102 @@
+// Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+// Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+//
+// Distributed under the MIT License
+
+#include <algorithm>
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <vector>
+#include <omp.h>
+
+#ifndef real
+#define real float
+#endif
+
+enum scale
+{
+    EDGES = 0,  // arbitrary sorted edges
+    LINEAR = 1, // equidistant edges
+    LOG = 2,    // equidistant in log, edges[0] > 0
+};
+
+// Index of the last of the sorted `edges` that is <= v, for edges[0] <= v,
+// without branches on the data
+static inline size_t last_edge(const double *edges, size_t num_edges, double v)
+{
+    const double *base = edges;
+    for (size_t len = num_edges; len > 1; len -= len / 2)
+        base = base[len / 2] <= v ? base + len / 2 : base;
+    return base - edges;
+}
+
+extern "C"
+{
+    // Adds the counts of `data` in the bins over `edges` to `counts`, like
+    // np.histogram: the last bin includes its upper edge, values outside
+    // the edges and NaN are not counted. Linear and log bins are computed
+    // directly and corrected against the edges like numpy does. The partial
+    // histograms of the threads are added in thread order.
+    void histogram(const real *data, size_t size, const double *edges,
+                   size_t num_edges, int scale, int64_t *counts, int num_threads)
+    {
+        size_t num_bins = num_edges - 1;
+        double lo = edges[0], hi = edges[num_bins];
+        double offset = scale == LOG ? std::log(lo) : lo;
+        double norm = num_bins / (scale == LOG ? std::log(hi) - offset : hi - lo);
+        std::vector<std::vector<int64_t>> partial(num_threads);
+#pragma omp parallel num_threads(num_threads)
+        {
+            std::vector<int64_t> &local = partial[omp_get_thread_num()];
+            local.assign(num_bins, 0);
+#pragma omp for schedule(static)
+            for (size_t i = 0; i < size; ++i)
+            {
+                double v = data[i];
+                if (!(v >= lo && v <= hi))
+                    continue;
+                size_t bin;
+                if (scale == EDGES)
+                    bin = last_edge(edges, num_edges, v);
+                else
+                {
+                    double x = scale == LOG ? std::log(v) : v;
+                    bin = std::min((size_t)((x - offset) * norm), num_bins - 1);
+                    while (bin > 0 && v < edges[bin])
+                        --bin;
+                    while (bin + 1 < num_bins && v >= edges[bin + 1])
+                        ++bin;
+                }
+                ++local[std::min(bin, num_bins - 1)];
+            }
+        }
+        for (const auto &local : partial)
+            for (size_t b = 0; b < local.size(); ++b)
+                counts[b] += local[b];
+    }
+
+    // Adds the sums of data^p for p = 1, ..., max_order to `sums`, in
+    // double precision. The partial sums of the threads are added in thread
+    // order.
+    void power_sums(const real *data, size_t size, int max_order, double *sums,
+                    int num_threads)
+    {
+        std::vector<std::vector<double>> partial(num_threads);
+#pragma omp parallel num_threads(num_threads)
+        {
+            std::vector<double> &local = partial[omp_get_thread_num()];
+            local.assign(max_order, 0.0);
+#pragma omp for schedule(static)
+            for (size_t i = 0; i < size; ++i)
+            {
+                double v = data[i], x = v;
+                for (int p = 0; p < max_order; ++p, x *= v)
+                    local[p] += x;
+            }
+        }
+        for (const auto &local : partial)
+            for (size_t p = 0; p < local.size(); ++p)
+                sums[p] += local[p];
+    }
+}
@@ -0,0 +1,74 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import ctypes
+import numpy as np
+from pathlib import Path
+from ..utils import threads
+from ..utils._build import build_library
+
+SCALES = (None, "linear", "log")
+
+
+def _get_lib(ftype_name):
+    postfix, ftype_cname = {
+        "float64": ("", "double"),
+        "float32": ("f", "float"),
+    }[ftype_name]
+
+    path = Path(__file__).parent.resolve()
+    lpath = build_library(
+        f"histogram{postfix}",
+        Path(path, "histogram.cpp"),
+        defines={"real": ftype_cname},
+    )
+    lib = ctypes.cdll.LoadLibrary(lpath)
+    p = ctypes.c_void_p
+    lib.histogram.argtypes = [p, ctypes.c_size_t, p, ctypes.c_size_t]
+    lib.histogram.argtypes += [ctypes.c_int, p, ctypes.c_int]
+    lib.power_sums.argtypes = [p, ctypes.c_size_t, ctypes.c_int, p, ctypes.c_int]
+    return lib
+
+
+_lib_dict = {key: _get_lib(key) for key in ("float32", "float64")}
+
+
+def accumulate(data, edges, counts, *, scale=None, num_threads=None):
+    """Adds the `np.histogram` counts of `data` over `edges` to `counts`
+    (int64). `scale` "linear" or "log" declares equidistant bins, which
+    are found without searching the edges."""
+    data = np.ascontiguousarray(data)
+    if data.dtype.name not in _lib_dict:
+        data = data.astype(np.float64)
+    edges = np.ascontiguousarray(edges, dtype=np.float64)
+    assert counts.dtype == np.int64 and len(counts) == len(edges) - 1
+    _lib_dict[data.dtype.name].histogram(
+        data.ctypes.data,
+        data.size,
+        edges.ctypes.data,
+        len(edges),
+        SCALES.index(scale),
+        counts.ctypes.data,
+        num_threads or threads.num_threads(),
+    )
+    return counts
+
+
+def power_sums(data, max_order, *, out=None, num_threads=None):
+    """Sums of `data`**p for p = 1, ..., `max_order` in one sweep, added to
+    `out` (float64) if given."""
+    data = np.ascontiguousarray(data)
+    if data.dtype.name not in _lib_dict:
+        data = data.astype(np.float64)
+    out = np.zeros(max_order) if out is None else out
+    assert out.dtype == np.float64 and len(out) == max_order
+    _lib_dict[data.dtype.name].power_sums(
+        data.ctypes.data,
+        data.size,
+        max_order,
+        out.ctypes.data,
+        num_threads or threads.num_threads(),
+    )
+    return out
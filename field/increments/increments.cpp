@@ -0,0 +1,139 @@
+// Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+// Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+//
+// Distributed under the MIT License
+
+#include <algorithm>
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <vector>
+#include <omp.h>
+
+#ifndef real
+#define real float
+#endif
+
+enum kind
+{
+    VECTOR = 0,       // |dB|
+    LONGITUDINAL = 1, // the component along the lag
+    TRANSVERSE = 2,   // the components across the lag
+};
+
+// out[x2] = a(x + lag e_axis) - a(x) along the row (x0, x1) of a periodic
+// n^3 grid in C order
+static void increment_row(const real *a, size_t x0, size_t x1, size_t n,
+                          int axis, size_t lag, real *__restrict out)
+{
+    const real *row = a + (x0 * n + x1) * n;
+    if (axis == 2)
+    {
+        for (size_t x2 = 0; x2 < n - lag; ++x2)
+            out[x2] = row[x2 + lag] - row[x2];
+        for (size_t x2 = n - lag; x2 < n; ++x2)
+            out[x2] = row[x2 + lag - n] - row[x2];
+        return;
+    }
+    const real *shifted = axis == 0
+                              ? a + (((x0 + lag) % n) * n + x1) * n
+                              : a + (x0 * n + (x1 + lag) % n) * n;
+    for (size_t x2 = 0; x2 < n; ++x2)
+        out[x2] = shifted[x2] - row[x2];
+}
+
+// Index of the last of the sorted `edges` that is <= v, for edges[0] <= v,
+// without branches on the data
+static inline size_t last_edge(const double *edges, size_t num_edges, double v)
+{
+    const double *base = edges;
+    for (size_t len = num_edges; len > 1; len -= len / 2)
+        base = base[len / 2] <= v ? base + len / 2 : base;
+    return base - edges;
+}
+
+extern "C"
+{
+    // Sums of |dB|^p, p = 1..max_order, of the increments of b = (a0, a1,
+    // a2) over `lag` grid points along `axis`, into `sums`. The increments
+    // (signed unless kind is VECTOR) are counted into the histogram
+    // `counts` over `edges` unless that is NULL. Both are accumulated into.
+    void structure_functions(const real *a0, const real *a1, const real *a2,
+                             size_t n, int axis, size_t lag, int kind,
+                             int max_order, double *sums, const double *edges,
+                             size_t num_edges, int64_t *counts, int num_threads)
+    {
+        const real *a[3] = {a0, a1, a2};
+        // components whose increments are samples of their own
+        std::vector<int> comps;
+        if (kind == LONGITUDINAL)
+            comps = {axis};
+        else if (kind == TRANSVERSE)
+            comps = {(axis + 1) % 3, (axis + 2) % 3};
+        else
+            comps = {-1};
+        size_t num_bins = counts ? num_edges - 1 : 0;
+        lag %= n;
+        // partial sums and counts per thread, added in thread order so the
+        // moments do not depend on the scheduling
+        std::vector<std::vector<double>> partial(
+            num_threads, std::vector<double>(max_order, 0.0));
+        std::vector<std::vector<int64_t>> partial_counts(
+            num_threads, std::vector<int64_t>(num_bins, 0));
+#pragma omp parallel num_threads(num_threads)
+        {
+            std::vector<real> inc(n), tmp(n);
+            std::vector<double> mag(n), power(n);
+            std::vector<double> &local_sums = partial[omp_get_thread_num()];
+            std::vector<int64_t> &local_counts =
+                partial_counts[omp_get_thread_num()];
+#pragma omp for collapse(2) schedule(static)
+            for (size_t x0 = 0; x0 < n; ++x0)
+                for (size_t x1 = 0; x1 < n; ++x1)
+                    for (int c : comps)
+                    {
+                        if (c >= 0)
+                            increment_row(a[c], x0, x1, n, axis, lag, inc.data());
+                        else
+                        {
+                            std::fill(mag.begin(), mag.end(), 0.0);
+                            for (int i = 0; i < 3; ++i)
+                            {
+                                increment_row(a[i], x0, x1, n, axis, lag, tmp.data());
+                                for (size_t x2 = 0; x2 < n; ++x2)
+                                    mag[x2] += (double)tmp[x2] * tmp[x2];
+                            }
+                            for (size_t x2 = 0; x2 < n; ++x2)
+                                inc[x2] = std::sqrt(mag[x2]);
+                        }
+                        for (size_t x2 = 0; x2 < n; ++x2)
+                            power[x2] = mag[x2] = std::abs((double)inc[x2]);
+                        for (int p = 0; p < max_order; ++p)
+                        {
+                            double s = 0.0;
+#pragma omp simd reduction(+ : s)
+                            for (size_t x2 = 0; x2 < n; ++x2)
+                            {
+                                s += power[x2];
+                                power[x2] *= mag[x2];
+                            }
+                            local_sums[p] += s;
+                        }
+                        for (size_t x2 = 0; num_bins && x2 < n; ++x2)
+                        {
+                            double v = inc[x2];
+                            if (!(v >= edges[0] && v <= edges[num_bins]))
+                                continue;
+                            ++local_counts[std::min(last_edge(edges, num_edges, v), num_bins - 1)];
+                        }
+                    }
+        }
+        for (int t = 0; t < num_threads; ++t)
+        {
+            for (int p = 0; p < max_order; ++p)
+                sums[p] += partial[t][p];
+            for (size_t i = 0; i < num_bins; ++i)
+                counts[i] += partial_counts[t][i];
+        }
+    }
+}
@@ -0,0 +1,67 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import ctypes
+import numpy as np
+from pathlib import Path
+from ..utils import threads
+from ..utils._build import build_library
+
+KINDS = ("vector", "longitudinal", "transverse")
+
+
+def _get_lib(ftype_name):
+    postfix, ftype_cname = {
+        "float64": ("", "double"),
+        "float32": ("f", "float"),
+    }[ftype_name]
+
+    path = Path(__file__).parent.resolve()
+    lpath = build_library(
+        f"increments{postfix}",
+        Path(path, "increments.cpp"),
+        defines={"real": ftype_cname},
+    )
+    lib = ctypes.cdll.LoadLibrary(lpath)
+    p = ctypes.c_void_p
+    lib.structure_functions.argtypes = [p, p, p, ctypes.c_size_t, ctypes.c_int]
+    lib.structure_functions.argtypes += [ctypes.c_size_t, ctypes.c_int, ctypes.c_int]
+    lib.structure_functions.argtypes += [p, p, ctypes.c_size_t, p, ctypes.c_int]
+    return lib
+
+
+_lib_dict = {key: _get_lib(key) for key in ("float32", "float64")}
+
+
+def structure_functions(
+    b, axis, lag, *, kind="vector", max_order=8, edges=None, num_threads=None
+):
+    """Sums of |dB|^p for p = 1..max_order over the increments
+    dB = b(x + lag e_axis) - b(x) of the periodic n^3 vector field `b`, and
+    the histogram counts of the increments over `edges` if these are given.
+    `kind` is one of `KINDS`, the transverse increments of both components
+    across the lag are samples of their own."""
+    assert len(b) == 3 and all(c.flags.c_contiguous for c in b)
+    assert b[0].ndim == 3 and b[0].shape.count(b[0].shape[0]) == 3
+    sums = np.zeros(max_order)
+    counts = None
+    if edges is not None:
+        edges = np.ascontiguousarray(edges, dtype=np.float64)
+        counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    n = b[0].shape[0]
+    _lib_dict[b[0].dtype.name].structure_functions(
+        *(c.ctypes.data for c in b),
+        n,
+        axis,
+        lag % n,
+        KINDS.index(kind),
+        max_order,
+        sums.ctypes.data,
+        None if edges is None else edges.ctypes.data,
+        0 if edges is None else len(edges),
+        None if counts is None else counts.ctypes.data,
+        num_threads or threads.num_threads(),
+    )
+    return sums, counts
@@ -17,9 +17,9 @@ static Float lerp(Float a, Float b, Float t)
 }
 
 template <typename Float>
-static void interp1d(const Float *xp, const Float *yp, Float *x, size_t xp_size, size_t x_size)
+static void interp1d(const Float *xp, const Float *yp, Float *x, size_t xp_size, size_t x_size, int num_threads)
 {
-#pragma omp parallel for
+#pragma omp parallel for num_threads(num_threads)
     for (size_t i = 0; i < x_size; ++i)
     {
         const Float *xi = std::lower_bound(xp, xp + xp_size, x[i]);
@@ -37,13 +37,13 @@ static void interp1d(const Float *xp, const Float *yp, Float *x, size_t xp_size,
 
 extern "C"
 {
-    void interp1d_double(const double *xp, const double *yp, double *x, size_t xp_size, size_t x_size)
+    void interp1d_double(const double *xp, const double *yp, double *x, size_t xp_size, size_t x_size, int num_threads)
     {
-        interp1d(xp, yp, x, xp_size, x_size);
+        interp1d(xp, yp, x, xp_size, x_size, num_threads);
     }
 
-    void interp1d_float(const float *xp, const float *yp, float *x, size_t xp_size, size_t x_size)
+    void interp1d_float(const float *xp, const float *yp, float *x, size_t xp_size, size_t x_size, int num_threads)
     {
-        interp1d(xp, yp, x, xp_size, x_size);
+        interp1d(xp, yp, x, xp_size, x_size, num_threads);
     }
 }
@@ -3,24 +3,15 @@
 #
 # Distributed under the MIT License
 
-import os
-import sys
 import ctypes
 import numpy as np
 from pathlib import Path
-from ..utils._get_compiler import compile_cmd
+from ..utils import threads
+from ..utils._build import build_library
 
 name = "interp1d"
-# compiler = "c++"
-# cflags = "-std=c++17 -Wall -Wextra -O3 -march=native -fPIC -shared -lm -fopenmp"
 path = Path(__file__).parent.resolve()
-compile_cmd = f"{compile_cmd} {Path(path, f'{name}.cpp').resolve()} -o {Path(path, f'lib{name}_omp.so')}"
-if not Path(path, f"lib{name}_omp.so").exists():
-    print(f"[INFO] Compiling lib{name}_omp.so", file=sys.stderr)
-    print(f"[INFO] Running {compile_cmd}", file=sys.stderr)
-    os.system(f'/bin/bash -c "{compile_cmd}"')
-
-lib = ctypes.cdll.LoadLibrary(os.path.join(path, f"lib{name}_omp.so"))
+lib = ctypes.cdll.LoadLibrary(build_library(f"{name}_omp", Path(path, f"{name}.cpp")))
 _interp1d_dbl = lib.interp1d_double
 _interp1d_dbl.argtypes = [
     ctypes.POINTER(ctypes.c_double),
@@ -28,6 +19,7 @@ _interp1d_dbl.argtypes = [
     ctypes.POINTER(ctypes.c_double),
     ctypes.c_size_t,
     ctypes.c_size_t,
+    ctypes.c_int,
 ]
 _interp1d_flt = lib.interp1d_float
 _interp1d_flt.argtypes = [
@@ -36,10 +28,11 @@ _interp1d_flt.argtypes = [
     ctypes.POINTER(ctypes.c_float),
     ctypes.c_size_t,
     ctypes.c_size_t,
+    ctypes.c_int,
 ]
 
 
-def interp1d(xp, yp, xnew):
+def interp1d(xp, yp, xnew, num_threads=None):
     func, ftype = {
         "float64": (_interp1d_dbl, ctypes.c_double),
         "float32": (_interp1d_flt, ctypes.c_float),
@@ -49,5 +42,6 @@ def interp1d(xp, yp, xnew):
     xp_ptr = xp.ctypes.data_as(ctypes.POINTER(ftype))
     yp_ptr = yp.ctypes.data_as(ctypes.POINTER(ftype))
     xnew_ptr = xnew.ctypes.data_as(ctypes.POINTER(ftype))
-    func(xp_ptr, yp_ptr, xnew_ptr, xp_size, xnew_size)
+    num_threads = ctypes.c_int(num_threads or threads.num_threads())
+    func(xp_ptr, yp_ptr, xnew_ptr, xp_size, xnew_size, num_threads)
     return xnew
@@ -20,12 +20,13 @@ extern "C"
         real *weights,
         real dx,
         real dq,
-        size_t x_max)
+        size_t x_max,
+        int num_threads)
     {
         std::cout << "running forward interpolation" << std::flush;
         real eps = std::numeric_limits<real>::epsilon();
         size_t size = x_max * x_max * x_max;
-#pragma omp parallel
+#pragma omp parallel num_threads(num_threads)
         {
 #pragma omp for
             for (size_t id = 0; id < size; ++id)
@@ -3,32 +3,24 @@
 #
 # Distributed under the MIT License
 
-import os
-import sys
 import ctypes
 import time
 import numpy as np
 from pathlib import Path
+from ..utils import threads
+from ..utils._build import build_library
 
 
 def _get_cfunc(ftype_name):
-    from ..utils._get_compiler import compile_cmd
-
     cftype, npftype, postfix, ftype_cname = {
         "float64": (ctypes.c_double, np.float64, "", "double"),
         "float32": (ctypes.c_float, np.float32, "f", "float"),
     }[ftype_name]
 
-    # compiler = "c++"
-    # cflags = "-std=c++17 -Wall -Wextra -O3 -march=native -fPIC -shared -lm -fopenmp"
     path = Path(__file__).parent.resolve()
-    lpath = Path(path, f"libidw{postfix}.so").resolve()
-    compile_cmd = f"{compile_cmd} -Dreal={ftype_cname} {Path(path, 'idw.cpp').resolve()} -o {lpath}"
-    if not lpath.exists():
-        print(f"[INFO] Compiling libidw{postfix}.so", file=sys.stderr)
-        print(f"[INFO] Running {compile_cmd}", file=sys.stderr)
-        os.system(f'/bin/bash -c "{compile_cmd}"')
-
+    lpath = build_library(
+        f"idw{postfix}", Path(path, "idw.cpp"), defines={"real": ftype_cname}
+    )
     lib = ctypes.cdll.LoadLibrary(lpath)
     _f = lib.fwd
     _f.argtype = [
@@ -45,9 +37,12 @@ def _get_cfunc(ftype_name):
         cftype,
         cftype,
         ctypes.c_size_t,
+        ctypes.c_int,
     ]
 
-    def _idw(coords, values, grid_spacing, out, *, query_spacing, weights):
+    def _idw(
+        coords, values, grid_spacing, out, *, query_spacing, weights, num_threads=None
+    ):
         assert coords.dtype == np.dtype(npftype)
         assert values.dtype == np.dtype(npftype)
         assert out.dtype == np.dtype(npftype)
@@ -67,6 +62,7 @@ def _get_cfunc(ftype_name):
         dx = cftype(grid_spacing)
         dq = cftype(query_spacing)
         x_max = ctypes.c_size_t(coords.shape[1])
+        num_threads = ctypes.c_int(num_threads or threads.num_threads())
         _f(
             xc_ptr,
             yc_ptr,
@@ -81,6 +77,7 @@ def _get_cfunc(ftype_name):
             dx,
             dq,
             x_max,
+            num_threads,
         )
         time.sleep(1e-6)
         return out
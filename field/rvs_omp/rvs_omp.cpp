@@ -9,14 +9,14 @@
 #include <omp.h>
 
 template<typename Distr, typename Float>
-static void fill_array_with_random_numbers(unsigned int seed, Float* res, size_t size, Distr& dist)
+static void fill_array_with_random_numbers(unsigned int seed, Float* res, size_t size, Distr& dist, int num_threads)
 {
     std::seed_seq seq{seed};
-    std::vector<std::uint32_t> seeds(omp_get_max_threads());
+    std::vector<std::uint32_t> seeds(num_threads);
     seq.generate(seeds.begin(), seeds.end());
     std::mt19937 gen;
 
-    #pragma omp parallel firstprivate(gen, dist)
+    #pragma omp parallel num_threads(num_threads) firstprivate(gen, dist)
     {
         gen.seed(seeds[omp_get_thread_num()]);
         #pragma omp for
@@ -26,27 +26,27 @@ static void fill_array_with_random_numbers(unsigned int seed, Float* res, size_t
 }
 
 extern "C" {
-    void normal_rvs_double(unsigned int seed, double* res, size_t size, double mean, double sigma)
+    void normal_rvs_double(unsigned int seed, double* res, size_t size, double mean, double sigma, int num_threads)
     {
         std::normal_distribution<double> norm(mean, sigma);
-        fill_array_with_random_numbers(seed, res, size, norm);
+        fill_array_with_random_numbers(seed, res, size, norm, num_threads);
     }
     
-    void normal_rvs_float(unsigned int seed, float* res, size_t size, float mean, float sigma)
+    void normal_rvs_float(unsigned int seed, float* res, size_t size, float mean, float sigma, int num_threads)
     {
         std::normal_distribution<float> norm(mean, sigma);
-        fill_array_with_random_numbers(seed, res, size, norm);
+        fill_array_with_random_numbers(seed, res, size, norm, num_threads);
     }
     
-    void uniform_rvs_double(unsigned int seed, double* res, size_t size, double min, double max)
+    void uniform_rvs_double(unsigned int seed, double* res, size_t size, double min, double max, int num_threads)
     {
         std::uniform_real_distribution<double> uni(min, max);
-        fill_array_with_random_numbers(seed, res, size, uni);
+        fill_array_with_random_numbers(seed, res, size, uni, num_threads);
     }
     
-    void uniform_rvs_float(unsigned int seed, float* res, size_t size, float min, float max)
+    void uniform_rvs_float(unsigned int seed, float* res, size_t size, float min, float max, int num_threads)
     {
         std::uniform_real_distribution<float> uni(min, max);
-        fill_array_with_random_numbers(seed, res, size, uni);
+        fill_array_with_random_numbers(seed, res, size, uni, num_threads);
     }
 }
@@ -3,23 +3,14 @@
 #
 # Distributed under the MIT License
 
-import os
-import sys
 import ctypes
 import numpy as np
 from pathlib import Path
-from ..utils._get_compiler import compile_cmd
+from ..utils import threads
+from ..utils._build import build_library
 
-# compiler = "c++"
-# cflags = "-Wall -Wextra -O3 -march=native -fPIC -shared -lm -fopenmp"
 path = Path(__file__).parent.resolve()
-compile_cmd = f"{compile_cmd} {Path(path, 'rvs_omp.cpp').resolve()} -o {Path(path, 'librvs_omp.so')}"
-if not Path(path, "librvs_omp.so").exists():
-    print("[INFO] Compiling librvs_omp.so", file=sys.stderr)
-    print(f"[INFO] Running {compile_cmd}", file=sys.stderr)
-    os.system(f'/bin/bash -c "{compile_cmd}"')
-
-libutils = ctypes.cdll.LoadLibrary(os.path.join(path, "librvs_omp.so"))
+libutils = ctypes.cdll.LoadLibrary(build_library("rvs_omp", Path(path, "rvs_omp.cpp")))
 _normal_rvs_dbl = libutils.normal_rvs_double
 _normal_rvs_dbl.argtypes = [
     ctypes.c_uint,
@@ -27,6 +18,7 @@ _normal_rvs_dbl.argtypes = [
     ctypes.c_size_t,
     ctypes.c_double,
     ctypes.c_double,
+    ctypes.c_int,
 ]
 _normal_rvs_flt = libutils.normal_rvs_float
 _normal_rvs_flt.argtypes = [
@@ -35,6 +27,7 @@ _normal_rvs_flt.argtypes = [
     ctypes.c_size_t,
     ctypes.c_float,
     ctypes.c_float,
+    ctypes.c_int,
 ]
 _uniform_rvs_dbl = libutils.uniform_rvs_double
 _uniform_rvs_dbl.argtypes = [
@@ -43,6 +36,7 @@ _uniform_rvs_dbl.argtypes = [
     ctypes.c_size_t,
     ctypes.c_double,
     ctypes.c_double,
+    ctypes.c_int,
 ]
 _uniform_rvs_flt = libutils.uniform_rvs_float
 _uniform_rvs_flt.argtypes = [
@@ -51,11 +45,12 @@ _uniform_rvs_flt.argtypes = [
     ctypes.c_size_t,
     ctypes.c_float,
     ctypes.c_float,
+    ctypes.c_int,
 ]
 
 
 def rvs(gen_dbl, gen_flt):
-    def _rvs(out, p1=0.0, p2=1.0, seed=None):
+    def _rvs(out, p1=0.0, p2=1.0, seed=None, num_threads=None):
         if seed is None:
             seed = np.random.randint(np.iinfo("uint32").max)
         gen, ftype = {
@@ -67,7 +62,8 @@ def rvs(gen_dbl, gen_flt):
         out_ptr = out.ctypes.data_as(ctypes.POINTER(ftype))
         p1 = ftype(p1)
         p2 = ftype(p2)
-        gen(seed, out_ptr, size, p1, p2)
+        num_threads = ctypes.c_int(num_threads or threads.num_threads())
+        gen(seed, out_ptr, size, p1, p2, num_threads)
         return out
 
     return _rvs
@@ -0,0 +1,103 @@
+// Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+// Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+//
+// Distributed under the MIT License
+
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <vector>
+#include <omp.h>
+
+#ifndef real
+#define real float
+#endif
+
+extern "C"
+{
+    // out[shell[i]] += w_i |g_i|^2 over the half spectrum g of a real field
+    // on an n^d grid, stored as rows of n/2+1 complex numbers. w_i is 1 in
+    // the planes without a mirror image (k_last = 0 and the Nyquist plane
+    // for even n) and 2 elsewhere, which accounts for the omitted half.
+    // Shell indices >= num_shells are skipped. `out` is accumulated into,
+    // the partial sums of the threads are added in thread order.
+    void shell_sum(const real *g, const int32_t *shell, size_t num_rows,
+                   size_t n, int32_t num_shells, double *out, int num_threads)
+    {
+        size_t row_size = n / 2 + 1;
+        size_t nyquist = n % 2 ? row_size : n / 2;
+        std::vector<std::vector<double>> partial(
+            num_threads, std::vector<double>(num_shells + 1, 0.0));
+#pragma omp parallel num_threads(num_threads)
+        {
+            std::vector<double> &local = partial[omp_get_thread_num()];
+#pragma omp for schedule(static)
+            for (size_t r = 0; r < num_rows; ++r)
+            {
+                const real *gr = g + 2 * r * row_size;
+                const int32_t *sr = shell + r * row_size;
+                for (size_t x = 0; x < row_size; ++x)
+                {
+                    double power = (double)gr[2 * x] * gr[2 * x] +
+                                   (double)gr[2 * x + 1] * gr[2 * x + 1];
+                    int32_t s = sr[x] < num_shells ? sr[x] : num_shells;
+                    local[s] += (x == 0 || x == nyquist ? 1.0 : 2.0) * power;
+                }
+            }
+        }
+        for (const auto &local : partial)
+            for (int32_t s = 0; s < num_shells; ++s)
+                out[s] += local[s];
+    }
+
+    // plain[s] += R and projected[s] += w R d_i d_j / |d|^2 over the shells
+    // of the real n^3 array R, d being the minimum image displacement of
+    // each point from the origin; w = 1 for i == j and 2 otherwise. At the
+    // origin d_i d_j / |d|^2 is replaced by its isotropic average
+    // delta_ij / 3, on the planes d_i = n/2 its average over both images.
+    // Shell indices >= num_shells are skipped, the partial sums of the
+    // threads are added in thread order.
+    void correlation_shell_sum(const real *R, const int32_t *shell, size_t n,
+                               int i, int j, int32_t num_shells, double *plain,
+                               double *projected, int num_threads)
+    {
+        double w = i == j ? 1.0 : 2.0;
+        std::vector<std::vector<double>> partial(
+            num_threads, std::vector<double>(2 * (num_shells + 1), 0.0));
+#pragma omp parallel num_threads(num_threads)
+        {
+            std::vector<double> &local = partial[omp_get_thread_num()];
+#pragma omp for collapse(2) schedule(static)
+            for (size_t x0 = 0; x0 < n; ++x0)
+                for (size_t x1 = 0; x1 < n; ++x1)
+                {
+                    size_t row = (x0 * n + x1) * n;
+                    for (size_t x2 = 0; x2 < n; ++x2)
+                    {
+                        double d[3] = {
+                            x0 <= n / 2 ? (double)x0 : (double)x0 - n,
+                            x1 <= n / 2 ? (double)x1 : (double)x1 - n,
+                            x2 <= n / 2 ? (double)x2 : (double)x2 - n,
+                        };
+                        double r2 = d[0] * d[0] + d[1] * d[1] + d[2] * d[2];
+                        double dir = r2 > 0 ? d[i] * d[j] / r2 : (i == j) / 3.0;
+                        // +n/2 and -n/2 are the same image for even n
+                        if (i != j && n % 2 == 0 &&
+                            (std::abs(d[i]) == n / 2 || std::abs(d[j]) == n / 2))
+                            dir = 0.0;
+                        int32_t s = shell[row + x2] < num_shells
+                                        ? shell[row + x2]
+                                        : num_shells;
+                        local[s] += R[row + x2];
+                        local[num_shells + 1 + s] += w * dir * R[row + x2];
+                    }
+                }
+        }
+        for (const auto &local : partial)
+            for (int32_t s = 0; s < num_shells; ++s)
+            {
+                plain[s] += local[s];
+                projected[s] += local[num_shells + 1 + s];
+            }
+    }
+}
@@ -0,0 +1,97 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import ctypes
+import numpy as np
+from pathlib import Path
+from ..utils import threads
+from ..utils._build import build_library
+
+
+def _get_lib(ftype_name):
+    postfix, ftype_cname = {
+        "complex128": ("", "double"),
+        "complex64": ("f", "float"),
+    }[ftype_name]
+
+    path = Path(__file__).parent.resolve()
+    lpath = build_library(
+        f"shells{postfix}", Path(path, "shells.cpp"), defines={"real": ftype_cname}
+    )
+    lib = ctypes.cdll.LoadLibrary(lpath)
+    lib.shell_sum.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_void_p,
+        ctypes.c_size_t,
+        ctypes.c_size_t,
+        ctypes.c_int32,
+        ctypes.c_void_p,
+        ctypes.c_int,
+    ]
+    lib.correlation_shell_sum.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_void_p,
+        ctypes.c_size_t,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int32,
+        ctypes.c_void_p,
+        ctypes.c_void_p,
+        ctypes.c_int,
+    ]
+    return lib
+
+
+_lib_dict = {key: _get_lib(key) for key in ("complex64", "complex128")}
+
+
+def shell_index(kmag: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Bin of every mode as `np.histogram(kmag, edges)` counts it, modes
+    outside the edges get `len(edges) - 1`."""
+    index = np.searchsorted(edges, kmag, side="right").astype(np.int32) - 1
+    index[kmag == edges[-1]] = len(edges) - 2
+    index[(kmag < edges[0]) | (kmag > edges[-1])] = len(edges) - 1
+    return index
+
+
+def shell_sum(g, shell, num_shells, *, out=None, num_threads=None):
+    """Sum of |g|^2 per shell of the half spectrum `g` of a real field,
+    with the modes of the omitted half counted by symmetry."""
+    assert g.shape == shell.shape and shell.dtype == np.int32
+    assert g.flags.c_contiguous and shell.flags.c_contiguous
+    if out is None:
+        out = np.zeros(num_shells)
+    _lib_dict[g.dtype.name].shell_sum(
+        g.ctypes.data,
+        shell.ctypes.data,
+        g.size // g.shape[-1],
+        g.shape[0],
+        num_shells,
+        out.ctypes.data,
+        num_threads or threads.num_threads(),
+    )
+    return out
+
+
+def correlation_shell_sum(R, shell, i, j, plain, projected, *, num_threads=None):
+    """Adds the sums of the correlation `R` = R_ij(d) over the shells of
+    |d| to `plain`, and those of its projection onto d_i d_j / |d|^2 to
+    `projected` (twice for i != j, so the projections of all pairs i <= j
+    add up to the longitudinal correlation)."""
+    assert R.shape == shell.shape and shell.dtype == np.int32
+    assert R.ndim == 3 and R.shape.count(R.shape[0]) == 3
+    assert R.flags.c_contiguous and shell.flags.c_contiguous
+    _lib_dict[np.result_type(R, 1j).name].correlation_shell_sum(
+        R.ctypes.data,
+        shell.ctypes.data,
+        R.shape[0],
+        i,
+        j,
+        len(plain),
+        plain.ctypes.data,
+        projected.ctypes.data,
+        num_threads or threads.num_threads(),
+    )
+
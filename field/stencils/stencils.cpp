@@ -0,0 +1,229 @@
+// Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+// Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+//
+// Distributed under the MIT License
+
+#include <algorithm>
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <vector>
+#include <omp.h>
+
+#ifndef real
+#define real float
+#endif
+
+// Central differences on a periodic n^3 grid in C order, without
+// temporaries. Every output element is updated by the same sequence of
+// operations as `out -= sign*(a[x-1] - a[x+1])/h2` in numpy, h2 = 2*dx.
+
+// a[x-1] - a[x+1] along one axis for the elements of the row (x0, x1):
+// m[x2] - p[x2] inside the row, along the last axis the row itself wraps
+// around at both ends
+struct row_diff
+{
+    const real *m, *p;
+    size_t wrap;
+
+    row_diff(const real *a, int axis, size_t x0, size_t x1, size_t n)
+    {
+        size_t row = (x0 * n + x1) * n;
+        wrap = 0;
+        if (axis == 0)
+        {
+            m = a + ((x0 ? x0 - 1 : n - 1) * n + x1) * n;
+            p = a + ((x0 + 1 < n ? x0 + 1 : 0) * n + x1) * n;
+        }
+        else if (axis == 1)
+        {
+            m = a + (x0 * n + (x1 ? x1 - 1 : n - 1)) * n;
+            p = a + (x0 * n + (x1 + 1 < n ? x1 + 1 : 0)) * n;
+        }
+        else
+        {
+            m = a + row - 1;
+            p = a + row + 1;
+            wrap = n;
+        }
+    }
+
+    real first() const { return m[wrap] - p[0]; }
+    real last(size_t n) const { return m[n - 1] - p[n - 1 - wrap]; }
+};
+
+// Runs `body(x2, d)` along a row, where d(r) is the difference `r` at x2.
+// The inner loop leaves out the periodic ends, so it vectorizes.
+template <typename Body>
+static inline void along_row(size_t n, Body body)
+{
+    body(0, [](const row_diff &r)
+         { return r.first(); });
+    for (size_t x2 = 1; x2 + 1 < n; ++x2)
+        body(x2, [x2](const row_diff &r)
+             { return r.m[x2] - r.p[x2]; });
+    if (n > 1)
+        body(n - 1, [n](const row_diff &r)
+             { return r.last(n); });
+}
+
+// Index of the last of the sorted `edges` that is <= v, for edges[0] <= v.
+// Without branches on the data, which are unpredictable for histograms.
+static inline size_t last_edge(const double *edges, size_t num_edges, double v)
+{
+    const double *base = edges;
+    for (size_t len = num_edges; len > 1; len -= len / 2)
+        base = base[len / 2] <= v ? base + len / 2 : base;
+    return base - edges;
+}
+
+// out_k += d_j a, out_j -= d_k a: the contribution of one component to
+// the curl
+template <int j, int k>
+static void curl_step_axes(const real *a, real *out_j, real *out_k,
+                           size_t n, real h2, int num_threads)
+{
+#pragma omp parallel for collapse(2) schedule(static) num_threads(num_threads)
+    for (size_t x0 = 0; x0 < n; ++x0)
+        for (size_t x1 = 0; x1 < n; ++x1)
+        {
+            row_diff dj(a, j, x0, x1, n), dk(a, k, x0, x1, n);
+            real *__restrict oj = out_j + (x0 * n + x1) * n;
+            real *__restrict ok = out_k + (x0 * n + x1) * n;
+            along_row(n, [&](size_t x2, auto d)
+                      {
+                          ok[x2] -= d(dj) / h2;
+                          oj[x2] -= -d(dk) / h2; });
+        }
+}
+
+extern "C"
+{
+    void curl_step(const real *a, real *out_j, real *out_k, int j, int k,
+                   size_t n, real h2, int num_threads)
+    {
+        switch (3 * j + k)
+        {
+        case 1:
+            return curl_step_axes<0, 1>(a, out_j, out_k, n, h2, num_threads);
+        case 2:
+            return curl_step_axes<0, 2>(a, out_j, out_k, n, h2, num_threads);
+        case 3:
+            return curl_step_axes<1, 0>(a, out_j, out_k, n, h2, num_threads);
+        case 5:
+            return curl_step_axes<1, 2>(a, out_j, out_k, n, h2, num_threads);
+        case 6:
+            return curl_step_axes<2, 0>(a, out_j, out_k, n, h2, num_threads);
+        case 7:
+            return curl_step_axes<2, 1>(a, out_j, out_k, n, h2, num_threads);
+        }
+    }
+
+    // out = curl a, accumulated in the order of three curl steps
+    void curl(const real *a0, const real *a1, const real *a2,
+              real *out0, real *out1, real *out2,
+              size_t n, real h2, int num_threads)
+    {
+#pragma omp parallel for collapse(2) schedule(static) num_threads(num_threads)
+        for (size_t x0 = 0; x0 < n; ++x0)
+            for (size_t x1 = 0; x1 < n; ++x1)
+            {
+                row_diff d02(a0, 2, x0, x1, n), d01(a0, 1, x0, x1, n);
+                row_diff d10(a1, 0, x0, x1, n), d12(a1, 2, x0, x1, n);
+                row_diff d21(a2, 1, x0, x1, n), d20(a2, 0, x0, x1, n);
+                real *__restrict o0 = out0 + (x0 * n + x1) * n;
+                real *__restrict o1 = out1 + (x0 * n + x1) * n;
+                real *__restrict o2 = out2 + (x0 * n + x1) * n;
+                along_row(n, [&](size_t x2, auto d)
+                          {
+                              real c0 = 0, c1 = 0, c2 = 0;
+                              c1 -= d(d02) / h2;
+                              c2 -= -d(d01) / h2;
+                              c2 -= d(d10) / h2;
+                              c0 -= -d(d12) / h2;
+                              c0 -= d(d21) / h2;
+                              c1 -= -d(d20) / h2;
+                              o0[x2] = c0;
+                              o1[x2] = c1;
+                              o2[x2] = c2; });
+            }
+    }
+
+    // out = div a
+    void divergence(const real *a0, const real *a1, const real *a2, real *out,
+             size_t n, real h2, int num_threads)
+    {
+#pragma omp parallel for collapse(2) schedule(static) num_threads(num_threads)
+        for (size_t x0 = 0; x0 < n; ++x0)
+            for (size_t x1 = 0; x1 < n; ++x1)
+            {
+                row_diff d0(a0, 0, x0, x1, n), d1(a1, 1, x0, x1, n);
+                row_diff d2(a2, 2, x0, x1, n);
+                real *__restrict o = out + (x0 * n + x1) * n;
+                along_row(n, [&](size_t x2, auto d)
+                          {
+                              real c = 0;
+                              c -= d(d0) / h2;
+                              c -= d(d1) / h2;
+                              c -= d(d2) / h2;
+                              o[x2] = c; });
+            }
+    }
+
+    // Field line curvature |b x (b.grad)b| / |b|^3 of b = (a0, a1, a2) in
+    // one sweep. Written to `out` unless that is NULL, and counted into the
+    // histogram `counts` over `edges` (np.histogram's bins) unless that is
+    // NULL. Values outside the edges or NaN (b = 0) are not counted.
+    void curvature(const real *a0, const real *a1, const real *a2, real *out,
+                   const double *edges, size_t num_edges, int64_t *counts,
+                   size_t n, real h2, int num_threads)
+    {
+        const real *a[3] = {a0, a1, a2};
+        size_t num_bins = counts ? num_edges - 1 : 0;
+#pragma omp parallel num_threads(num_threads)
+        {
+            std::vector<real> buffer(out ? 0 : n);
+            std::vector<int64_t> local(num_bins, 0);
+#pragma omp for collapse(2) schedule(static)
+            for (size_t x0 = 0; x0 < n; ++x0)
+                for (size_t x1 = 0; x1 < n; ++x1)
+                {
+                    size_t row = (x0 * n + x1) * n;
+                    // d[i][j]: a_i along axis j
+                    row_diff d[3][3] = {
+                        {{a0, 0, x0, x1, n}, {a0, 1, x0, x1, n}, {a0, 2, x0, x1, n}},
+                        {{a1, 0, x0, x1, n}, {a1, 1, x0, x1, n}, {a1, 2, x0, x1, n}},
+                        {{a2, 0, x0, x1, n}, {a2, 1, x0, x1, n}, {a2, 2, x0, x1, n}},
+                    };
+                    const real *b0 = a[0] + row, *b1 = a[1] + row, *b2 = a[2] + row;
+                    real *__restrict o = out ? out + row : buffer.data();
+                    along_row(n, [&](size_t x2, auto diff)
+                              {
+                                  real c0 = b0[x2], c1 = b1[x2], c2 = b2[x2];
+                                  real k[3];
+                                  for (int i = 0; i < 3; ++i)
+                                      k[i] = -(c0 * diff(d[i][0]) + c1 * diff(d[i][1]) +
+                                               c2 * diff(d[i][2])) /
+                                             h2;
+                                  real x = c1 * k[2] - c2 * k[1];
+                                  real y = c2 * k[0] - c0 * k[2];
+                                  real z = c0 * k[1] - c1 * k[0];
+                                  real bb = c0 * c0 + c1 * c1 + c2 * c2;
+                                  o[x2] = std::sqrt(x * x + y * y + z * z) / (bb * std::sqrt(bb)); });
+                    for (size_t x2 = 0; num_bins && x2 < n; ++x2)
+                    {
+                        double v = o[x2];
+                        if (!(v >= edges[0] && v <= edges[num_bins]))
+                            continue;
+                        ++local[std::min(last_edge(edges, num_edges, v), num_bins - 1)];
+                    }
+                }
+            if (num_bins)
+            {
+#pragma omp critical
+                for (size_t i = 0; i < num_bins; ++i)
+                    counts[i] += local[i];
+            }
+        }
+    }
+}
@@ -0,0 +1,101 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import ctypes
+import numpy as np
+from pathlib import Path
+from ..utils import threads
+from ..utils._build import build_library
+
+
+def _get_lib(ftype_name):
+    cftype, postfix, ftype_cname = {
+        "float64": (ctypes.c_double, "", "double"),
+        "float32": (ctypes.c_float, "f", "float"),
+    }[ftype_name]
+
+    path = Path(__file__).parent.resolve()
+    lpath = build_library(
+        f"stencils{postfix}", Path(path, "stencils.cpp"), defines={"real": ftype_cname}
+    )
+    lib = ctypes.cdll.LoadLibrary(lpath)
+    p = ctypes.c_void_p
+    tail = [ctypes.c_size_t, cftype, ctypes.c_int]
+    lib.curl_step.argtypes = [p, p, p, ctypes.c_int, ctypes.c_int] + tail
+    lib.curl.argtypes = [p] * 6 + tail
+    lib.divergence.argtypes = [p] * 4 + tail
+    lib.curvature.argtypes = [p] * 5 + [ctypes.c_size_t, p] + tail
+    return lib
+
+
+_lib_dict = {key: _get_lib(key) for key in ("float32", "float64")}
+
+
+def supported(*arrays) -> bool:
+    """Whether the stencils apply: C contiguous n^3 grids of one type."""
+    a = arrays[0]
+    return (
+        a.dtype.name in _lib_dict
+        and a.ndim == 3
+        and a.shape[0] >= 2
+        and all(
+            b.shape == a.shape
+            and b.dtype == a.dtype
+            and b.flags.c_contiguous
+            and a.shape.count(a.shape[0]) == 3
+            for b in arrays
+        )
+    )
+
+
+def _call(name, arrays, *args, dx, num_threads):
+    a = arrays[0]
+    getattr(_lib_dict[a.dtype.name], name)(
+        *(b.ctypes.data for b in arrays),
+        *args,
+        a.shape[0],
+        2 * dx,
+        num_threads or threads.num_threads(),
+    )
+
+
+def curl_step(a, out_j, out_k, j, k, *, dx, num_threads=None):
+    """out_k += d_j a, out_j -= d_k a, with central differences."""
+    _call("curl_step", (a, out_j, out_k), j, k, dx=dx, num_threads=num_threads)
+
+
+def curl(a, out, *, dx, num_threads=None):
+    """out = curl a, for sequences of three components."""
+    _call("curl", (*a, *out), dx=dx, num_threads=num_threads)
+    return out
+
+
+def div(a, out, *, dx, num_threads=None):
+    """out = div a, for a sequence of three components."""
+    _call("divergence", (*a, out), dx=dx, num_threads=num_threads)
+    return out
+
+
+def curvature(b, out=None, edges=None, *, dx, num_threads=None):
+    """Field line curvature |b x (b.grad)b| / |b|^3 into `out`, and its
+    histogram over the bin `edges` (see `np.histogram`) if these are given.
+    Either can be left out, without `out` the curvature is never stored.
+    Returns the histogram counts or `out`."""
+    counts = None
+    if edges is not None:
+        edges = np.ascontiguousarray(edges, dtype=np.float64)
+        assert edges.ndim == 1 and len(edges) >= 2
+        counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    _call(
+        "curvature",
+        b,
+        None if out is None else out.ctypes.data,
+        None if edges is None else edges.ctypes.data,
+        0 if edges is None else len(edges),
+        None if counts is None else counts.ctypes.data,
+        dx=dx,
+        num_threads=num_threads,
+    )
+    return out if counts is None else counts
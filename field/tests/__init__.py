@@ -0,0 +1,24 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import tempfile
+import numpy as np
+from field.basefield import Precision
+from field.cascade import Cascade3D
+
+# FFTW wisdom of the test fields, kept apart from the one of real runs
+_wisdom = tempfile.TemporaryDirectory(prefix="synth-mag-turb-tests-")
+
+
+def random_field(
+    grid_size: int = 16, precision: Precision = Precision.DOUBLE, seed: int = 0, **kwds
+) -> Cascade3D:
+    """Small `Cascade3D` with normal random numbers in `res`."""
+    kwds.setdefault("num_threads", 2)
+    field = Cascade3D(
+        "test", grid_size, precision=precision, wisdom_path=_wisdom.name, **kwds
+    )
+    field.res[:] = np.random.default_rng(seed).standard_normal(field.res.shape)
+    return field
@@ -0,0 +1,56 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from field.basefield import Precision
+from field.tests import _wisdom, random_field
+from field.utils import autotune
+
+
+class test_tune_cascade(unittest.TestCase):
+    """Every test writes its block sizes to a table of its own."""
+
+    args = (3, 0.5, 5 / 3, 0.25)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = Path(self.tmp.name, "block-sizes.json")
+        self.table = mock.patch.object(autotune, "_table_path", lambda: path)
+        self.table.start()
+        autotune._tuned.cache_clear()
+
+    def tearDown(self):
+        self.table.stop()
+        autotune._tuned.cache_clear()
+        self.tmp.cleanup()
+
+    def block_sizes(self, field):
+        field(*self.args, write_field=False)
+        return {expr: kernel[0].block_size for expr, kernel in field._kernels.items()}
+
+    def test_both_kernel_forms(self):
+        best = autotune.tune_cascade(
+            16,
+            Precision.DOUBLE,
+            self.args,
+            wisdom_path=_wisdom.name,
+            block_sizes=(256,),
+            repeat=1,
+        )
+        assert set(best.values()) == {256}
+        # a default field computes its filters, the other one tabulates them
+        computed = self.block_sizes(random_field(16))
+        assert any("exp(" in str(expr) for expr in computed)
+        tabulated = self.block_sizes(random_field(16, kernel_cache_size=1 << 30))
+        assert computed.keys() != tabulated.keys()
+        for sizes in (computed, tabulated):
+            assert set(sizes.values()) == {256}, sizes
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+from field.basefield import Precision
+from field.tests import random_field
+from field.utils.derivatives import Derivative
+
+
+class test_kernel_tables(unittest.TestCase):
+    n = 8
+
+    def table_bytes(self, field):
+        return int(np.prod(field._bwd_tuple)) * field.ftype.itemsize
+
+    def cached(self, field):
+        return [key[0] for key in field._kernel_tables]
+
+    def test_eviction(self):
+        field = random_field(self.n)
+        field.kernel_cache_size = 2 * self.table_bytes(field)
+        field._gaussian_kernel(0.1)
+        field._lowpass_kernel()
+        assert self.cached(field) == ["indicator", "lowpass"]
+        # a hit makes the indicator the most recently used table
+        expr, variables = field._gaussian_kernel(0.1)
+        assert expr == "table"
+        assert variables["table"] is field._kernel_tables[("indicator", 0.1)]
+        field._mexican_hat_kernel(0.2)
+        assert self.cached(field) == ["indicator", "wavelet"]
+        total = sum(t.nbytes for t in field._kernel_tables.values())
+        assert total <= field.kernel_cache_size
+
+    def test_tables_match_expressions(self):
+        field = random_field(self.n)
+        kernels = [
+            (field._gaussian_kernel, (0.1,)),
+            (field._mexican_hat_kernel, (0.2,)),
+            (field._lowpass_kernel, (3, 4, 1.5)),
+        ]
+        expected = []
+        for kernel, args in kernels:
+            expr, variables = kernel(*args)
+            assert expr != "table"
+            out = np.empty(field._bwd_tuple, dtype=field.ftype)
+            expected.append(field._eval(expr, variables, out=out))
+        field.kernel_cache_size = 3 * self.table_bytes(field)
+        for (kernel, args), x in zip(kernels, expected):
+            expr, variables = kernel(*args)
+            assert expr == "table"
+            assert_allclose(variables["table"], x, rtol=1e-14, atol=0)
+
+    def test_budget_below_one_table(self):
+        field = random_field(self.n)
+        field.kernel_cache_size = self.table_bytes(field) - 1
+        expr, variables = field._gaussian_kernel(0.1)
+        assert expr != "table" and variables == {"scale": 0.1}
+        assert not field._kernel_tables
+
+    def test_spectrum_reuses_kmag_table(self):
+        field = random_field(self.n)
+        expected = field.spectrum(4)
+        field.kernel_cache_size = 2 * self.table_bytes(field)
+        field._shell_index.clear()
+        for x, y in zip(expected, field.spectrum(4)):
+            assert_array_equal(x, y)
+        table = field._kernel_tables[("kmag",)]
+        # new bins index the shells again, from the cached magnitudes
+        field.spectrum(3)
+        assert field._kernel_tables[("kmag",)] is table
+        field._gaussian_kernel(0.1)
+        field._lowpass_kernel()
+        assert self.cached(field) == ["indicator", "lowpass"]
+
+
+class test_project(unittest.TestCase):
+    def test_solenoidal_and_idempotent(self):
+        for scheme in Derivative:
+            for precision in Precision:
+                field = random_field(16, precision, derivative=scheme)
+                eps = np.finfo(field.ftype).eps
+                before = np.abs(field.div("f")).max()
+                projected = field.project().copy()
+                # roundoff of the transforms, relative to the divergence removed
+                assert np.abs(field.div("f")).max() < 10 * eps * before, scheme
+                field.project()
+                assert_allclose(
+                    field.res,
+                    projected,
+                    rtol=0,
+                    atol=10 * eps * np.abs(projected).max(),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,23 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import unittest
+import numpy as np
+from numpy.testing import assert_array_equal
+from field.tests import random_field
+
+
+class test_cascade(unittest.TestCase):
+    args = (3, 0.5, 5 / 3, 0.25)
+
+    def test_res_zero_without_curl(self):
+        field = random_field(16)
+        field._call_impl(*self.args, apply_curl=False)
+        assert_array_equal(field.res, 0)
+        assert np.any(field._v != 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
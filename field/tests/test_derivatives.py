@@ -0,0 +1,267 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import unittest
+from contextlib import nullcontext
+from unittest import mock
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+from field.basefield import Precision
+from field.stencils import stencils
+from field.tests import random_field
+from field.utils.derivatives import Derivative
+from field.utils.statistics import Histogram
+
+# (i, j, k) with (curl a)_i = d_j a_k - d_k a_j
+CURL_AXES = ((0, 1, 2), (1, 2, 0), (2, 0, 1))
+
+# relative to the largest value
+TOLERANCE = {Precision.SINGLE: 1e-6, Precision.DOUBLE: 1e-13}
+
+# weights c_m of d/dx a = sum_m c_m (a[x+m] - a[x-m]) / dx
+WEIGHTS = {
+    Derivative.CENTRAL2: (1 / 2,),
+    Derivative.CENTRAL4: (2 / 3, -1 / 12),
+    Derivative.CENTRAL6: (3 / 4, -3 / 20, 1 / 60),
+}
+
+
+def central(a, axis, dx, scheme=Derivative.CENTRAL2):
+    return sum(
+        c * (np.roll(a, -m, axis) - np.roll(a, m, axis)) / dx
+        for m, c in enumerate(WEIGHTS[scheme], start=1)
+    )
+
+
+def spectral(a, axis, dx):
+    """Derivative of the Fourier series of `a`, without the Nyquist mode."""
+    n = a.shape[axis]
+    k = 2 * np.pi * np.fft.fftfreq(n, dx)
+    k[n // 2] = 0
+    shape = [1] * a.ndim
+    shape[axis] = n
+    return np.fft.ifft(1j * k.reshape(shape) * np.fft.fft(a, axis=axis), axis=axis).real
+
+
+def derivative(scheme, dx):
+    if scheme is Derivative.SPECTRAL:
+        return lambda a, i: spectral(a, i, dx)
+    return lambda a, i: central(a, i, dx, scheme)
+
+
+def numpy_curl(b, diff):
+    return np.array([diff(b[k], j) - diff(b[j], k) for _, j, k in CURL_AXES])
+
+
+def numpy_div(b, diff):
+    return sum(diff(b[i], i) for i in range(3))
+
+
+def assert_close(actual, desired, tolerance):
+    desired = np.asarray(desired, dtype=np.float64)
+    assert_allclose(actual, desired, rtol=0, atol=tolerance * np.abs(desired).max())
+
+
+def without_native_stencils():
+    return mock.patch.object(stencils, "supported", lambda *arrays: False)
+
+
+class test_native_stencils(unittest.TestCase):
+    def fields(self):
+        for precision in Precision:
+            field = random_field(16, precision)
+            assert stencils.supported(field._f, *field.res, *field._e)
+            b = field.res.astype(np.float64)
+            yield field, b, TOLERANCE[precision]
+
+    def test_curl(self):
+        for field, b, tolerance in self.fields():
+            expected = numpy_curl(b, lambda a, i: central(a, i, field.dx))
+            native = field.curl("e").copy()
+            assert_close(native, expected, tolerance)
+            with without_native_stencils():
+                fallback = field.curl("e")
+            assert_close(native, fallback, tolerance)
+
+    def test_div(self):
+        for field, b, tolerance in self.fields():
+            expected = numpy_div(b, lambda a, i: central(a, i, field.dx))
+            native = field.div("f").copy()
+            assert_close(native, expected, tolerance)
+            with without_native_stencils():
+                fallback = field.div("f")
+            assert_close(native, fallback, tolerance)
+
+    def test_curl_steps(self):
+        # the steps of `_curl` add up to the curl of the inputs
+        for field, b, tolerance in self.fields():
+            expected = numpy_curl(b, lambda a, i: central(a, i, field.dx))
+            results = []
+            for patch in (nullcontext(), without_native_stencils()):
+                with patch:
+                    field._e[:] = 0
+                    for i in range(3):
+                        field._curl_step(i, in_=f"res{i}", out="e")
+                results.append(field._e.copy())
+            assert_close(results[0], expected, tolerance)
+            assert_close(results[0], results[1], tolerance)
+
+
+def analytic_field(n, precision=Precision.DOUBLE, **kwds):
+    """Field whose `res` is a smooth periodic field bounded away from zero,
+    band-limited so that its spectral derivatives are exact."""
+    field = random_field(n, precision, **kwds)
+    field.name = "analytic"
+    x = 2 * np.pi * np.arange(n) * field.dx
+    x, y, z = np.meshgrid(x, x, x, indexing="ij", sparse=True)
+    field.res[0] = np.sin(y) * np.cos(z) + np.sin(x)
+    field.res[1] = np.sin(z) * np.cos(x) + np.cos(y)
+    field.res[2] = np.sin(x) * np.cos(y) + np.sin(z) + 3
+    return field
+
+
+def numpy_curv(b, diff):
+    kappa = np.array([sum(b[j] * diff(b[i], j) for j in range(3)) for i in range(3)])
+    return (
+        np.linalg.norm(np.cross(b, kappa, axis=0), axis=0)
+        / np.linalg.norm(b, axis=0) ** 3
+    )
+
+
+class test_schemes(unittest.TestCase):
+    def test_within_rounding(self):
+        # the lazy stencils and the spectral paths against numpy
+        for scheme in (Derivative.CENTRAL4, Derivative.CENTRAL6, Derivative.SPECTRAL):
+            for precision in Precision:
+                field = random_field(16, precision, derivative=scheme)
+                b = field.res.astype(np.float64)
+                diff = derivative(scheme, field.dx)
+                tolerance = 4 * TOLERANCE[precision]
+                assert_close(field.curl("e"), numpy_curl(b, diff), tolerance)
+                assert_close(field.div("f"), numpy_div(b, diff), tolerance)
+
+    def errors(self, scheme, n):
+        field = analytic_field(n, derivative=scheme)
+        b = field.res.copy()
+        exact = derivative(Derivative.SPECTRAL, field.dx)
+        results = {
+            "curl": (field.curl("e").copy(), numpy_curl(b, exact)),
+            "div": (field.div("f").copy(), numpy_div(b, exact)),
+            "curv": (field.curv("e"), numpy_curv(b, exact)),
+        }
+        return {
+            name: np.abs(x - y).max() / np.abs(y).max()
+            for name, (x, y) in results.items()
+        }
+
+    def test_convergence_order(self):
+        for scheme in (Derivative.CENTRAL2, Derivative.CENTRAL4, Derivative.CENTRAL6):
+            coarse, fine = self.errors(scheme, 16), self.errors(scheme, 32)
+            for name in coarse:
+                order = np.log2(coarse[name] / fine[name])
+                assert order > scheme.value - 0.2, (scheme, name, order)
+
+    def test_spectral_exact(self):
+        for name, error in self.errors(Derivative.SPECTRAL, 16).items():
+            assert error < 1e-13, (name, error)
+
+
+class test_curvature(unittest.TestCase):
+    def test_native_kernel(self):
+        for precision in Precision:
+            for field in (random_field(16, precision), analytic_field(16, precision)):
+                assert field._native_curvature()
+                b = field.res.astype(np.float64)
+                expected = numpy_curv(b, lambda a, i: central(a, i, field.dx))
+                native = field.curv("e").copy()
+                with without_native_stencils():
+                    assert not field._native_curvature()
+                    lazy = field.curv("e")
+                if precision is Precision.DOUBLE:
+                    atol = 1e-13 * np.abs(expected).max()
+                    assert_allclose(native, expected, rtol=1e-12, atol=atol)
+                    assert_allclose(native, lazy, rtol=1e-12, atol=atol)
+                elif field.name == "analytic":
+                    # a random field has points of nearly parallel b and
+                    # (b.grad)b, where single precision loses all digits
+                    assert_close(native, expected, 1e-6)
+                    assert_close(native, lazy, 1e-6)
+
+    def test_histogram(self):
+        edges = np.geomspace(1e-2, 1e4, 41)
+        for precision in Precision:
+            field = random_field(16, precision)
+            curv = field.curv("e").copy()
+            counts = field.curv_histogram(edges)
+            assert_array_equal(counts, np.histogram(curv, edges)[0])
+            with without_native_stencils():
+                assert_array_equal(field.curv_histogram(edges), counts)
+            hist = Histogram(edges)
+            field.curv_histogram(hist)
+            field.curv_histogram(hist)
+            assert_array_equal(hist.counts, 2 * counts)
+
+
+class test_gradient_statistics(unittest.TestCase):
+    names = ("j", "lambda1", "lambda2", "lambda3", "Q", "R")
+
+    def reference(self, field):
+        """The quantities of `gradient_statistics` from the whole tensor,
+        with sixth order differences for spectral fields."""
+        scheme = field.derivative
+        if scheme is Derivative.SPECTRAL:
+            scheme = Derivative.CENTRAL6
+        b = field.res.astype(np.float64)
+        a = np.array(
+            [[central(b[i], j, field.dx, scheme) for j in range(3)] for i in range(3)]
+        )
+        j = np.linalg.norm([a[k, j] - a[j, k] for _, j, k in CURL_AXES], axis=0)
+        # components last, for the batched linear algebra
+        a = np.moveaxis(a, (0, 1), (-2, -1))
+        eigenvalues = np.linalg.eigvalsh((a + np.swapaxes(a, -2, -1)) / 2)
+        aa = a @ a
+        q = -np.trace(aa, axis1=-2, axis2=-1) / 2
+        r = -np.trace(aa @ a, axis1=-2, axis2=-1) / 3
+        return dict(zip(self.names, (j, *np.moveaxis(eigenvalues, -1, 0), q, r)))
+
+    def test_moments(self):
+        for scheme in Derivative:
+            for precision in Precision:
+                field = random_field(16, precision, derivative=scheme)
+                expected = self.reference(field)
+                for slab in (None, 3, 16):
+                    result = field.gradient_statistics(slab=slab)
+                    for name, x in expected.items():
+                        k = np.arange(1, 5)[:, None]
+                        error = np.abs(
+                            result[name]["moments"] - np.mean(x.ravel() ** k, axis=1)
+                        )
+                        # odd moments relative to the moments of |x|
+                        error /= np.mean(np.abs(x.ravel()) ** k, axis=1)
+                        tolerance = 10 * TOLERANCE[precision]
+                        assert np.all(error < tolerance), (scheme, name, error)
+                        assert "histogram" not in result[name]
+                    assert "RQ" not in result
+
+    def test_histograms(self):
+        field = random_field(16)
+        expected = self.reference(field)
+        bins = {
+            name: np.linspace(-1, 1, 21) * np.abs(x).max() / 2
+            for name, x in expected.items()
+        }
+        bins["j"] = np.geomspace(1e-1, 1e1, 11) * np.median(expected["j"])
+        qr_bins = (bins["R"], bins["Q"][::2])
+        result = field.gradient_statistics(bins, qr_bins=qr_bins, slab=5)
+        for name, x in expected.items():
+            assert_array_equal(
+                result[name]["histogram"], np.histogram(x, bins[name])[0]
+            )
+        rq = np.histogram2d(expected["R"].ravel(), expected["Q"].ravel(), qr_bins)[0]
+        assert_array_equal(result["RQ"]["histogram"], rq)
+
+
+if __name__ == "__main__":
+    unittest.main()
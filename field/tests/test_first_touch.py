@@ -0,0 +1,58 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import mmap
+import unittest
+import numpy as np
+from numpy.testing import assert_array_equal
+from field.first_touch import first_touch
+
+
+class test_zeros(unittest.TestCase):
+    def check(self, shape, dtype, **kwds):
+        out = first_touch.zeros(shape, dtype, **kwds)
+        assert out.shape == tuple(np.atleast_1d(shape))
+        assert out.dtype == np.dtype(dtype)
+        assert out.flags.c_contiguous and out.flags.writeable
+        assert_array_equal(out, 0)
+        out[...] = 1
+        assert_array_equal(out, 1)
+        return out
+
+    def test_shapes_and_types(self):
+        for shape in ((16, 16, 9), (3, 8, 8, 8), (1001,), 7):
+            for dtype in (np.float32, np.float64, np.complex64, np.int32):
+                for num_threads in (1, 3):
+                    out = self.check(shape, dtype, num_threads=num_threads)
+                    assert out.ctypes.data % mmap.PAGESIZE == 0
+
+    def test_empty(self):
+        for shape in ((0,), (3, 0, 2), ()):
+            self.check(shape, np.float64, num_threads=2)
+
+    def test_sizes_around_pages(self):
+        page = mmap.PAGESIZE
+        for size in (page - 8, page, page + 8, 5 * page + 24):
+            self.check(size // 8, np.float64, num_threads=4)
+
+    def test_huge_page_alignment(self):
+        huge = first_touch.HUGE_PAGE_SIZE
+        for size in (huge, 3 * huge + 4096 + 16):
+            out = self.check(size // 8, np.float64, num_threads=3)
+            if hasattr(mmap, "MADV_HUGEPAGE"):
+                assert out.ctypes.data % huge == 0
+            small = self.check(size // 8, np.float64, huge_pages=False)
+            assert small.ctypes.data % mmap.PAGESIZE == 0
+
+    def test_buffers_independent(self):
+        a = first_touch.zeros((64, 64), np.float64, num_threads=2)
+        b = first_touch.zeros((64, 64), np.float64, num_threads=2)
+        a[...] = 1
+        assert not np.may_share_memory(a, b)
+        assert_array_equal(b, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
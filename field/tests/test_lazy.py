@@ -0,0 +1,130 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+from field.tests import random_field
+from field.utils.lazy import Vec, sqrt
+
+
+class test_shift(unittest.TestCase):
+    def setUp(self):
+        self.field = random_field(12)
+        self.a = self.field.res[0].copy()
+
+    def test_wraparound(self):
+        a = self.field.var("res0")
+        for axis in range(3):
+            for offset in (1, -1, 3, -5, 6, -6, 11, -11, 12, 13, -13, 24, -25, 31):
+                out = self.field.assign("f", a.shift(axis, offset))
+                assert_array_equal(out, np.roll(self.a, -offset, axis=axis))
+
+    def test_combined_shifts(self):
+        a = self.field.var("res0")
+        expr = a.shift(0, 2).shift(1, -1) - 2 * a.shift(2, 1).shift(2, 1)
+        expected = np.roll(self.a, (-2, 1), axis=(0, 1)) - 2 * np.roll(
+            self.a, -2, axis=2
+        )
+        assert_allclose(self.field.assign("f", expr), expected, rtol=1e-14)
+        # shifts that cancel read the buffer in place
+        assert a.shift(1, 3).shift(1, -3).args[1] == ()
+
+    def test_non_contiguous_out(self):
+        # boundary planes and bulk are gathered instead of flat views
+        a = self.field.var("res0")
+        out = np.empty(self.a.shape[::-1]).T
+        self.field.assign(out, a.shift(0, 1) * a.shift(2, -1))
+        assert_allclose(
+            out,
+            np.roll(self.a, -1, axis=0) * np.roll(self.a, 1, axis=2),
+            rtol=1e-14,
+        )
+
+    def test_reduce_sum(self):
+        a = self.field.var("res0")
+        total = self.field.reduce_sum((a.shift(0, 1) - a) ** 2)
+        assert_allclose(total, np.sum((np.roll(self.a, -1, axis=0) - self.a) ** 2))
+        # offsets past the axis length, on the gathered boundary planes too
+        total = self.field.reduce_sum(a.shift(1, 25) * a.shift(2, -14))
+        expected = np.roll(self.a, -25, axis=1) * np.roll(self.a, 14, axis=2)
+        assert_allclose(total, np.sum(expected))
+
+
+class test_scratch(unittest.TestCase):
+    def setUp(self):
+        self.field = random_field(8)
+
+    def test_release_and_reuse(self):
+        expr = self.field.var("res0") * 2
+        buf = self.field._scratch(expr)
+        assert buf.shape == self.field._fwd_tuple and buf.dtype == self.field.ftype
+        self.field._release([buf])
+        assert self.field._scratch(expr) is buf
+        assert not self.field._scratch_pool
+
+    def test_pool_matches_shape_and_type(self):
+        real = self.field._buffer(self.field._bwd_tuple, self.field.ftype)
+        self.field._release([real])
+        spectrum = self.field._buffer(self.field._bwd_tuple, self.field.ctype)
+        assert spectrum is not real and spectrum.dtype == self.field.ctype
+        self.field._release([spectrum])
+        assert self.field._buffer(self.field._bwd_tuple, self.field.ftype) is real
+
+    def test_staging_does_not_grow_pool(self):
+        a = self.field.var("res0")
+        self.field.assign("res0", a.shift(0, 1) + a)
+        pool = len(self.field._scratch_pool)
+        for _ in range(3):
+            self.field.assign("res0", a.shift(0, 1) + a)
+        assert len(self.field._scratch_pool) == pool
+
+
+class test_assign_aliasing(unittest.TestCase):
+    def setUp(self):
+        self.field = random_field(10)
+        self.b = self.field.res.copy()
+
+    def test_out_read_at_offset(self):
+        a = self.field.var("res1")
+        self.field.assign("res1", a.shift(1, 1) - a.shift(1, -1))
+        assert_allclose(
+            self.field.res[1],
+            np.roll(self.b[1], -1, axis=1) - np.roll(self.b[1], 1, axis=1),
+            rtol=1e-14,
+        )
+
+    def test_out_read_in_place(self):
+        a = self.field.var("res2")
+        self.field.assign("res2", sqrt(a * a) + a)
+        assert_allclose(self.field.res[2], np.abs(self.b[2]) + self.b[2], rtol=1e-14)
+
+    def test_vec_permutation(self):
+        b = self.field.var("res")
+        self.field.assign("res", Vec([b[1], b[2], b[0]]))
+        assert_array_equal(self.field.res, self.b[[1, 2, 0]])
+
+    def test_vec_of_one_component(self):
+        # a single pass with one output, with and without shifted reads
+        a = self.field.var("res1")
+        self.field.assign("res", Vec([a * 2]))
+        assert_array_equal(self.field.res[0], 2 * self.b[1])
+        self.field.assign("res", Vec([a.shift(2, 1) - a]))
+        assert_array_equal(
+            self.field.res[0], np.roll(self.b[1], -1, axis=2) - self.b[1]
+        )
+        assert_array_equal(self.field.res[1:], self.b[1:])
+
+    def test_vec_reads_written_output_at_offset(self):
+        b = self.field.var("res")
+        self.field.assign("res", Vec(b[(i + 1) % 3].shift(i, 1) for i in range(3)))
+        for i in range(3):
+            assert_array_equal(
+                self.field.res[i], np.roll(self.b[(i + 1) % 3], -1, axis=i)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
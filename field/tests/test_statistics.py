@@ -0,0 +1,360 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+from field.basefield import Precision
+from field.tests import random_field
+from field.utils.statistics import Histogram, _trapezoid
+
+# relative to the largest value
+TOLERANCE = {Precision.SINGLE: 1e-5, Precision.DOUBLE: 1e-12}
+
+
+def wavenumbers(n):
+    """Integer wavenumbers of the full n^3 spectrum, as (kx, ky, kz)."""
+    k = np.fft.fftfreq(n, 1 / n)
+    return np.meshgrid(k, k, k, indexing="ij", sparse=True)
+
+
+class test_spectrum(unittest.TestCase):
+    def reference(self, field, edges, magnitudes=None):
+        """Shell histograms of the full FFT of every component."""
+        kx, ky, kz = wavenumbers(field.grid_size)
+        if magnitudes is None:
+            magnitudes = np.sqrt(kx**2 + ky**2 + kz**2)
+        magnitudes = np.broadcast_to(magnitudes, field._fwd_tuple)
+        return [
+            np.histogram(
+                magnitudes,
+                edges,
+                weights=np.abs(np.fft.fftn(b.astype(np.float64))) ** 2,
+                density=True,
+            )[0]
+            for b in field.res
+        ]
+
+    def test_full_spectrum(self):
+        for precision in Precision:
+            field = random_field(16, precision)
+            kbins, _ = field.kbins()
+            for bins in (4, kbins, np.linspace(0.5, 9.5, 10)):
+                edges = np.histogram_bin_edges(
+                    np.sqrt(3) * np.arange(field.grid_size // 2 + 1), bins
+                )
+                for S, expected in zip(
+                    field.spectrum(bins), self.reference(field, edges)
+                ):
+                    assert_allclose(
+                        S,
+                        expected,
+                        rtol=0,
+                        atol=TOLERANCE[precision] * expected.max(),
+                    )
+
+    def test_kmag_out(self):
+        field = random_field(16)
+        kmag = np.empty(field._bwd_tuple, dtype=field.ftype)
+        expected = field.spectrum(4)
+        for S, x in zip(field.spectrum(4, kmag), expected):
+            assert_allclose(S, x, rtol=1e-14)
+        kx, ky, kz = wavenumbers(field.grid_size)
+        half = np.sqrt(kx**2 + ky**2 + kz**2)[..., : field.grid_size // 2 + 1]
+        assert_allclose(kmag, half, rtol=1e-14)
+
+    def test_magnitudes(self):
+        # shells of |k_x| instead of |k|
+        field = random_field(16)
+        kx, _, _ = wavenumbers(field.grid_size)
+        magnitudes = np.broadcast_to(
+            np.abs(kx)[..., : field.grid_size // 2 + 1], field._bwd_tuple
+        )
+        edges = np.arange(field.grid_size // 2 + 2) - 0.5
+        expected = self.reference(field, edges, np.abs(kx))
+        for S, x in zip(field.spectrum(edges, magnitudes=magnitudes), expected):
+            assert_allclose(S, x, rtol=0, atol=1e-12 * x.max())
+
+
+def increments(b, axis, lag, kind):
+    """Samples of the increments b(x + lag e_axis) - b(x), formed in the
+    precision of `b` like the kernel does."""
+    db = np.roll(b, -lag, axis=axis + 1) - b
+    if kind == "vector":
+        return np.sqrt(np.sum(db.astype(np.float64) ** 2, axis=0)).astype(b.dtype)
+    if kind == "longitudinal":
+        return db[axis]
+    return db[[(axis + 1) % 3, (axis + 2) % 3]]
+
+
+class test_structure_functions(unittest.TestCase):
+    lags = (1, 3, 8, -2, 17)
+    orders = (1, 2, 3, 6)
+
+    def test_moments_and_pdfs(self):
+        bins = np.linspace(-2, 2, 17)
+        for precision in Precision:
+            field = random_field(16, precision)
+            b = field.res.copy()
+            for kind in ("vector", "longitudinal", "transverse"):
+                S, pdfs = field.structure_functions(
+                    self.lags, self.orders, kind=kind, bins=bins
+                )
+                assert S.shape == (3, len(self.lags), len(self.orders))
+                assert pdfs.shape == (3, len(self.lags), len(bins) - 1)
+                for axis in range(3):
+                    for j, lag in enumerate(self.lags):
+                        x = increments(b, axis, lag, kind)
+                        moments = [
+                            np.mean(np.abs(x.astype(np.float64)) ** p)
+                            for p in self.orders
+                        ]
+                        assert_allclose(S[axis, j], moments, rtol=1e-12)
+                        # samples beyond the edges are left out, as in numpy
+                        pdf = np.histogram(x, bins, density=True)[0]
+                        assert_allclose(pdfs[axis, j], pdf, rtol=1e-12)
+
+    def test_repeatable(self):
+        # partial sums are merged in thread order, not as threads finish
+        bins = np.linspace(0, 4, 9)
+        for precision in Precision:
+            field = random_field(16, precision, num_threads=4)
+            S, pdfs = field.structure_functions(self.lags, kind="vector", bins=bins)
+            for _ in range(5):
+                T, qdfs = field.structure_functions(self.lags, kind="vector", bins=bins)
+                assert_array_equal(T, S)
+                assert_array_equal(qdfs, pdfs)
+
+    def test_axes(self):
+        field = random_field(16)
+        S = field.structure_functions(self.lags, kind="transverse")
+        assert S.shape == (3, len(self.lags), 8)
+        assert_allclose(
+            field.structure_functions(self.lags, kind="transverse", axes=(2, 0)),
+            S[[2, 0]],
+            rtol=1e-14,
+        )
+
+
+class test_histogram(unittest.TestCase):
+    def data(self, edges, dtype):
+        """Normal samples spread over twice the range of `edges`, the edges
+        themselves and values just outside them."""
+        lo, hi = edges[0], edges[-1]
+        x = np.random.default_rng(1).standard_normal(10_000)
+        x = (lo + hi) / 2 + (hi - lo) * x
+        outside = [np.nextafter(lo, -np.inf), np.nextafter(hi, np.inf), -np.inf]
+        return np.concatenate([x, edges, outside]).astype(dtype)
+
+    def test_edges(self):
+        histograms = [
+            (Histogram.linear(-1.5, 2.5, 20), "linear"),
+            (Histogram(np.linspace(0, 1, 11)), "linear"),
+            (Histogram.log(1e-3, 1e2, 25), "log"),
+            (Histogram(np.geomspace(0.1, 10, 9)), "log"),
+            (Histogram([-3, -1, -0.5, 0, 0.1, 2, 7]), None),
+            (Histogram([0, 1]), None),
+        ]
+        for hist, scale in histograms:
+            assert hist.scale == scale
+            for dtype in (np.float32, np.float64):
+                data = self.data(hist.edges, dtype)
+                expected = np.histogram(data, hist.edges)[0]
+                counts = Histogram(hist.edges, hist.scale).add(data).counts
+                assert_array_equal(counts, expected, err_msg=f"{scale} {dtype}")
+
+    def test_accumulate(self):
+        edges = np.linspace(-2, 2, 9)
+        x, y = self.data(edges, np.float64), self.data(edges[::2], np.float64)
+        a, b = Histogram(edges).add(x), Histogram(edges).add(y, num_threads=3)
+        a += b
+        assert_array_equal(a.counts, np.histogram(np.append(x, y), edges)[0])
+        assert_allclose(
+            a.density(), np.histogram(np.append(x, y), edges, density=True)[0]
+        )
+        with self.assertRaises(ValueError):
+            a += Histogram(edges[1:])
+
+    def test_field_data(self):
+        edges = np.geomspace(1e-2, 10, 16)
+        irregular = [-4, -1, 0, 0.5, 3]
+        for precision in Precision:
+            field = random_field(12, precision)
+            b = field.res.astype(np.float64)
+            for bins, data, expected in (
+                (irregular, "res1", b[1]),
+                (irregular, field.res[2], b[2]),
+                (edges, field.var("res0") ** 2 + 1e-2, b[0] ** 2 + 1e-2),
+                (irregular, field.var("res0") - field.var("res2"), b[0] - b[2]),
+            ):
+                hist = field.histogram(data, Histogram(bins))
+                counts = np.histogram(expected, bins)[0]
+                if precision is Precision.DOUBLE:
+                    assert_array_equal(hist.counts, counts)
+                else:
+                    # values rounded across an edge move to the next bin
+                    assert np.abs(hist.counts - counts).sum() <= 2
+                    assert hist.counts.sum() == counts.sum()
+
+
+class test_correlation_tensor(unittest.TestCase):
+    def reference(self, b, bins, dx):
+        """Shell averages of R_ij = irfftn(conj(u_i) u_j) / n^3 on the full
+        grid of minimum image displacements d, and the lengths from them."""
+        n = b.shape[1]
+        u = np.fft.rfftn(b, axes=(1, 2, 3))
+        R = np.array(
+            [
+                [
+                    np.fft.irfftn(np.conj(u[i]) * u[j], b.shape[1:]) / n**3
+                    for j in range(3)
+                ]
+                for i in range(3)
+            ]
+        )
+        d = np.broadcast_arrays(*wavenumbers(n))
+        r = np.sqrt(sum(x**2 for x in d))
+        counts = np.histogram(r, bins)[0]
+
+        def shell(x):
+            with np.errstate(invalid="ignore"):
+                return np.histogram(r, bins, weights=x)[0] / counts
+
+        with np.errstate(invalid="ignore"):
+            direction = np.array(
+                [[d[i] * d[j] / r**2 for j in range(3)] for i in range(3)]
+            )
+        direction[:, :, 0, 0, 0] = np.eye(3) / 3
+        for i in range(3):
+            for j in range(3):
+                # the two images at distance n/2 have opposite d_i d_j
+                if i != j:
+                    direction[i, j][
+                        (np.abs(d[i]) == n / 2) | (np.abs(d[j]) == n / 2)
+                    ] = 0
+        f = shell(np.einsum("ij...,ij...->...", R, direction))
+        trace = shell(np.einsum("ii...->...", R))
+        result = {
+            "r": shell(r) * dx,
+            "R": np.array([[shell(R[i, j]) for j in range(3)] for i in range(3)]),
+            "longitudinal": f,
+            "transverse": (trace - f) / 2,
+        }
+        inside = (counts > 0) & (shell(r) <= n / 2) & (shell(r) > 0)
+        r_int = np.concatenate([[0.0], result["r"][inside]])
+        c0 = np.sum(b**2) / n**3
+        for name, c, c0 in (
+            ("L_longitudinal", f, c0 / 3),
+            ("L_transverse", (trace - f) / 2, c0 / 3),
+            ("L_integral", trace, c0),
+        ):
+            result[name] = _trapezoid(np.concatenate([[1.0], c[inside] / c0]), r_int)
+        return result
+
+    def test_against_numpy(self):
+        for precision in Precision:
+            field = random_field(16, precision, L_box=2.0)
+            # correlated over a few grid points, with a mean field along z
+            kx, ky, kz = wavenumbers(16)
+            gauss = np.exp(-(kx**2 + ky**2 + kz**2) / 8)[..., :9]
+            b = np.fft.irfftn(
+                gauss * np.fft.rfftn(field.res, axes=(1, 2, 3)), (16,) * 3
+            )
+            b[2] += 0.5
+            field.res[:] = b
+            b = field.res.astype(np.float64)
+            for bins in (
+                None,
+                [-0.5, 0.5, 1.5, 3, 5, 8],
+                # an empty shell between 0.5 and 0.9
+                [-0.5, 0.5, 0.9, 1.5, 3],
+            ):
+                result = field.correlation_tensor(bins)
+                edges = np.arange(10) - 0.5 if bins is None else bins
+                expected = self.reference(b, edges, field.dx)
+                for name, x in expected.items():
+                    assert_allclose(
+                        result[name],
+                        x,
+                        rtol=0,
+                        atol=TOLERANCE[precision] * np.nanmax(np.abs(x)),
+                        err_msg=name,
+                    )
+
+
+class test_band_statistics(unittest.TestCase):
+    scales = (0.3, 0.1, 0.05)
+
+    def reference(self, b, scales, kernel):
+        """The bands irfftn(H(k) rfftn(b)) of the filters with unit gain."""
+        n = b.shape[1]
+        kx, ky, kz = wavenumbers(n)
+        k2 = (kx**2 + ky**2 + kz**2)[..., : n // 2 + 1]
+        u = np.fft.rfftn(b, axes=(1, 2, 3))
+        for s in scales:
+            if kernel == "mexican_hat":
+                gain = np.e * k2 * s**2 * np.exp(-k2 * s**2)
+            else:
+                gain = np.exp(-k2 * s**2)
+            yield np.fft.irfftn(gain * u, b.shape[1:], axes=(1, 2, 3))
+
+    def test_against_numpy(self):
+        bins = np.linspace(-3, 3, 13)
+        for precision in Precision:
+            field = random_field(16, precision, L_box=2.0)
+            field.res[0] += 1
+            b = field.res.astype(np.float64)
+            for kernel in ("mexican_hat", "gaussian"):
+                result = field.band_statistics(
+                    self.scales, kernel=kernel, max_order=5, bins=bins
+                )
+                assert_allclose(result["scales"], self.scales)
+                bands = self.reference(b, np.divide(self.scales, 2.0), kernel)
+                for j, band in enumerate(bands):
+                    moments = [np.mean(band**p, axis=(1, 2, 3)) for p in range(1, 6)]
+                    fluctuation = band - band.mean(axis=(1, 2, 3), keepdims=True)
+                    variance = np.mean(fluctuation**2, axis=(1, 2, 3))
+                    flatness = np.mean(fluctuation**4, axis=(1, 2, 3)) / variance**2
+                    for i, (x, y) in enumerate(zip(moments, result["moments"][j].T)):
+                        # odd moments relative to the moments of |band|
+                        norm = np.mean(np.abs(band) ** (i + 1))
+                        assert_allclose(
+                            y, x, rtol=0, atol=10 * TOLERANCE[precision] * norm
+                        )
+                    assert_allclose(
+                        result["flatness"][j],
+                        flatness,
+                        rtol=10 * TOLERANCE[precision],
+                    )
+                    std = np.sqrt(variance)[:, None, None, None]
+                    counts = np.histogram(fluctuation / std, bins)[0]
+                    # single precision may round a sample across an edge
+                    atol = 1 if precision is Precision.SINGLE else 0
+                    assert_allclose(
+                        result["histograms"][j].counts, counts, rtol=0, atol=atol
+                    )
+
+    def test_partition_of_unity(self):
+        # sharp shells of |k| > 0 whose squares add up to one, so the band
+        # variances add up to the variance of every component
+        field = random_field(16)
+        shells = [0.5, 2.5, 4, 6, 9, 16]
+
+        def shell(s):
+            k2 = field._kmag_squared
+            expr = f"where(({k2} >= lo**2) & ({k2} < hi**2), 1, 0)"
+            return expr, {"lo": shells[int(s) - 1], "hi": shells[int(s)]}
+
+        scales = np.arange(1, len(shells))
+        result = field.band_statistics(scales, kernel=shell)
+        m1, m2 = np.moveaxis(result["moments"][..., :2], -1, 0)
+        assert_allclose(m1, 0, atol=1e-14)
+        assert_allclose(
+            np.sum(m2 - m1**2, axis=0), field.res.var(axis=(1, 2, 3)), rtol=1e-12
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
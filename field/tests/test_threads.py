@@ -0,0 +1,110 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import os
+import unittest
+from unittest import mock
+import numexpr_erf as ne
+import pyfftw
+from field.utils import threads
+
+_VARIABLES = (
+    "SYNTH_MAG_TURB_THREADS",
+    "SYNTH_MAG_TURB_CORES",
+    "SYNTH_MAG_TURB_BIND",
+    "OMP_PROC_BIND",
+    "OMP_PLACES",
+)
+
+
+class test_configure(unittest.TestCase):
+    """Every test starts from an unconfigured budget, with the variables of
+    `_VARIABLES` unset."""
+
+    def setUp(self):
+        self.budget = dict(threads._budget)
+        self.openmp_started = threads._openmp_started
+        self.affinity = threads._affinity()
+        self.ne_threads = ne.get_num_threads()
+        self.fftw_threads = pyfftw.config.NUM_THREADS
+        environ = {k: v for k, v in os.environ.items() if k not in _VARIABLES}
+        self.environ = mock.patch.dict(os.environ, environ, clear=True)
+        self.environ.start()
+        threads._budget.clear()
+
+    def tearDown(self):
+        self.environ.stop()
+        threads._budget.clear()
+        threads._budget.update(self.budget)
+        threads._openmp_started = self.openmp_started
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.affinity)
+        ne.set_num_threads(self.ne_threads)
+        pyfftw.config.NUM_THREADS = self.fftw_threads
+
+    def test_parse_cores(self):
+        assert threads._parse_cores("0-3,8, 10-11") == [0, 1, 2, 3, 8, 10, 11]
+        assert threads._parse_cores("5") == [5]
+
+    def test_defaults(self):
+        settings = threads.settings()
+        assert settings["num_threads"] == len(self.affinity)
+        assert settings["cores"] == self.affinity
+        assert settings["binding"] == "none"
+        assert settings["numexpr"] == min(len(self.affinity), ne.MAX_THREADS)
+        assert settings["fftw"] == len(self.affinity)
+
+    def test_threads_from_environment(self):
+        os.environ["SYNTH_MAG_TURB_THREADS"] = "3"
+        assert threads.num_threads() == 3
+        settings = threads.settings()
+        assert (settings["numexpr"], settings["fftw"]) == (3, 3)
+
+    def test_cores_from_environment(self):
+        cores = self.affinity[:2]
+        os.environ["SYNTH_MAG_TURB_CORES"] = ",".join(map(str, cores))
+        settings = threads.settings()
+        assert settings["cores"] == cores
+        assert settings["num_threads"] == len(cores)
+        # an explicit thread count overrides the number of cores
+        threads._budget.clear()
+        os.environ["SYNTH_MAG_TURB_THREADS"] = "5"
+        assert threads.settings()["num_threads"] == 5
+
+    def test_binding_from_environment(self):
+        threads._openmp_started = False
+        os.environ["SYNTH_MAG_TURB_BIND"] = "Spread"
+        settings = threads.settings()
+        assert settings["binding"] == "spread"
+        assert os.environ["OMP_PROC_BIND"] == "spread"
+        places = ",".join(f"{{{core}}}" for core in self.affinity)
+        assert settings["omp_places"] == os.environ["OMP_PLACES"] == places
+
+    def test_environment_read_once(self):
+        threads.configure(num_threads=2)
+        os.environ["SYNTH_MAG_TURB_THREADS"] = "7"
+        threads.configure()
+        assert threads.num_threads() == 2
+
+    def test_binding_after_start(self):
+        threads._openmp_started = True
+        with self.assertRaises(RuntimeError):
+            threads.configure(binding=threads.Binding.CLOSE)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            threads.configure(num_threads=0)
+        threads._budget.clear()
+        os.environ["SYNTH_MAG_TURB_BIND"] = "sideways"
+        with self.assertRaises(KeyError):
+            threads.configure()
+
+    def test_share(self):
+        threads.configure(num_threads=8)
+        assert [threads.share(parts) for parts in (1, 2, 3, 16)] == [8, 4, 2, 1]
+
+
+if __name__ == "__main__":
+    unittest.main()
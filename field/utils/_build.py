@@ -0,0 +1,170 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import os
+import sys
+import shlex
+import hashlib
+import platform
+import tempfile
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from ._get_compiler import compile_cmd
+from .threads import start_openmp
+
+# x86-64 ISA levels in order of preference. Kernels are built for the best
+# level supported by the executing CPU, `python -m field.utils._build`
+# builds every level, so one cache serves login and compute nodes of a
+# heterogeneous cluster.
+_v2 = ["-msse4.2", "-mpopcnt"]
+_v3 = _v2 + ["-mavx", "-mavx2", "-mfma", "-mbmi2", "-mf16c"]
+_v4 = _v3 + ["-mavx512f", "-mavx512bw", "-mavx512cd", "-mavx512dq", "-mavx512vl"]
+ISA_LEVELS = {
+    "avx512": _v4 + ["-mprefer-vector-width=512"],
+    "avx2": _v3,
+    "sse4_2": _v2,
+    "generic": [],
+}
+# everything the flags of a level allow the compiler to emit
+_v2_features = ("sse4_2", "popcnt")
+_v3_features = _v2_features + ("avx", "avx2", "fma", "bmi2", "f16c")
+_ISA_FEATURES = {
+    "avx512": _v3_features
+    + ("avx512f", "avx512bw", "avx512cd", "avx512dq", "avx512vl"),
+    "avx2": _v3_features,
+    "sse4_2": _v2_features,
+    "generic": (),
+}
+# build every level instead of only the selected one, see `__main__`
+all_levels = False
+
+
+def cache_dir() -> Path:
+    """Directory shared by all processes of one environment.
+
+    Set `SYNTH_MAG_TURB_CACHE` to place it on a file system that is
+    visible from all nodes of a cluster."""
+    default = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    path = Path(os.environ.get("SYNTH_MAG_TURB_CACHE", default / "synth-mag-turb"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+@lru_cache(maxsize=None)
+def _compiler_version(compiler: str) -> str:
+    try:
+        return subprocess.run(
+            [compiler, "--version"], capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _build_key(source: Path, flags: list) -> str:
+    h = hashlib.sha256()
+    h.update(_compiler_version(flags[0]).encode())
+    h.update("\0".join(flags).encode())
+    # headers next to the source are included by the kernels
+    for file in [source, *sorted(source.parent.glob("*.hpp"))]:
+        h.update(file.name.encode())
+        h.update(file.read_bytes())
+    return h.hexdigest()[:16]
+
+
+def _isa_levels(flags: list) -> list:
+    if any(flag.startswith("-march=") for flag in flags):
+        # the user pinned the target in `./compiler`, build only that
+        return ["custom"]
+    if platform.machine().lower() not in ("x86_64", "amd64"):
+        return ["generic"]
+    return list(ISA_LEVELS)
+
+
+def _cpu_supports(isa: str) -> bool:
+    if isa in ("custom", "generic"):
+        return True
+    from numexpr_erf.cpuinfo import cpu
+
+    return all(getattr(cpu, f"has_{feature}")() for feature in _ISA_FEATURES[isa])
+
+
+def select_isa(levels: list) -> str:
+    """Best level in `levels` the executing CPU supports.
+
+    `SYNTH_MAG_TURB_ISA` overrides the detection."""
+    if (isa := os.environ.get("SYNTH_MAG_TURB_ISA")) is not None:
+        if isa not in levels:
+            raise ValueError(f"SYNTH_MAG_TURB_ISA={isa} not in {levels}")
+        return isa
+    return next(isa for isa in levels if _cpu_supports(isa))
+
+
+def _compile(name: str, source: Path, flags: list) -> Path:
+    lpath = Path(cache_dir(), f"lib{name}-{_build_key(source, flags)}.so")
+    if lpath.exists():
+        return lpath
+    fd, tmp = tempfile.mkstemp(prefix=f".lib{name}-", suffix=".so", dir=lpath.parent)
+    os.close(fd)
+    cmd = flags + [str(source), "-o", tmp]
+    print(f"[INFO] Compiling {lpath.name}", file=sys.stderr)
+    print(f"[INFO] Running {shlex.join(cmd)}", file=sys.stderr)
+    try:
+        subprocess.run(cmd, check=True)
+        os.replace(tmp, lpath)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return lpath
+
+
+def build_library(name: str, source: Path, defines: dict = None) -> Path:
+    """Compile `source` into the shared cache and return the library path.
+
+    The file name contains a hash of the source, the headers in its
+    directory, the flags from `./compiler` and the compiler version, so
+    any change triggers a rebuild. The library is written to a temporary
+    file first and atomically renamed, which makes concurrent first
+    imports from many workers safe.
+
+    The library is built for the best ISA level of the executing CPU (see
+    `ISA_LEVELS`), or for all of them if `all_levels` is set, and the path
+    of the one for the executing CPU is returned."""
+    # the thread budget decides the OpenMP binding, before any kernel runs
+    start_openmp()
+    source = Path(source).resolve()
+    flags = shlex.split(compile_cmd) + [
+        f"-D{key}={value}" for key, value in (defines or {}).items()
+    ]
+    levels = _isa_levels(flags)
+    selected = select_isa(levels)
+    for isa in levels if all_levels else [selected]:
+        path = _compile(f"{name}-{isa}", source, flags + ISA_LEVELS.get(isa, []))
+        if isa == selected:
+            lpath = path
+    return lpath
+
+
+if __name__ == "__main__":
+    # ahead-of-time build of every ISA level: importing the kernels fills
+    # the cache
+    import importlib
+    from . import _build
+
+    _build.all_levels = True
+    for kernel in (
+        "first_touch.first_touch",
+        "histogram.histogram",
+        "increments.increments",
+        "interp1d.interp1d",
+        "interp3d.idw",
+        "rvs_omp.rvs_omp",
+        "shells.shells",
+        "stencils.stencils",
+    ):
+        importlib.import_module(f"field.{kernel}")
+
+    print(f"native kernels are built in {cache_dir()}")
+    print(f"selected ISA level on this machine: {select_isa(_isa_levels(shlex.split(compile_cmd)))}")
@@ -4,8 +4,12 @@
 # Distributed under the MIT License
 
 import os
+from pathlib import Path
 
 compiler_file = os.path.realpath(f"{os.getcwd()}/../compiler")
+if not os.path.exists(compiler_file):
+    # fall back to the file shipped at the repository root
+    compiler_file = str(Path(__file__).resolve().parents[2].joinpath("compiler"))
 if not os.path.exists(compiler_file):
     raise RuntimeError(f"{compiler_file } file not found")
 with open(compiler_file) as fp:
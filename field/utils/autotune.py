@@ -0,0 +1,191 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import os
+import json
+import platform
+import tempfile
+import numpy as np
+import numexpr_erf as ne
+from functools import lru_cache
+from timeit import default_timer as timer
+from typing import Callable, Sequence, Union
+from ._build import cache_dir
+
+# candidate numexpr block sizes in elements, the compiled-in default is 1024
+BLOCK_SIZES = (256, 512, 1024, 2048, 4096, 8192)
+
+
+def _table_path():
+    return cache_dir() / "numexpr-block-sizes.json"
+
+
+def machine() -> str:
+    """CPU model and cache size, the tuned block sizes are stored per
+    machine so one cache can be shared by the nodes of a cluster."""
+    from numexpr_erf.cpuinfo import cpu
+
+    info = cpu.info[0] if isinstance(cpu.info, list) and cpu.info else {}
+    model = info.get("model name", platform.processor() or platform.machine())
+    return f"{model} {info.get('cache size', '')}".strip()
+
+
+def kernel_key(expr: Union[str, Sequence[str]], signature: Sequence[tuple]) -> str:
+    """Expression text and argument types of a kernel."""
+    if not isinstance(expr, str):
+        expr = "; ".join(expr)
+    types = "".join(
+        ne.necompiler.kind_to_typecode[ne.necompiler.type_to_kind[t]]
+        for _, t in signature
+    )
+    return f"{expr} [{types}]"
+
+
+@lru_cache(maxsize=None)
+def _tuned() -> dict:
+    try:
+        with open(_table_path()) as fp:
+            return json.load(fp).get(machine(), {})
+    except (OSError, ValueError):
+        return {}
+
+
+def block_size(expr: Union[str, Sequence[str]], signature: Sequence[tuple]) -> int:
+    """Tuned block size of a kernel on this machine, `None` if it has not
+    been tuned."""
+    size = _tuned().get(kernel_key(expr, signature))
+    return None if size is None else min(size, ne.MAX_BLOCK_SIZE)
+
+
+def _save(sizes: dict):
+    path = _table_path()
+    try:
+        with open(path) as fp:
+            table = json.load(fp)
+    except (OSError, ValueError):
+        table = {}
+    table.setdefault(machine(), {}).update(sizes)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}-", dir=path.parent)
+    with os.fdopen(fd, "w") as fp:
+        json.dump(table, fp, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+    _tuned.cache_clear()
+
+
+def _time(nex, args, kwargs, out, repeat):
+    nex(*args, out=out, **kwargs)
+    best = np.inf
+    for _ in range(repeat):
+        start = timer()
+        nex(*args, out=out, **kwargs)
+        best = min(best, timer() - start)
+    return best
+
+
+def tune(
+    field,
+    workload: Callable,
+    block_sizes: Sequence[int] = BLOCK_SIZES,
+    repeat: int = 5,
+    save: bool = True,
+) -> dict:
+    """Benchmark every kernel evaluated by `workload(field)` with each of
+    `block_sizes` and return the fastest block size per kernel.
+
+    The kernels are timed on the buffers of `field` as left by the workload,
+    writing into scratch outputs so repeated evaluation does not change the
+    inputs. With `save`, the result is merged into the table in the shared
+    cache (see `cache_dir`), which all fields created afterwards use."""
+    calls = {}
+    evaluate = field._eval
+
+    def record(expr, extra_variables=None, out=None):
+        result = evaluate(expr, extra_variables, out)
+        calls.setdefault(
+            expr if isinstance(expr, str) else tuple(expr),
+            (extra_variables, result),
+        )
+        return result
+
+    field._eval = record
+    try:
+        workload(field)
+    finally:
+        del field._eval
+
+    block_sizes = sorted({min(size, ne.MAX_BLOCK_SIZE) for size in block_sizes})
+    best = {}
+    for expr, (extra_variables, result) in calls.items():
+        nex, args, kwargs = field._bound_kernel(expr, extra_variables)
+        signature = [
+            (name, ne.necompiler.getType(np.asarray(arg)))
+            for name, arg in zip(nex.input_names, args)
+        ]
+        if isinstance(result, tuple):
+            out = [np.empty_like(r) for r in result]
+        else:
+            out = np.empty_like(result)
+        times = {
+            size: _time(
+                ne.NumExpr(
+                    expr if isinstance(expr, str) else list(expr),
+                    signature,
+                    block_size=size,
+                    **field._ne_context,
+                ),
+                args,
+                kwargs,
+                out,
+                repeat,
+            )
+            for size in block_sizes
+        }
+        best[kernel_key(expr, signature)] = min(times, key=times.get)
+    if save:
+        _save(best)
+    return best
+
+
+def tune_cascade(
+    grid_size: int,
+    precision,
+    args: tuple = (6, 0.5, -5 / 3, 0.2),
+    *,
+    wisdom_path: str = None,
+    **kwds,
+) -> dict:
+    """`tune` the kernels of a `Cascade3D` called with `args`, once with
+    the spectral filters computed in place (the default `kernel_cache_size`
+    of 0) and once with tabulated filters, whose kernels differ. `kwds` are
+    passed to `tune`."""
+    from ..cascade import Cascade3D
+
+    best = {}
+    for kernel_cache_size in (0, 1 << 30):
+        field = Cascade3D(
+            "autotune",
+            grid_size,
+            precision=precision,
+            wisdom_path=wisdom_path,
+            kernel_cache_size=kernel_cache_size,
+        )
+        best |= tune(field, lambda f: f(*args, write_field=False), **kwds)
+        del field
+    return best
+
+
+if __name__ == "__main__":
+    import sys
+    from ..basefield import Precision
+
+    # tunes the kernels of a cascade, the grid size should be the one used
+    # in production so the working sets match
+    grid_size = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+    for precision in Precision:
+        best = tune_cascade(grid_size, precision)
+        print(f"{precision.name.lower()} precision, grid size {grid_size}^3:")
+        for key, size in best.items():
+            print(f"  {size:6d}  {key}")
+    print(f"block sizes of {machine()} written to {_table_path()}")
@@ -3,8 +3,61 @@
 #
 # Distributed under the MIT License
 
+import operator
+import numpy as np
+from enum import Enum
+from functools import reduce
+from .lazy import Vec
+from ..stencils import stencils
+
+
+class Derivative(Enum):
+    """Approximation of the derivatives in `curl`, `div` and `curv`:
+    central differences of second, fourth or sixth order, or exact
+    derivatives of the Fourier series."""
+
+    CENTRAL2 = 2
+    CENTRAL4 = 4
+    CENTRAL6 = 6
+    SPECTRAL = "spectral"
+
+
+# weights c_m of d/dx a = sum_m c_m (a[x+m] - a[x-m]) / dx
+_CENTRAL_WEIGHTS = {
+    Derivative.CENTRAL2: (1 / 2,),
+    Derivative.CENTRAL4: (2 / 3, -1 / 12),
+    Derivative.CENTRAL6: (3 / 4, -3 / 20, 1 / 60),
+}
+
+# (i, j, k) with (curl a)_i = d_j a_k - d_k a_j
+_CURL_AXES = ((0, 1, 2), (1, 2, 0), (2, 0, 1))
+
+
+def _symmetric_eigenvalues(s) -> tuple:
+    """Eigenvalues in ascending order of the symmetric 3x3 matrices
+    s[i][j] (arrays), by the trigonometric solution of the characteristic
+    cubic."""
+    q = (s[0][0] + s[1][1] + s[2][2]) / 3
+    off = s[0][1] ** 2 + s[0][2] ** 2 + s[1][2] ** 2
+    p = np.sqrt(
+        ((s[0][0] - q) ** 2 + (s[1][1] - q) ** 2 + (s[2][2] - q) ** 2 + 2 * off) / 6
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        b = [[(s[i][j] - (q if i == j else 0)) / p for j in range(3)] for i in range(3)]
+        det = (
+            b[0][0] * (b[1][1] * b[2][2] - b[1][2] * b[2][1])
+            - b[0][1] * (b[1][0] * b[2][2] - b[1][2] * b[2][0])
+            + b[0][2] * (b[1][0] * b[2][1] - b[1][1] * b[2][0])
+        )
+        phi = np.arccos(np.clip(np.nan_to_num(det / 2), -1, 1)) / 3
+    largest = q + 2 * p * np.cos(phi)
+    smallest = q + 2 * p * np.cos(phi + 2 * np.pi / 3)
+    return smallest, 3 * q - largest - smallest, largest
+
 
 class Derivatives:
+    derivative = Derivative.CENTRAL2
+
     @staticmethod
     def _slice_tuple_func(n):
         def _s(i, lo, hi=None):
@@ -36,28 +89,113 @@ class Derivatives:
         out[s(i, -1)] = -(arr[s(i, -2)] - arr[s(i, 0)]) / (2 * self.dx)
         return out
 
-    def _spec_diff(self, arr, i):
-        self._f[:] = arr
+    def _central_weights(self) -> tuple:
+        if self.derivative is Derivative.SPECTRAL:
+            raise ValueError("spectral derivatives have no finite stencil")
+        return _CENTRAL_WEIGHTS[self.derivative]
+
+    def _wavenumbers(self) -> list:
+        """K_i with d_i exp(ikx) = i K_i exp(ikx) for the `derivative`
+        scheme, on the half spectrum."""
+        if self.derivative is Derivative.SPECTRAL:
+            return self._kd
+        theta = [2 * np.pi / self.grid_size * k for k in self._ki]
+        return [
+            sum(
+                2 * c / self.dx * np.sin(m * t)
+                for m, c in enumerate(self._central_weights(), start=1)
+            ).astype(self.ftype)
+            for t in theta
+        ]
+
+    def _spectrum(self, in_, out=None):
+        """Half spectrum of the real buffer `in_`, left in `g` and copied to
+        `out` unless that is `None`."""
+        if in_ != "f":
+            self._eval(in_, out="f")
         self._fwd()
-        self._g[:] *= 1j * self._ki[i]
+        if out is not None:
+            self._eval("g", out=out)
+        return out
+
+    def _spec_diff(self, spectrum, i):
+        """d_i of the real field with half spectrum `spectrum`, into `f`."""
+        self._eval(
+            "J*k*s",
+            {"J": self.ctype.type(1j), "k": self._kd[i], "s": spectrum},
+            out="g",
+        )
         self._bwd()
         return self._f
 
     def div(self, out):
         assert isinstance(out, str) and out in self._variables
         print("computing div", end="")
-        self._f[:] = 0.0
-        for i in range(self.components):
-            self._fd_inplace(f"res{i}", i, out="f")
+        if self.derivative is Derivative.SPECTRAL:
+            # summed in k-space, a single backward transform
+            acc = self._buffer(self._bwd_tuple, self.ctype)
+            for i in range(self.components):
+                self._spectrum(f"res{i}")
+                self._eval(
+                    "acc + J*k*g" if i else "J*k*g",
+                    {"J": self.ctype.type(1j), "k": self._kd[i], "acc": acc},
+                    out=acc,
+                )
+            self._eval("acc", {"acc": acc}, out="g")
+            self._bwd()
+            self._release([acc])
+        elif self.derivative is not Derivative.CENTRAL2:
+            b = self.var("res")
+            self.assign(
+                "f", reduce(operator.add, (self.ddx(b[i], i) for i in range(len(b))))
+            )
+        elif self.components == 3 and stencils.supported(self._f, *self.res):
+            stencils.div(self.res, self._f, dx=self.dx, num_threads=self.num_threads)
+        else:
+            self._f[:] = 0.0
+            for i in range(self.components):
+                self._fd_inplace(f"res{i}", i, out="f")
         print(".")
         return self._f
 
     def _curl_step(self, i, in_="f", out="res"):
         j, k = {0: (2, 1), 1: (0, 2), 2: (1, 0)}[i]
+        if self.derivative is Derivative.SPECTRAL:
+            spectrum = self._spectrum(in_, self._buffer(self._bwd_tuple, self.ctype))
+            self._spec_diff(spectrum, j)
+            self._eval(f"{out}{k} + f", out=f"{out}{k}")
+            self._spec_diff(spectrum, k)
+            self._eval(f"{out}{j} - f", out=f"{out}{j}")
+            self._release([spectrum])
+            return
+        if self.derivative is not Derivative.CENTRAL2:
+            a = self.var(in_)
+            self.assign(f"{out}{k}", self.var(f"{out}{k}") + self.ddx(a, j))
+            self.assign(f"{out}{j}", self.var(f"{out}{j}") - self.ddx(a, k))
+            return
+        arr = self._variables[in_]
+        out_j, out_k = self._variables[f"{out}{j}"], self._variables[f"{out}{k}"]
+        if stencils.supported(arr, out_j, out_k):
+            # both updates in one sweep over `arr`
+            stencils.curl_step(
+                arr, out_j, out_k, j, k, dx=self.dx, num_threads=self.num_threads
+            )
+            return
         self._fd_inplace(in_, j, f"{out}{k}", +1)
         self._fd_inplace(in_, k, f"{out}{j}", -1)
 
     def _curl(self):
+        if self.derivative is Derivative.SPECTRAL:
+            # curl of the vector potential in k-space, 3 backward transforms
+            for i, j, k in _CURL_AXES:
+                self._eval(
+                    f"J*(kj*v{k} - kk*v{j})",
+                    {"J": self.ctype.type(1j), "kj": self._kd[j], "kk": self._kd[k]},
+                    out="g",
+                )
+                self._bwd()
+                self._eval("f", out=f"res{i}")
+            return self.res
         self.res[:] = 0.0
         for i in range(self.components):
             self._eval(f"v{i}", out="g")
@@ -68,25 +206,190 @@ class Derivatives:
     def curl(self, out):
         assert isinstance(out, str) and out in self._variables
         print("computing curl", end="")
-        self._variables[out][:] = 0.0
-        for i in range(self.components):
-            self._curl_step(i, in_=f"res{i}", out=out)
+        outs = [self._variables[f"{out}{i}"] for i in range(self.components)]
+        if self.derivative is Derivative.SPECTRAL:
+            spectra = [
+                self._spectrum(f"res{i}", self._buffer(self._bwd_tuple, self.ctype))
+                for i in range(self.components)
+            ]
+            for i, j, k in _CURL_AXES:
+                self._eval(
+                    "J*(kj*sk - kk*sj)",
+                    {
+                        "J": self.ctype.type(1j),
+                        "kj": self._kd[j],
+                        "kk": self._kd[k],
+                        "sj": spectra[j],
+                        "sk": spectra[k],
+                    },
+                    out="g",
+                )
+                self._bwd()
+                self._eval("f", out=outs[i])
+            self._release(spectra)
+        elif self.derivative is not Derivative.CENTRAL2:
+            b = self.var("res")
+            self.assign(
+                out,
+                Vec(self.ddx(b[k], j) - self.ddx(b[j], k) for _, j, k in _CURL_AXES),
+            )
+        elif self.components == 3 and stencils.supported(*self.res, *outs):
+            stencils.curl(self.res, outs, dx=self.dx, num_threads=self.num_threads)
+        else:
+            self._variables[out][:] = 0.0
+            for i in range(self.components):
+                self._curl_step(i, in_=f"res{i}", out=out)
         print(".")
         return self._variables[out]
 
+    def _native_curvature(self) -> bool:
+        return (
+            self.derivative is Derivative.CENTRAL2
+            and self.components == 3
+            and stencils.supported(self._f, *self.res)
+        )
+
     def curv(self, out):
         assert isinstance(out, str) and out in self._variables
         print("computing curvature", end="")
-        self._variables[out][:] = 0.0
-        for i in range(self.components):
-            for j in range(self.components):
-                self._fd(f"res{i}", j, out="f")
-                self._eval(f"{out}{i} + res{j} * f", out=f"{out}{i}")
-        self.mag(out="f")
-        for i in range(self.components):
-            self._eval(f"{out}{i} / f**3", out=f"{out}{i}")
-        self._cross("res", out, out=out)
-        self._eval(f"sum({out}**2, 0)", out="f")
-        self._eval(f"sqrt(f)", out="f")
+        if self._native_curvature():
+            # one sweep over `res`, `out` is not used
+            stencils.curvature(
+                self.res, self._f, dx=self.dx, num_threads=self.num_threads
+            )
+        else:
+            self._curv(out)
         print(".")
         return self._f
+
+    def _curv(self, out):
+        b = self.var("res")
+        # (b.grad)b is staged in `out`, so no stencil is evaluated twice
+        if self.derivative is Derivative.SPECTRAL:
+            spectrum = self._buffer(self._bwd_tuple, self.ctype)
+            for i in range(self.components):
+                self._spectrum(f"res{i}", spectrum)
+                for j in range(self.dimension):
+                    self._spec_diff(spectrum, j)
+                    expr = f"{out}{i} + res{j}*f" if j else "res0*f"
+                    self._eval(expr, out=f"{out}{i}")
+            self._release([spectrum])
+        else:
+            self.assign(out, Vec(b.dot(self.grad(bi)) for bi in b))
+        self.assign("f", b.cross(self.var(out)).norm() / b.norm() ** 3)
+        return self._f
+
+    def curv_histogram(self, bins, out: str = "e"):
+        """Counts of the curvature in the bins with edges `bins`, like
+        `np.histogram(self.curv(out), bins)[0]`, or added to `bins` if that
+        is a `Histogram`. The native kernel counts while it sweeps, without
+        storing the curvature field."""
+        print("computing curvature histogram", end="")
+        edges = getattr(bins, "edges", bins)
+        if self._native_curvature():
+            counts = stencils.curvature(
+                self.res, edges=edges, dx=self.dx, num_threads=self.num_threads
+            )
+        else:
+            counts = np.histogram(self._curv(out), edges)[0]
+        print(".")
+        if edges is bins:
+            return counts
+        bins.counts += counts
+        return bins
+
+    def _gradient_slabs(self, slab: int):
+        """The gradient tensor grad[i, j] = d_j res_i of slabs of `slab`
+        planes along axis 0, as `(start, grad)`. Each slab is computed from
+        a copy of its planes with periodic halos, spectral fields use sixth
+        order differences."""
+        assert self.dimension == self.components == 3
+        weights = _CENTRAL_WEIGHTS.get(
+            self.derivative, _CENTRAL_WEIGHTS[Derivative.CENTRAL6]
+        )
+        m, n = len(weights), self.grid_size
+        for start in range(0, n, slab):
+            stop = min(start + slab, n)
+            halo = self.res[:, np.arange(start - m, stop + m) % n]
+            core = halo[:, m : m + stop - start]
+            grad = np.zeros((3,) + core.shape, dtype=self.ftype)
+            for k, c in enumerate(weights, start=1):
+                grad[:, 0] += c / self.dx * (
+                    halo[:, m + k : m + k + stop - start]
+                    - halo[:, m - k : m - k + stop - start]
+                )
+                for j in (1, 2):
+                    grad[:, j] += c / self.dx * (
+                        np.roll(core, -k, axis=j + 1) - np.roll(core, k, axis=j + 1)
+                    )
+            yield start, grad
+
+    def gradient_statistics(
+        self, bins: dict = None, *, qr_bins: tuple = None, slab: int = None
+    ) -> dict:
+        """Statistics of the invariants of the gradient tensor of `res`,
+        streamed over slabs of `slab` planes (by default `grid_size // 32`,
+        a working set of about one component buffer), so the tensor is
+        never stored for the whole domain.
+
+        The quantities are the current density "j" = |curl res|, the strain
+        eigenvalues "lambda1" <= "lambda2" <= "lambda3" and the invariants
+        "Q" = -tr(A^2)/2 and "R" = -tr(A^3)/3 of A_ij = d_j res_i. For each
+        the result holds its raw moments <x^k>, k = 1..4, and with bin
+        edges `bins[name]` its histogram. The joint histogram of (R, Q) over
+        `qr_bins = (R_edges, Q_edges)` is returned as "RQ"."""
+        print("computing gradient statistics", end="")
+        bins = bins or {}
+        slab = slab or max(1, self.grid_size // 32)
+        names = ("j", "lambda1", "lambda2", "lambda3", "Q", "R")
+        sums = {name: np.zeros(4) for name in names}
+        counts = {
+            name: np.zeros(len(bins[name]) - 1, dtype=np.int64)
+            for name in names
+            if name in bins
+        }
+        if qr_bins is not None:
+            counts["RQ"] = np.zeros(
+                (len(qr_bins[0]) - 1, len(qr_bins[1]) - 1), dtype=np.int64
+            )
+        for _, a in self._gradient_slabs(slab):
+            aa = np.einsum("ij...,jk...->ik...", a, a)
+            values = dict(
+                zip(
+                    names,
+                    (
+                        np.sqrt(
+                            (a[2, 1] - a[1, 2]) ** 2
+                            + (a[0, 2] - a[2, 0]) ** 2
+                            + (a[1, 0] - a[0, 1]) ** 2
+                        ),
+                        *_symmetric_eigenvalues(
+                            [
+                                [(a[i, j] + a[j, i]) / 2 for j in range(3)]
+                                for i in range(3)
+                            ]
+                        ),
+                        -np.einsum("ii...->...", aa) / 2,
+                        -np.einsum("ij...,ji...->...", aa, a) / 3,
+                    ),
+                )
+            )
+            for name, x in values.items():
+                x = x.astype(np.float64).reshape(-1)
+                sums[name] += [np.sum(x**k) for k in range(1, 5)]
+                if name in counts:
+                    counts[name] += np.histogram(x, bins[name])[0]
+            if qr_bins is not None:
+                counts["RQ"] += np.histogram2d(
+                    values["R"].reshape(-1), values["Q"].reshape(-1), qr_bins
+                )[0].astype(np.int64)
+        print(".")
+        size = self.grid_size**self.dimension
+        result = {
+            name: {"moments": sums[name] / size}
+            | ({"histogram": counts[name]} if name in counts else {})
+            for name in names
+        }
+        if qr_bins is not None:
+            result["RQ"] = {"histogram": counts["RQ"]}
+        return result
@@ -9,6 +9,7 @@ import tables as tb
 import itertools
 from pathlib import Path
 from jinja2 import Environment, FileSystemLoader
+from . import threads
 
 
 def _get_writer_kwds(kwds):
@@ -79,11 +80,13 @@ class FieldWriter:
                 components=self.components,
                 L_box=self.L_box,
                 precision=self.precision,
+                derivative=self.derivative,
                 num_threads=self.num_threads,
             )
             if hasattr(self, "cfl"):
                 conf.update({"cfl": self.cfl})
             attrs.conf = conf
+            attrs.threads = threads.settings()
             attrs.version = (
                 os.popen("git describe --always --tags --dirty").read().strip()
             )
@@ -0,0 +1,534 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import operator
+import numpy as np
+import numexpr_erf as ne
+from functools import reduce
+from typing import Union
+
+# numpy < 2 iterates over at most 32 operands, one of them is the output
+_MAX_INPUTS = 31
+_LEAVES = ("buf", "param", "lit")
+
+
+class Expr:
+    """Node of a lazily evaluated elementwise expression over field buffers.
+
+    Leaves are named buffers, optionally read with a periodic offset along
+    some axes (see `shift`), and scalar parameters. Nothing is computed
+    until the expression is passed to `BaseField.assign` or
+    `BaseField.reduce_sum`, which fuse the whole tree into as few numexpr
+    passes as possible."""
+
+    __slots__ = ("op", "args")
+
+    def __init__(self, op: str, *args):
+        self.op = op
+        self.args = args
+
+    def _binary(op, reflected=False):
+        def method(self, other):
+            other = _wrap(other)
+            return Expr(op, other, self) if reflected else Expr(op, self, other)
+
+        return method
+
+    __add__ = _binary("+")
+    __radd__ = _binary("+", True)
+    __sub__ = _binary("-")
+    __rsub__ = _binary("-", True)
+    __mul__ = _binary("*")
+    __rmul__ = _binary("*", True)
+    __truediv__ = _binary("/")
+    __rtruediv__ = _binary("/", True)
+    __lt__ = _binary("<")
+    __le__ = _binary("<=")
+    __gt__ = _binary(">")
+    __ge__ = _binary(">=")
+    del _binary
+
+    def __pow__(self, exponent):
+        # literal exponents let numexpr expand small integer powers
+        if isinstance(exponent, (int, float)):
+            return Expr("**", self, Expr("lit", exponent))
+        return Expr("**", self, _wrap(exponent))
+
+    def __neg__(self):
+        return Expr("neg", self)
+
+    def shift(self, axis: int, offset: int) -> "Expr":
+        """Periodic read of `self[..., i + offset, ...]` along `axis`, for
+        any offset."""
+        if self.op == "buf":
+            name, shifts = self.args
+            shifts = dict(shifts)
+            shifts[axis] = shifts.get(axis, 0) + offset
+            return Expr("buf", name, tuple(sorted(s for s in shifts.items() if s[1])))
+        if self.op in _LEAVES:
+            return self
+        return Expr(
+            self.op,
+            *(a.shift(axis, offset) if isinstance(a, Expr) else a for a in self.args),
+        )
+
+    def _children(self) -> tuple:
+        return () if self.op in _LEAVES else tuple(
+            a for a in self.args if isinstance(a, Expr)
+        )
+
+    def _nodes(self):
+        yield self
+        for child in self._children():
+            yield from child._nodes()
+
+    def _key(self) -> tuple:
+        if self.op == "buf":
+            return self.args
+        # parameters with equal value share one operand
+        return (type(self.args[0]).__name__, self.args[0])
+
+    def _operands(self) -> set:
+        return {node._key() for node in self._nodes() if node.op in ("buf", "param")}
+
+    def _replace(self, old: "Expr", new: "Expr") -> "Expr":
+        if self is old:
+            return new
+        if self.op in _LEAVES:
+            return self
+        return Expr(
+            self.op,
+            *(a._replace(old, new) if isinstance(a, Expr) else a for a in self.args),
+        )
+
+    def _render(self, operands: dict) -> str:
+        op, args = self.op, self.args
+        if op in ("buf", "param"):
+            key = self._key()
+            if key not in operands:
+                if op == "buf":
+                    name, shifts = args
+                    suffix = "".join(
+                        f"_{a}{'p' if o > 0 else 'm'}{abs(o)}" for a, o in shifts
+                    )
+                    operands[key] = (f"{name}{suffix}", self)
+                else:
+                    operands[key] = (f"p{len(operands)}", self)
+            return operands[key][0]
+        if op == "lit":
+            return repr(args[0])
+        if op == "call":
+            return f"{args[0]}({', '.join(a._render(operands) for a in args[1:])})"
+        if op == "neg":
+            return f"(-{args[0]._render(operands)})"
+        return f"({args[0]._render(operands)} {op} {args[1]._render(operands)})"
+
+
+def _wrap(value) -> Expr:
+    if isinstance(value, Expr):
+        return value
+    if isinstance(value, (int, float, complex, np.number)):
+        return Expr("param", value)
+    raise TypeError(f"cannot use {type(value).__name__} in a lazy expression")
+
+
+def _function(name: str):
+    def func(*args) -> Expr:
+        return Expr("call", name, *map(_wrap, args))
+
+    func.__name__ = name
+    return func
+
+
+sqrt = _function("sqrt")
+exp = _function("exp")
+expm1 = _function("expm1")
+log = _function("log")
+log1p = _function("log1p")
+sin = _function("sin")
+cos = _function("cos")
+tan = _function("tan")
+arcsin = _function("arcsin")
+arccos = _function("arccos")
+arctan = _function("arctan")
+arctan2 = _function("arctan2")
+sinh = _function("sinh")
+cosh = _function("cosh")
+tanh = _function("tanh")
+erf = _function("erf")
+erfinv = _function("erfinv")
+ndtr = _function("ndtr")
+ndtri = _function("ndtri")
+sincos = _function("sincos")
+where = _function("where")
+real = _function("real")
+imag = _function("imag")
+conj = _function("conj")
+absolute = _function("abs")
+
+
+class Vec:
+    """Fixed-size vector of `Expr` components."""
+
+    __slots__ = ("components",)
+
+    def __init__(self, components):
+        self.components = tuple(map(_wrap, components))
+
+    def __len__(self):
+        return len(self.components)
+
+    def __iter__(self):
+        return iter(self.components)
+
+    def __getitem__(self, i):
+        return self.components[i]
+
+    def _elementwise(op, reflected=False):
+        def method(self, other):
+            if isinstance(other, Vec):
+                assert len(other) == len(self)
+                pairs = zip(other, self) if reflected else zip(self, other)
+            else:
+                other = _wrap(other)
+                pairs = ((other, a) if reflected else (a, other) for a in self)
+            return Vec(op(a, b) for a, b in pairs)
+
+        return method
+
+    __add__ = _elementwise(operator.add)
+    __radd__ = _elementwise(operator.add, True)
+    __sub__ = _elementwise(operator.sub)
+    __rsub__ = _elementwise(operator.sub, True)
+    __mul__ = _elementwise(operator.mul)
+    __rmul__ = _elementwise(operator.mul, True)
+    __truediv__ = _elementwise(operator.truediv)
+    __rtruediv__ = _elementwise(operator.truediv, True)
+    del _elementwise
+
+    def __neg__(self):
+        return Vec(-a for a in self)
+
+    def shift(self, axis: int, offset: int) -> "Vec":
+        return Vec(a.shift(axis, offset) for a in self)
+
+    def dot(self, other: "Vec") -> Expr:
+        assert len(other) == len(self)
+        return reduce(operator.add, (a * b for a, b in zip(self, other)))
+
+    def cross(self, other: "Vec") -> "Vec":
+        assert len(self) == len(other) == 3
+        a, b = self, other
+        return Vec(
+            a[j] * b[k] - a[k] * b[j] for j, k in ((1, 2), (2, 0), (0, 1))
+        )
+
+    def norm2(self) -> Expr:
+        return reduce(operator.add, (a**2 for a in self))
+
+    def norm(self) -> Expr:
+        return sqrt(self.norm2())
+
+
+class LazyExpressions:
+    """Build diagnostics from `Expr` and `Vec` and evaluate them fused.
+
+    Example, the curvature of `res` in a single sweep::
+
+        b = self.var("res")
+        kappa = Vec(b.dot(self.grad(bi)) for bi in b)
+        self.assign("f", b.cross(kappa).norm() / b.norm() ** 3)
+
+    Finite differences are expressed as periodic shifts of the buffers, so
+    the stencils fuse with the surrounding arithmetic. Subtrees are only
+    materialized into scratch buffers when a pass would exceed the numexpr
+    operand limit or write a buffer it reads at an offset."""
+
+    def var(self, name: str) -> Union[Expr, Vec]:
+        """Lazy handle of the buffer `name`. Vector buffers with named
+        components (`res` -> `res0`, `res1`, ...) give a `Vec`."""
+        if f"{name}0" in self._variables:
+            i = 0
+            while f"{name}{i}" in self._variables:
+                i += 1
+            return Vec(Expr("buf", f"{name}{j}", ()) for j in range(i))
+        if name not in self._variables:
+            raise KeyError(name)
+        return Expr("buf", name, ())
+
+    def ddx(self, expr: Union[Expr, Vec], axis: int) -> Union[Expr, Vec]:
+        """Central difference along `axis` with periodic boundaries, of the
+        order of the field's `derivative` scheme."""
+        return reduce(
+            operator.add,
+            (
+                (expr.shift(axis, m) - expr.shift(axis, -m)) * (c / self.dx)
+                for m, c in enumerate(self._central_weights(), start=1)
+            ),
+        )
+
+    def grad(self, expr: Expr) -> Vec:
+        return Vec(self.ddx(expr, i) for i in range(self.dimension))
+
+    def assign(self, out: Union[np.ndarray, str], expr: Union[Expr, Vec]) -> np.ndarray:
+        """Evaluate `expr` into the buffer `out`.
+
+        A `Vec` is written component wise into `{out}0`, `{out}1`, ...,
+        all components in a single pass if they fit into one program."""
+        if isinstance(expr, Vec):
+            assert isinstance(out, str)
+            outs = [self._variables[f"{out}{i}"] for i in range(len(expr))]
+            components = [_wrap(c) for c in expr]
+            operands = set().union(*(c._operands() for c in components))
+            if len(operands) + len(outs) <= _MAX_INPUTS + 1 and not any(
+                self._reads(c, o, False)
+                for c in components
+                for o in outs
+            ):
+                # numexpr buffers outputs that are also read in place
+                self._run_many(components, outs)
+                return self._variables[out]
+            hazard = any(
+                self._reads(c, outs[j], i > j)
+                for i, c in enumerate(expr)
+                for j in range(i + 1)
+            )
+            if hazard:
+                # a component reads an output written before: stage all
+                tmps = [self._run(c, self._scratch(c)) for c in expr]
+                for o, tmp in zip(outs, tmps):
+                    o[...] = tmp
+                self._release(tmps)
+            else:
+                for c, o in zip(expr, outs):
+                    self._run(c, o)
+            return self._variables[out]
+        out = self._variables[out] if isinstance(out, str) else out
+        expr = _wrap(expr)
+        if self._reads(expr, out, False):
+            tmp = self._run(expr, self._scratch(expr))
+            out[...] = tmp
+            self._release([tmp])
+            return out
+        return self._run(expr, out)
+
+    def reduce_sum(self, expr: Expr):
+        """Sum of `expr` over the whole domain in a single pass."""
+        return self._run(_wrap(expr), None)
+
+    def _lookup(self, name: str) -> np.ndarray:
+        try:
+            return self._variables[name]
+        except KeyError:
+            return self._scratch_named[name]
+
+    def _reads(self, expr: Expr, out: np.ndarray, unshifted: bool) -> bool:
+        """Does `expr` read memory of `out` at an offset (or at all)?"""
+        return any(
+            (unshifted or node.args[1])
+            and np.may_share_memory(np.asarray(self._lookup(node.args[0])), out)
+            for node in expr._nodes()
+            if node.op == "buf"
+        )
+
+    def _scratch(self, expr: Expr) -> np.ndarray:
+        operands = {}
+        text = expr._render(operands)
+        values = {name: self._value(leaf) for name, leaf in operands.values()}
+        nex = self._kernel(text, values)[0]
+        kind = ne.necompiler.typecode_to_kind[nex.fullsig.decode()[0]]
+        dtype = np.dtype(ne.necompiler.kind_to_type[kind])
+        shape = np.broadcast_shapes(*(np.shape(v) for v in values.values()))
+        return self._buffer(shape, dtype)
+
+    def _buffer(self, shape: tuple, dtype: np.dtype) -> np.ndarray:
+        """Scratch buffer from the pool, give it back with `_release`."""
+        for i, buf in enumerate(self._scratch_pool):
+            if buf.shape == shape and buf.dtype == dtype:
+                return self._scratch_pool.pop(i)
+        return self._zeros(shape, dtype)
+
+    def _release(self, buffers: list):
+        self._scratch_pool.extend(buffers)
+
+    def _value(self, leaf: Expr):
+        if leaf.op == "buf":
+            return self._lookup(leaf.args[0])
+        value = leaf.args[0]
+        if isinstance(value, complex):
+            return self.ctype.type(value)
+        return self.ftype.type(value)
+
+    def _fit(self, expr: Expr) -> tuple:
+        """Materialize the largest subtrees that fit into one pass until
+        `expr` itself does. Returns the new tree and the scratch buffers it
+        reads, which are free again once it has been evaluated."""
+        scratch = []
+        while len(expr._operands()) > _MAX_INPUTS:
+            sub = max(
+                (
+                    node
+                    for node in expr._nodes()
+                    if node.op not in _LEAVES
+                    and len(node._operands()) <= _MAX_INPUTS
+                ),
+                key=lambda node: len(node._operands()),
+            )
+            buf = self._run(sub, self._scratch(sub))
+            name = f"_scratch{id(buf)}"
+            self._scratch_named[name] = buf
+            scratch.append(name)
+            expr = expr._replace(sub, Expr("buf", name, ()))
+        return expr, scratch
+
+    def _run(self, expr: Expr, out: np.ndarray):
+        expr, scratch = self._fit(expr)
+        operands = {}
+        text = expr._render(operands)
+        leaves = {name: leaf for name, leaf in operands.values()}
+        values = {name: self._value(leaf) for name, leaf in leaves.items()}
+        shifts = {
+            name: dict(leaf.args[1])
+            for name, leaf in leaves.items()
+            if leaf.op == "buf" and leaf.args[1]
+        }
+        if not shifts:
+            if out is None:
+                result = self._eval(f"sum({text})", values)
+            else:
+                result = self._eval(text, values, out=out)
+        elif out is None:
+            tmp = self._scratch(expr)
+            self._stencil(text, values, shifts, tmp)
+            result = self._eval("sum(tmp)", {"tmp": tmp})
+            self._release([tmp])
+        else:
+            result = self._stencil(text, values, shifts, out)
+        self._release([self._scratch_named.pop(name) for name in scratch])
+        return result
+
+    def _run_many(self, exprs: list, outs: list):
+        """Evaluate `exprs` into `outs` as one multi-output program. The
+        caller makes sure that the operands fit into a single pass."""
+        operands = {}
+        texts = [expr._render(operands) for expr in exprs]
+        leaves = {name: leaf for name, leaf in operands.values()}
+        values = {name: self._value(leaf) for name, leaf in leaves.items()}
+        shifts = {
+            name: dict(leaf.args[1])
+            for name, leaf in leaves.items()
+            if leaf.op == "buf" and leaf.args[1]
+        }
+        if shifts:
+            return self._stencil(texts, values, shifts, outs)
+        return self._eval(texts, values, out=outs)
+
+    def _stencil(
+        self,
+        text: Union[str, list],
+        values: dict,
+        shifts: dict,
+        out: Union[np.ndarray, list],
+    ):
+        """Evaluate `text` with periodically shifted operands into `out`.
+        Lists of expressions and outputs of equal shape are evaluated as
+        one multi-output program.
+
+        The bulk is one pass over flat, contiguous views offset by the
+        shifts, which is exact wherever no read wraps around. The boundary
+        planes of every shifted axis are recomputed afterwards from
+        gathered copies."""
+        outs = out if isinstance(out, list) else [out]
+
+        def pick(view):
+            views = [view(o) for o in outs]
+            return views if isinstance(out, list) else views[0]
+
+        shape = outs[0].shape
+        # the nearest image of every offset, |o| <= n/2, keeps the boundary
+        # planes thin and within the axis
+        shifts = {
+            name: {
+                a: (o + shape[a] // 2) % shape[a] - shape[a] // 2 for a, o in s.items()
+            }
+            for name, s in shifts.items()
+        }
+        bounds = []
+        for axis, n in enumerate(shape):
+            offsets = [s.get(axis, 0) for s in shifts.values()]
+            bounds.append((max([0] + [-o for o in offsets]), n - max([0] + offsets)))
+        arrays = [v for v in values.values() if np.ndim(v)]
+        if any(np.ndim(v) != len(shape) for v in arrays):
+            raise ValueError("shifted expressions need operands of full rank")
+        # the boundary planes are recomputed after the bulk pass has written
+        # `out`, so operands in `out` (unshifted, e.g. `out + ddx(a)`) are
+        # read from copies
+        values = {
+            name: v.copy()
+            if np.ndim(v) and any(np.may_share_memory(v, o) for o in outs)
+            else v
+            for name, v in values.items()
+        }
+        arrays = [v for v in values.values() if np.ndim(v)]
+
+        def gather(region):
+            args = {}
+            for name, value in values.items():
+                if np.ndim(value) == 0:
+                    args[name] = value
+                    continue
+                shift = shifts.get(name, {})
+                index, wrapped = [], []
+                for axis, (start, stop) in enumerate(region):
+                    o = shift.get(axis, 0)
+                    if value.shape[axis] == 1:
+                        index.append(slice(None))
+                    elif 0 <= start + o and stop + o <= shape[axis]:
+                        index.append(slice(start + o, stop + o))
+                    else:
+                        index.append(slice(None))
+                        wrapped.append((axis, np.arange(start + o, stop + o) % shape[axis]))
+                value = value[tuple(index)]
+                for axis, idx in wrapped:
+                    value = np.take(value, idx, axis=axis)
+                args[name] = value
+            return args
+
+        def region_out(region):
+            return pick(lambda o: o[tuple(slice(start, stop) for start, stop in region)])
+
+        if all(o.flags.c_contiguous for o in outs) and all(
+            v.shape == shape and v.flags.c_contiguous for v in arrays
+        ):
+            strides = np.cumprod((1,) + shape[:0:-1])[::-1]
+            flat = {
+                name: sum(o * int(strides[a]) for a, o in s.items())
+                for name, s in shifts.items()
+            }
+            lo = max([0] + [-f for f in flat.values()])
+            hi = outs[0].size - max([0] + list(flat.values()))
+            args = {
+                name: value
+                if np.ndim(value) == 0
+                else value.reshape(-1)[lo + flat.get(name, 0) : hi + flat.get(name, 0)]
+                for name, value in values.items()
+            }
+            self._eval(text, args, out=pick(lambda o: o.reshape(-1)[lo:hi]))
+        else:
+            self._eval(text, gather(bounds), out=region_out(bounds))
+
+        # every point outside the interior, assigned to the first axis on
+        # which it lies in a boundary plane
+        for axis, (lo, hi) in enumerate(bounds):
+            for start, stop in ((0, lo), (hi, shape[axis])):
+                if start == stop:
+                    continue
+                region = (
+                    bounds[:axis]
+                    + [(start, stop)]
+                    + [(0, n) for n in shape[axis + 1 :]]
+                )
+                self._eval(text, gather(region), out=region_out(region))
+        return out
@@ -4,7 +4,64 @@
 # Distributed under the MIT License
 
 import numpy as np
-from typing import Union
+from typing import Callable, Sequence, Union
+from ..histogram import histogram
+from ..increments import increments
+from ..shells import shells
+from .lazy import Expr
+
+# np.trapz is deprecated since NumPy 2.0
+_trapezoid = getattr(np, "trapezoid", None) or np.trapz
+
+
+class Histogram:
+    """Counts over fixed bin edges, accumulated in parallel from any number
+    of arrays and fields and mergeable across realizations with `+=`."""
+
+    def __init__(self, edges: np.ndarray, scale: str = None):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        if scale is None and len(self.edges) > 2:
+            # edges from linspace or geomspace are binned without a search
+            widths = np.diff(self.edges)
+            if np.allclose(widths, widths[0], rtol=1e-6, atol=0):
+                scale = "linear"
+            elif self.edges[0] > 0:
+                ratios = np.diff(np.log(self.edges))
+                scale = "log" if np.allclose(ratios, ratios[0], 1e-6, 0) else None
+        self.scale = scale
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+
+    @classmethod
+    def linear(cls, lo: float, hi: float, num: int) -> "Histogram":
+        """`num` bins of equal width."""
+        return cls(np.linspace(lo, hi, num + 1), "linear")
+
+    @classmethod
+    def log(cls, lo: float, hi: float, num: int) -> "Histogram":
+        """`num` bins of equal width in log, 0 < lo < hi."""
+        return cls(np.geomspace(lo, hi, num + 1), "log")
+
+    def add(self, data: np.ndarray, num_threads: int = None) -> "Histogram":
+        histogram.accumulate(
+            data, self.edges, self.counts, scale=self.scale, num_threads=num_threads
+        )
+        return self
+
+    def __iadd__(self, other: "Histogram") -> "Histogram":
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("histograms with different bins cannot be merged")
+        self.counts += other.counts
+        return self
+
+    def density(self) -> np.ndarray:
+        """Like `np.histogram(..., density=True)[0]`."""
+        return self.counts / self.counts.sum() / np.diff(self.edges)
+
+    def centers(self) -> np.ndarray:
+        """Bin centers, geometric for log bins."""
+        if self.scale == "log":
+            return np.sqrt(self.edges[1:] * self.edges[:-1])
+        return (self.edges[1:] + self.edges[:-1]) / 2
 
 
 class Statistics:
@@ -23,20 +80,290 @@ class Statistics:
             kbins = np.insert(kbins, 0, 0)
         return kbins, (kbins[1:] + kbins[:-1]) / 2
 
+    def _shells(
+        self, bins: Union[np.ndarray, int], magnitudes: Union[np.ndarray, str] = None
+    ) -> tuple:
+        """Shell index of every mode of the half spectrum and the bin edges.
+        Cached for the default `magnitudes` |k|, so repeated spectra only
+        transform and sum."""
+        key = bins if np.ndim(bins) == 0 else tuple(np.asarray(bins).tolist())
+        default = magnitudes is None
+        cached = self._shell_index.get("k")
+        if default and cached is not None and cached[0] == key:
+            return cached[1:]
+        if isinstance(magnitudes, str):
+            magnitudes = self._variables[magnitudes]
+        elif default:
+            table = self._kernel_table(("kmag",), f"sqrt({self._kmag_squared})")
+            magnitudes = table
+            if magnitudes is None:
+                # kmag2 takes its shape from the output
+                magnitudes = self._eval(
+                    f"sqrt({self._kmag_squared})",
+                    out=np.empty(self._bwd_tuple, dtype=self.ftype),
+                )
+        edges = np.histogram_bin_edges(magnitudes, bins)
+        index = shells.shell_index(magnitudes, edges)
+        if default:
+            self._shell_index["k"] = (key, index, edges)
+        return index, edges
+
+    def _distance_shells(self, bins: np.ndarray) -> tuple:
+        """Shell index of every point by its periodic distance from the
+        origin in grid points, the number of points and their mean distance
+        per shell. Cached like `_shells`."""
+        key = tuple(np.asarray(bins).tolist())
+        cached = self._shell_index.get("r")
+        if cached is not None and cached[0] == key:
+            return cached[1:]
+        n = self.grid_size
+        d2 = np.minimum(np.arange(n), n - np.arange(n)) ** 2
+        index = np.empty(self._fwd_tuple, dtype=np.int32)
+        counts = np.zeros(len(bins))
+        total = np.zeros(len(bins))
+        # plane by plane, without a full array of distances
+        for x0 in range(n):
+            r = np.sqrt(d2[x0] + d2[:, np.newaxis] + d2[np.newaxis, :])
+            index[x0] = shells.shell_index(r, bins)
+            counts += np.bincount(index[x0].reshape(-1), minlength=len(bins))
+            total += np.bincount(
+                index[x0].reshape(-1), weights=r.reshape(-1), minlength=len(bins)
+            )
+        counts, total = counts[:-1], total[:-1]
+        with np.errstate(invalid="ignore"):
+            mean = total / counts
+        self._shell_index["r"] = (key, index, counts, mean)
+        return index, counts, mean
+
     def spectrum(
-        self, bins: Union[np.ndarray, int], kmag: Union[np.ndarray, str] = None
+        self,
+        bins: Union[np.ndarray, int],
+        kmag: Union[np.ndarray, str] = None,
+        *,
+        magnitudes: Union[np.ndarray, str] = None,
     ) -> list:
+        """Radial spectra of the components of `res`, normalized like
+        `np.histogram(..., density=True)` over the shells `bins` of |k|
+        (or of `magnitudes` of the half spectrum's shape). Modes of the half
+        spectrum stand for their mirror images as well. |k| is written to
+        `kmag` if given."""
         print("computing radial spectra", end="")
+        if kmag is not None:
+            self._eval(f"sqrt({self._kmag_squared})", out=kmag)
+        index, edges = self._shells(bins, magnitudes)
         S_list = []
-        kmag = self._eval(f"sqrt{self._kmag_squared}", out=kmag)
         for i in range(self.components):
             self._eval(f"res{i}", out="f")
             self._fwd()
-            self._eval("abs(g)**2", out=self._g)
-            S_list += [self._radial(bins, kmag)]
+            S = shells.shell_sum(
+                self._g, index, len(edges) - 1, num_threads=self.num_threads
+            )
+            S_list += [S / S.sum() / np.diff(edges)]
         print(".")
         return S_list
 
-    def _radial(self, bins: Union[np.ndarray, int], kmag: np.ndarray) -> np.ndarray:
-        S = np.histogram(kmag, bins=bins, weights=self._g.real, density=True)[0]
-        return S
+    def structure_functions(
+        self,
+        lags: Sequence[int],
+        orders: Sequence[int] = range(1, 9),
+        axes: Sequence[int] = None,
+        kind: str = "vector",
+        bins: np.ndarray = None,
+    ) -> Union[np.ndarray, tuple]:
+        """Structure functions S_p(l) = <|dB(l)|^p> of `res` for increments
+        over `lags` grid points along each of `axes` (all by default), with
+        all `orders` from one sweep per lag. `kind` is "vector" for |dB|,
+        "longitudinal" for the component along the lag or "transverse" for
+        the components across it.
+
+        Returns S_p(l) with shape (axes, lags, orders). Given bin edges
+        `bins`, also returns the densities of the increments (of |dB| for
+        "vector") with shape (axes, lags, bins - 1)."""
+        print("computing structure functions", end="")
+        axes = range(self.dimension) if axes is None else axes
+        orders = np.asarray(orders)
+        assert np.all(orders >= 1) and np.issubdtype(orders.dtype, np.integer)
+        samples = self.grid_size**self.dimension * (2 if kind == "transverse" else 1)
+        S = np.empty((len(axes), len(lags), len(orders)))
+        pdfs = None if bins is None else np.empty((len(axes), len(lags), len(bins) - 1))
+        for i, axis in enumerate(axes):
+            for j, lag in enumerate(lags):
+                sums, counts = increments.structure_functions(
+                    self.res,
+                    axis,
+                    lag,
+                    kind=kind,
+                    max_order=orders.max(),
+                    edges=bins,
+                    num_threads=self.num_threads,
+                )
+                S[i, j] = sums[orders - 1] / samples
+                if bins is not None:
+                    pdfs[i, j] = counts / counts.sum() / np.diff(bins)
+        print(".")
+        return S if bins is None else (S, pdfs)
+
+    def histogram(
+        self, data: Union[str, np.ndarray, Expr], hist: Histogram
+    ) -> Histogram:
+        """Adds the values of the buffer named `data`, of an array or of a
+        lazy expression to `hist`, using the threads of this field. An
+        expression is evaluated into a pooled scratch buffer."""
+        if isinstance(data, Expr):
+            tmp = self._scratch(data)
+            hist.add(self.assign(tmp, data), self.num_threads)
+            self._release([tmp])
+            return hist
+        if isinstance(data, str):
+            data = self._variables[data]
+        return hist.add(data, self.num_threads)
+
+    def correlation_tensor(self, bins: np.ndarray = None) -> dict:
+        """Two-point correlation tensor R_ij(r) = <B_i(x) B_j(x + r)> of
+        `res` from products of spectra, averaged over shells of |r| with the
+        edges `bins` in grid points (default: unit shells around 0, 1, ...,
+        grid_size / 2).
+
+        Returns a dict with the mean distance "r" of each shell, "R" of
+        shape (3, 3, shells), the longitudinal and transverse correlations
+        f(r) = <R_ij r_i r_j / r^2> and g(r) = (R_ii - f) / 2, and the
+        lengths "L_longitudinal", "L_transverse" and "L_integral", the
+        integrals of f, g and R_ii normalized to 1 at r = 0, up to half the
+        box."""
+        assert self.dimension == self.components == 3
+        print("computing correlation tensor", end="")
+        n = self.grid_size
+        bins = np.arange(n // 2 + 2) - 0.5 if bins is None else np.asarray(bins)
+        index, counts, r = self._distance_shells(bins)
+        spectra = [
+            self._spectrum(f"res{i}", self._buffer(self._bwd_tuple, self.ctype))
+            for i in range(3)
+        ]
+        norm = counts * n**3
+        R = np.empty((3, 3, len(counts)))
+        projected = np.zeros(len(counts))
+        for i in range(3):
+            for j in range(i, 3):
+                self._eval("conj(si)*sj", {"si": spectra[i], "sj": spectra[j]}, out="g")
+                self._bwd()
+                plain = np.zeros(len(counts))
+                shells.correlation_shell_sum(
+                    self._f,
+                    index,
+                    i,
+                    j,
+                    plain,
+                    projected,
+                    num_threads=self.num_threads,
+                )
+                with np.errstate(invalid="ignore"):
+                    R[i, j] = R[j, i] = plain / norm
+        self._release(spectra)
+        with np.errstate(invalid="ignore"):
+            f = projected / norm
+        trace = np.trace(R)
+        g = (trace - f) / 2
+
+        # f(0) = g(0) = R_ii(0) / 3 for isotropic fields
+        trace0 = self._eval("sum(res**2)") / n**3
+        inside = (counts > 0) & (r <= n / 2) & (r > 0)
+        r_int = np.concatenate([[0.0], r[inside]]) * self.dx
+
+        def length(c, c0):
+            return _trapezoid(np.concatenate([[1.0], c[inside] / c0]), r_int)
+
+        print(".")
+        return {
+            "r": r * self.dx,
+            "R": R,
+            "longitudinal": f,
+            "transverse": g,
+            "L_longitudinal": length(f, trace0 / 3),
+            "L_transverse": length(g, trace0 / 3),
+            "L_integral": length(trace, trace0),
+        }
+
+    def band_statistics(
+        self,
+        scales: Sequence[float],
+        *,
+        kernel: Union[str, Callable] = "mexican_hat",
+        max_order: int = 4,
+        bins: np.ndarray = None,
+    ) -> dict:
+        """Statistics of `res` filtered to each of `scales` (in units of
+        `L_box`) with the kernels of the cascade: the band-pass "mexican_hat"
+        wavelet with unit gain at k = 1 / scale, or the low-pass "gaussian"
+        with unit gain at k = 0. `kernel` may also be a function of the
+        scale returning the expression of a filter of the half spectrum and
+        its variables, like `_gaussian_kernel`, which is applied as it is.
+        Every component is transformed forward once, each band is
+        transformed back into `f` and reduced there, so no band field is
+        kept.
+
+        Returns a dict with "scales", the raw moments <b_i^p>, p = 1, ...,
+        `max_order` of shape (scales, components, max_order) and, for
+        `max_order` >= 4, the flatness <b_i'^4> / <b_i'^2>^2 of the
+        fluctuations b_i' = b_i - <b_i> of shape (scales, components). Given
+        bin edges `bins`, also "histograms", a `Histogram` per scale of
+        b_i' / std(b_i) of all components."""
+        print("computing band statistics", end="")
+        kernels = {
+            "mexican_hat": self._mexican_hat_kernel,
+            "gaussian": self._gaussian_kernel,
+        }
+        size = self.grid_size**self.dimension
+        spectra = [
+            self._spectrum(f"res{i}", self._buffer(self._bwd_tuple, self.ctype))
+            for i in range(self.components)
+        ]
+        moments = np.empty((len(scales), self.components, max_order))
+        hists = [] if bins is None else [Histogram(bins) for _ in scales]
+        for b, scale in enumerate(scales):
+            s = scale / self.L_box
+            filter_, variables = (kernel if callable(kernel) else kernels[kernel])(s)
+            # unit gain at the peak 1/e of (ks)^2 exp(-(ks)^2), or at k = 0
+            if kernel == "mexican_hat":
+                gain = np.e / s**self.dimension
+            elif kernel == "gaussian":
+                gain = (s * self.grid_size) ** -self.dimension
+            else:
+                gain = 1.0
+            for i in range(self.components):
+                self._eval(
+                    f"spectrum*gain*{filter_}",
+                    {"spectrum": spectra[i], "gain": gain, **variables},
+                    out="g",
+                )
+                self._bwd()
+                sums = histogram.power_sums(
+                    self._f, max_order, num_threads=self.num_threads
+                )
+                moments[b, i] = sums / size
+                if hists:
+                    mean = moments[b, i, 0]
+                    std = np.sqrt(max(moments[b, i, 1] - mean**2, 0))
+                    if std > 0:
+                        # counting b_i' / std in bins is counting b_i in
+                        # the mapped bins
+                        histogram.accumulate(
+                            self._f,
+                            mean + std * hists[b].edges,
+                            hists[b].counts,
+                            scale="linear" if hists[b].scale == "linear" else None,
+                            num_threads=self.num_threads,
+                        )
+                print(".", end="")
+        self._release(spectra)
+        print()
+        result = {"scales": np.asarray(scales), "moments": moments}
+        if max_order >= 4:
+            m1, m2, m3, m4 = np.moveaxis(moments[..., :4], -1, 0)
+            var = m2 - m1**2
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result["flatness"] = (
+                    m4 - 4 * m1 * m3 + 6 * m1**2 * m2 - 3 * m1**4
+                ) / var**2
+        if hists:
+            result["histograms"] = hists
+        return result
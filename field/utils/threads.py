@@ -0,0 +1,137 @@
+# Copyright (c) 2024 Jeremiah Lübke <jeremiah.luebke@rub.de>,
+# Frederic Effenberger, Mike Wilbert, Horst Fichtner, Rainer Grauer
+#
+# Distributed under the MIT License
+
+import os
+from enum import Enum
+from typing import Sequence
+
+# Thread budget shared by numexpr_erf, pyfftw and the OpenMP kernels
+# (`rvs_omp`, `interp1d`, `interp3d`). Fields created without `num_threads`
+# use all of it, the kernels get their thread count with every call instead
+# of reading `OMP_NUM_THREADS`. The budget is not divided between fields:
+# fields that run at the same time must be given `num_threads=share(...)`.
+
+
+class Binding(Enum):
+    """Pinning policy of the OpenMP threads, see `OMP_PROC_BIND`."""
+
+    NONE = "false"
+    CLOSE = "close"
+    SPREAD = "spread"
+
+
+_budget = {}
+_openmp_started = False
+
+
+def _parse_cores(text: str) -> list:
+    """Core list in the format of `taskset -c`, e.g. "0-3,8,10-11"."""
+    cores = []
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        cores += range(int(first), int(last or first) + 1)
+    return cores
+
+
+def _affinity() -> list:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+def configure(
+    num_threads: int = None, cores: Sequence[int] = None, binding: Binding = None
+):
+    """Set the thread budget of this process.
+
+    `cores` restricts the calling thread and all threads started from it
+    afterwards to these cores, `num_threads` defaults to their number.
+    `binding` pins the OpenMP threads to `cores` (or to the current
+    affinity), which only takes effect before the first native kernel is
+    imported. Arguments left out keep their current value, the first call
+    takes them from `SYNTH_MAG_TURB_THREADS`, `SYNTH_MAG_TURB_CORES` and
+    `SYNTH_MAG_TURB_BIND`.
+
+    Fields created afterwards without `num_threads` use the budget, so do
+    `ne.evaluate` and the `pyfftw` builders."""
+    import numexpr_erf as ne
+    import pyfftw
+
+    if not _budget:
+        env = os.environ
+        if cores is None and "SYNTH_MAG_TURB_CORES" in env:
+            cores = _parse_cores(env["SYNTH_MAG_TURB_CORES"])
+        if num_threads is None and "SYNTH_MAG_TURB_THREADS" in env:
+            num_threads = int(env["SYNTH_MAG_TURB_THREADS"])
+        if binding is None and "SYNTH_MAG_TURB_BIND" in env:
+            binding = Binding[env["SYNTH_MAG_TURB_BIND"].upper()]
+    if cores is not None:
+        cores = sorted(set(cores))
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+    if num_threads is not None and num_threads < 1:
+        raise ValueError(f"num_threads must be positive, got {num_threads}")
+
+    if binding is not None:
+        if _openmp_started:
+            raise RuntimeError(
+                "the OpenMP binding must be configured before the native "
+                "kernels are imported"
+            )
+        os.environ["OMP_PROC_BIND"] = binding.value
+        if binding is not Binding.NONE:
+            places = ",".join(f"{{{core}}}" for core in _affinity())
+            os.environ["OMP_PLACES"] = places
+        _budget["binding"] = binding
+
+    if num_threads is not None:
+        _budget["num_threads"] = num_threads
+    elif cores is not None or "num_threads" not in _budget:
+        _budget["num_threads"] = len(_affinity())
+    _budget.setdefault("binding", Binding.NONE)
+
+    ne.set_num_threads(min(_budget["num_threads"], ne.MAX_THREADS))
+    pyfftw.config.NUM_THREADS = _budget["num_threads"]
+
+
+def start_openmp():
+    """Called before a native kernel is loaded, the OpenMP runtime reads
+    its environment only once."""
+    global _openmp_started
+    num_threads()
+    _openmp_started = True
+
+
+def num_threads() -> int:
+    """Threads of the budget."""
+    if not _budget:
+        configure()
+    return _budget["num_threads"]
+
+
+def share(parts: int) -> int:
+    """Threads per field for `parts` fields running at once, so that they
+    do not oversubscribe the budget together.
+
+    Nothing keeps track of the threads in use, every field created
+    without `num_threads` takes the whole budget. Pass the result as
+    `num_threads` to each of the fields."""
+    return max(1, num_threads() // parts)
+
+
+def settings() -> dict:
+    """The active configuration of all thread pools, for reporting."""
+    import numexpr_erf as ne
+    import pyfftw
+
+    num_threads()
+    return dict(
+        num_threads=_budget["num_threads"],
+        cores=_affinity(),
+        binding=_budget["binding"].name.lower(),
+        omp_places=os.environ.get("OMP_PLACES", ""),
+        numexpr=ne.get_num_threads(),
+        fftw=pyfftw.config.NUM_THREADS,
+    )
@@ -0,0 +1,86 @@
+/* ####################################################################### */
+/* Accuracy and speed of the inline erf/erff kernels used by numexpr        */
+/* without VML, compared with libm.  Build from this directory with:       */
+/*                                                                         */
+/*   g++ -O3 erf_timing.cpp -o erf_timing && ./erf_timing                  */
+/* ####################################################################### */
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <stddef.h>
+#include <math.h>
+#include <time.h>
+
+typedef ptrdiff_t npy_intp;
+#include "../numexpr_erf/erf_functions.hpp"
+
+#define N  (10*1000*1000)
+
+static double seconds(void)
+{
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + 1e-9 * ts.tv_nsec;
+}
+
+/* error of `y` in units in the last place of the libm result `r` */
+static double ulps(double y, double r, double eps)
+{
+    if (r == 0) {
+        return y == 0 ? 0 : INFINITY;
+    }
+    return fabs(y - r) / (eps * ldexp(1., ilogb(r)));
+}
+
+int main(void)
+{
+    double *x = (double *)malloc(N * sizeof(double));
+    double *y = (double *)malloc(N * sizeof(double));
+    float *xf = (float *)malloc(N * sizeof(float));
+    float *yf = (float *)malloc(N * sizeof(float));
+    double t0, t1, err, errf;
+    int i;
+
+    for (i = 0; i < N; i++) {
+        x[i] = -6. + (12. * i) / (N - 1);
+        xf[i] = (float)x[i];
+    }
+
+    vec_erf(N, (char *)x, sizeof(double), (char *)y);
+    vec_erff(N, (char *)xf, sizeof(float), (char *)yf);
+    err = errf = 0;
+    for (i = 0; i < N; i++) {
+        err = fmax(err, ulps(y[i], erf(x[i]), 0x1p-52));
+        errf = fmax(errf, ulps(yf[i], erff(xf[i]), 0x1p-23));
+    }
+    printf("max error, double:\t %.2f ulp\n", err);
+    printf("max error, float:\t %.2f ulp\n", errf);
+
+    t0 = seconds();
+    vec_erf(N, (char *)x, sizeof(double), (char *)y);
+    t1 = seconds();
+    printf("erf, inline:\t\t %.2f ns\n", 1e9 * (t1 - t0) / N);
+    t0 = seconds();
+    for (i = 0; i < N; i++) {
+        y[i] = erf(x[i]);
+    }
+    t1 = seconds();
+    printf("erf, libm:\t\t %.2f ns\n", 1e9 * (t1 - t0) / N);
+
+    t0 = seconds();
+    vec_erff(N, (char *)xf, sizeof(float), (char *)yf);
+    t1 = seconds();
+    printf("erff, inline:\t\t %.2f ns\n", 1e9 * (t1 - t0) / N);
+    t0 = seconds();
+    for (i = 0; i < N; i++) {
+        yf[i] = erff(xf[i]);
+    }
+    t1 = seconds();
+    printf("erff, libm:\t\t %.2f ns\n", 1e9 * (t1 - t0) / N);
+
+    free(x);
+    free(y);
+    free(xf);
+    free(yf);
+    return 0;
+}
@@ -0,0 +1,60 @@
+###################################################################
+#  Numexpr - Fast numerical array expression evaluator for NumPy.
+#
+#      License: MIT
+#      Author:  See AUTHORS.txt
+#
+#  See LICENSE.txt and LICENSES/*.txt for details about copyright and
+#  rights to use.
+####################################################################
+
+#######################################################################
+# This script compares erf() in numexpr with scipy.special.erf, for
+# contiguous and strided float64/float32 arrays, and reports the error
+# of both against libm (math.erf).  Without VML numexpr uses its inline
+# vectorized kernels, see erf_timing.cpp for the comparison with libm
+# at the C level.
+#######################################################################
+
+import math
+from timeit import default_timer as timer
+import numpy as np
+import numexpr_erf as ne
+from scipy.special import erf
+
+N = 10 * 1000 * 1000
+iterations = 5
+
+
+def best_of(func):
+    times = []
+    for _ in range(iterations):
+        t0 = timer()
+        func()
+        times.append(timer() - t0)
+    return min(times)
+
+
+def max_ulps(y, x):
+    sample = slice(None, None, 97)
+    ref = np.array([math.erf(v) for v in x[sample].astype(np.float64)])
+    ref = ref.astype(x.dtype)
+    return np.max(np.abs(y[sample] - ref) / np.spacing(np.abs(ref)))
+
+
+if __name__ == '__main__':
+    print("numexpr version: %s, VML: %s" % (ne.__version__, ne.use_vml))
+    for dtype in (np.float64, np.float32):
+        x = np.linspace(-6, 6, 2 * N).astype(dtype)
+        for layout, xs in (("contiguous", x[:N]), ("strided", x[::2])):
+            out = np.empty(N, dtype=dtype)
+            print("%s, %s:" % (np.dtype(dtype).name, layout))
+            for nthreads in sorted({1, ne.detect_number_of_cores()}):
+                ne.set_num_threads(nthreads)
+                t = best_of(lambda: ne.evaluate("erf(xs)", out=out))
+                print("%30s %8.2f ns/elem" % ("numexpr (%d threads)" % nthreads,
+                                             1e9 * t / N))
+            print("%30s %8.2f ulp" % ("max error", max_ulps(out, xs)))
+            t = best_of(lambda: erf(xs, out=out))
+            print("%30s %8.2f ns/elem" % ("scipy.special.erf", 1e9 * t / N))
+            print("%30s %8.2f ulp" % ("max error", max_ulps(out, xs)))
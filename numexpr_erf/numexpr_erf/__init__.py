@@ -21,7 +21,7 @@ for more info about it.
 
 """
 
-from numexpr_erf.interpreter import MAX_THREADS, use_vml, __BLOCK_SIZE1__
+from numexpr_erf.interpreter import MAX_THREADS, MAX_BLOCK_SIZE, use_vml, __BLOCK_SIZE1__
 
 is_cpu_amd_intel = False # DEPRECATION WARNING: WILL BE REMOVED IN FUTURE RELEASE
 
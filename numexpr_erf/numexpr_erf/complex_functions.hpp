@@ -13,11 +13,14 @@
 // Replace npy_cdouble with std::complex<double>
 #include <complex>
 
+/* The functions are templates over the component type, so that they serve
+   both complex128 (T = double) and complex64 (T = float) */
+
 /* constants */
-static std::complex<double> nc_1(1., 0.);
-static std::complex<double> nc_half(0.5, 0.);
-static std::complex<double> nc_i(0., 1.);
-static std::complex<double> nc_i2(0., 0.5);
+template <typename T> static std::complex<T> nc_1(1., 0.);
+template <typename T> static std::complex<T> nc_half(0.5, 0.);
+template <typename T> static std::complex<T> nc_i(0., 1.);
+template <typename T> static std::complex<T> nc_i2(0., 0.5);
 /*
 static std::complex<double> nc_mi = {0., -1.};
 static std::complex<double> nc_pi2 = {M_PI/2., 0.};
@@ -31,40 +34,45 @@ after the first *r has been overwritten.
 *********************************************************************
 */
 
+template <typename T>
 static void
-nc_assign(std::complex<double> *x, std::complex<double> *r)
+nc_assign(std::complex<T> *x, std::complex<T> *r)
 {
   r->real(x->real());
   r->imag(x->imag());
   return;
 }
 
+template <typename T>
 static void
-nc_sum(std::complex<double> *a, std::complex<double> *b, std::complex<double> *r)
+nc_sum(std::complex<T> *a, std::complex<T> *b, std::complex<T> *r)
 {
     r->real(a->real() + b->real());
     r->imag(a->imag() + b->imag());
     return;
 }
 
+template <typename T>
 static void
-nc_diff(std::complex<double> *a, std::complex<double> *b, std::complex<double> *r)
+nc_diff(std::complex<T> *a, std::complex<T> *b, std::complex<T> *r)
 {
     r->real(a->real() - b->real());
     r->imag(a->imag() - b->imag());
     return;
 }
 
+template <typename T>
 static void
-nc_neg(std::complex<double> *a, std::complex<double> *r)
+nc_neg(std::complex<T> *a, std::complex<T> *r)
 {
     r->real(-a->real());
     r->imag(-a->imag());
     return;
 }
 
+template <typename T>
 static void
-nc_conj(std::complex<double> *a, std::complex<double> *r)
+nc_conj(std::complex<T> *a, std::complex<T> *r)
 {
     r->real(a->real());
     r->imag(-a->imag());
@@ -85,33 +93,36 @@ inline double fconj(double x)
     return x;
 }
 
+template <typename T>
 static void
-nc_prod(std::complex<double> *a, std::complex<double> *b, std::complex<double> *r)
+nc_prod(std::complex<T> *a, std::complex<T> *b, std::complex<T> *r)
 {
-    double ar=a->real(), br=b->real(), ai=a->imag(), bi=b->imag();
+    T ar=a->real(), br=b->real(), ai=a->imag(), bi=b->imag();
     r->real(ar*br - ai*bi);
     r->imag(ar*bi + ai*br);
     return;
 }
 
+template <typename T>
 static void
-nc_quot(std::complex<double> *a, std::complex<double> *b, std::complex<double> *r)
+nc_quot(std::complex<T> *a, std::complex<T> *b, std::complex<T> *r)
 {
-    double ar=a->real(), br=b->real(), ai=a->imag(), bi=b->imag();
-    double d = br*br + bi*bi;
+    T ar=a->real(), br=b->real(), ai=a->imag(), bi=b->imag();
+    T d = br*br + bi*bi;
     r->real((ar*br + ai*bi)/d);
     r->imag((ai*br - ar*bi)/d);
     return;
 }
 
+template <typename T>
 static void
-nc_sqrt(std::complex<double> *x, std::complex<double> *r)
+nc_sqrt(std::complex<T> *x, std::complex<T> *r)
 {
-    double s,d;
+    T s,d;
     if (x->real() == 0. && x->imag() == 0.)
         *r = *x;
     else {
-        s = sqrt((fabs(x->real()) + hypot(x->real(),x->imag()))/2);
+        s = std::sqrt((std::fabs(x->real()) + std::hypot(x->real(),x->imag()))/2);
         d = x->imag()/(2*s);
         if (x->real() > 0.) {
             r->real(s);
@@ -129,48 +140,53 @@ nc_sqrt(std::complex<double> *x, std::complex<double> *r)
     return;
 }
 
+template <typename T>
 static void
-nc_log(std::complex<double> *x, std::complex<double> *r)
+nc_log(std::complex<T> *x, std::complex<T> *r)
 {
-    double l = hypot(x->real(),x->imag());
-    r->imag(atan2(x->imag(), x->real()));
-    r->real(log(l));
+    T l = std::hypot(x->real(),x->imag());
+    r->imag(std::atan2(x->imag(), x->real()));
+    r->real(std::log(l));
     return;
 }
 
+template <typename T>
 static void
-nc_log1p(std::complex<double> *x, std::complex<double> *r)
+nc_log1p(std::complex<T> *x, std::complex<T> *r)
 {
-    double l = hypot(x->real() + 1.0,x->imag());
-    r->imag(atan2(x->imag(), x->real() + 1.0));
-    r->real(log(l));
+    T l = std::hypot(x->real() + 1.0,x->imag());
+    r->imag(std::atan2(x->imag(), x->real() + 1.0));
+    r->real(std::log(l));
     return;
 }
 
+template <typename T>
 static void
-nc_exp(std::complex<double> *x, std::complex<double> *r)
+nc_exp(std::complex<T> *x, std::complex<T> *r)
 {
-    double a = exp(x->real());
-    r->real(a*cos(x->imag()));
-    r->imag(a*sin(x->imag()));
+    T a = std::exp(x->real());
+    r->real(a*std::cos(x->imag()));
+    r->imag(a*std::sin(x->imag()));
     return;
 }
 
+template <typename T>
 static void
-nc_expm1(std::complex<double> *x, std::complex<double> *r)
+nc_expm1(std::complex<T> *x, std::complex<T> *r)
 {
-    double a = sin(x->imag() / 2);
-    double b = exp(x->real());
-    r->real(expm1(x->real()) * cos(x->imag()) - 2 * a * a);
-    r->imag(b * sin(x->imag()));
+    T a = std::sin(x->imag() / 2);
+    T b = std::exp(x->real());
+    r->real(std::expm1(x->real()) * std::cos(x->imag()) - 2 * a * a);
+    r->imag(b * std::sin(x->imag()));
     return;
 }
 
+template <typename T>
 static void
-nc_pow(std::complex<double> *a, std::complex<double> *b, std::complex<double> *r)
+nc_pow(std::complex<T> *a, std::complex<T> *b, std::complex<T> *r)
 {
     npy_intp n;
-    double ar=a->real(), br=b->real(), ai=a->imag(), bi=b->imag();
+    T ar=a->real(), br=b->real(), ai=a->imag(), bi=b->imag();
 
     if (br == 0. && bi == 0.) {
         r->real(1.);
@@ -184,10 +200,10 @@ nc_pow(std::complex<double> *a, std::complex<double> *b, std::complex<double> *r
     }
     if (bi == 0 && (n=(npy_intp)br) == br) {
         if (n > -100 && n < 100) {
-        std::complex<double> p, aa;
+        std::complex<T> p, aa;
         npy_intp mask = 1;
         if (n < 0) n = -n;
-        aa = nc_1;
+        aa = nc_1<T>;
         p.real(ar); p.imag(ai);
         while (1) {
             if (n & mask)
@@ -197,7 +213,7 @@ nc_pow(std::complex<double> *a, std::complex<double> *b, std::complex<double> *r
             nc_prod(&p,&p,&p);
         }
         r->real(aa.real()); r->imag(aa.imag());
-        if (br < 0) nc_quot(&nc_1, r, r);
+        if (br < 0) nc_quot(&nc_1<T>, r, r);
         return;
         }
     }
@@ -210,24 +226,26 @@ nc_pow(std::complex<double> *a, std::complex<double> *b, std::complex<double> *r
 }
 
 
+template <typename T>
 static void
-nc_prodi(std::complex<double> *x, std::complex<double> *r)
+nc_prodi(std::complex<T> *x, std::complex<T> *r)
 {
-    double xr = x->real();
+    T xr = x->real();
     r->real(-x->imag());
     r->imag(xr);
     return;
 }
 
 
+template <typename T>
 static void
-nc_acos(std::complex<double> *x, std::complex<double> *r)
+nc_acos(std::complex<T> *x, std::complex<T> *r)
 {
-    std::complex<double> a, *pa=&a;
+    std::complex<T> a, *pa=&a;
 
     nc_assign(x, pa);
     nc_prod(x,x,r);
-    nc_diff(&nc_1, r, r);
+    nc_diff(&nc_1<T>, r, r);
     nc_sqrt(r, r);
     nc_prodi(r, r);
     nc_sum(pa, r, r);
@@ -240,15 +258,16 @@ nc_acos(std::complex<double> *x, std::complex<double> *r)
     */
 }
 
+template <typename T>
 static void
-nc_acosh(std::complex<double> *x, std::complex<double> *r)
+nc_acosh(std::complex<T> *x, std::complex<T> *r)
 {
-    std::complex<double> t, a, *pa=&a;
+    std::complex<T> t, a, *pa=&a;
 
     nc_assign(x, pa);
-    nc_sum(x, &nc_1, &t);
+    nc_sum(x, &nc_1<T>, &t);
     nc_sqrt(&t, &t);
-    nc_diff(x, &nc_1, r);
+    nc_diff(x, &nc_1<T>, r);
     nc_sqrt(r, r);
     nc_prod(&t, r, r);
     nc_sum(pa, r, r);
@@ -260,13 +279,14 @@ nc_acosh(std::complex<double> *x, std::complex<double> *r)
     */
 }
 
+template <typename T>
 static void
-nc_asin(std::complex<double> *x, std::complex<double> *r)
+nc_asin(std::complex<T> *x, std::complex<T> *r)
 {
-    std::complex<double> a, *pa=&a;
+    std::complex<T> a, *pa=&a;
     nc_prodi(x, pa);
     nc_prod(x, x, r);
-    nc_diff(&nc_1, r, r);
+    nc_diff(&nc_1<T>, r, r);
     nc_sqrt(r, r);
     nc_sum(pa, r, r);
     nc_log(r, r);
@@ -280,13 +300,14 @@ nc_asin(std::complex<double> *x, std::complex<double> *r)
 }
 
 
+template <typename T>
 static void
-nc_asinh(std::complex<double> *x, std::complex<double> *r)
+nc_asinh(std::complex<T> *x, std::complex<T> *r)
 {
-    std::complex<double> a, *pa=&a;
+    std::complex<T> a, *pa=&a;
     nc_assign(x, pa);
     nc_prod(x, x, r);
-    nc_sum(&nc_1, r, r);
+    nc_sum(&nc_1<T>, r, r);
     nc_sqrt(r, r);
     nc_sum(r, pa, r);
     nc_log(r, r);
@@ -296,60 +317,65 @@ nc_asinh(std::complex<double> *x, std::complex<double> *r)
     */
 }
 
+template <typename T>
 static void
-nc_atan(std::complex<double> *x, std::complex<double> *r)
+nc_atan(std::complex<T> *x, std::complex<T> *r)
 {
-    std::complex<double> a, *pa=&a;
-    nc_diff(&nc_i, x, pa);
-    nc_sum(&nc_i, x, r);
+    std::complex<T> a, *pa=&a;
+    nc_diff(&nc_i<T>, x, pa);
+    nc_sum(&nc_i<T>, x, r);
     nc_quot(r, pa, r);
     nc_log(r,r);
-    nc_prod(&nc_i2, r, r);
+    nc_prod(&nc_i2<T>, r, r);
     return;
     /*
       return nc_prod(nc_i2,nc_log(nc_quot(nc_sum(nc_i,x),nc_diff(nc_i,x))));
     */
 }
 
+template <typename T>
 static void
-nc_atanh(std::complex<double> *x, std::complex<double> *r)
+nc_atanh(std::complex<T> *x, std::complex<T> *r)
 {
-    std::complex<double> a, b, *pa=&a, *pb=&b;
+    std::complex<T> a, b, *pa=&a, *pb=&b;
     nc_assign(x, pa);
-    nc_diff(&nc_1, pa, r);
-    nc_sum(&nc_1, pa, pb);
+    nc_diff(&nc_1<T>, pa, r);
+    nc_sum(&nc_1<T>, pa, pb);
     nc_quot(pb, r, r);
     nc_log(r, r);
-    nc_prod(&nc_half, r, r);
+    nc_prod(&nc_half<T>, r, r);
     return;
     /*
       return nc_prod(nc_half,nc_log(nc_quot(nc_sum(nc_1,x),nc_diff(nc_1,x))));
     */
 }
 
+template <typename T>
 static void
-nc_cos(std::complex<double> *x, std::complex<double> *r)
+nc_cos(std::complex<T> *x, std::complex<T> *r)
 {
-    double xr=x->real(), xi=x->imag();
-    r->real(cos(xr)*cosh(xi));
-    r->imag(-sin(xr)*sinh(xi));
+    T xr=x->real(), xi=x->imag();
+    r->real(std::cos(xr)*std::cosh(xi));
+    r->imag(-std::sin(xr)*std::sinh(xi));
     return;
 }
 
+template <typename T>
 static void
-nc_cosh(std::complex<double> *x, std::complex<double> *r)
+nc_cosh(std::complex<T> *x, std::complex<T> *r)
 {
-    double xr=x->real(), xi=x->imag();
-    r->real(cos(xi)*cosh(xr));
-    r->imag(sin(xi)*sinh(xr));
+    T xr=x->real(), xi=x->imag();
+    r->real(std::cos(xi)*std::cosh(xr));
+    r->imag(std::sin(xi)*std::sinh(xr));
     return;
 }
 
 
 #define M_LOG10_E 0.434294481903251827651128918916605082294397
 
+template <typename T>
 static void
-nc_log10(std::complex<double> *x, std::complex<double> *r)
+nc_log10(std::complex<T> *x, std::complex<T> *r)
 {
     nc_log(x, r);
     r->real(r->real() * M_LOG10_E);
@@ -357,35 +383,38 @@ nc_log10(std::complex<double> *x, std::complex<double> *r)
     return;
 }
 
+template <typename T>
 static void
-nc_sin(std::complex<double> *x, std::complex<double> *r)
+nc_sin(std::complex<T> *x, std::complex<T> *r)
 {
-    double xr=x->real(), xi=x->imag();
-    r->real(sin(xr)*cosh(xi));
-    r->imag(cos(xr)*sinh(xi));
+    T xr=x->real(), xi=x->imag();
+    r->real(std::sin(xr)*std::cosh(xi));
+    r->imag(std::cos(xr)*std::sinh(xi));
     return;
 }
 
+template <typename T>
 static void
-nc_sinh(std::complex<double> *x, std::complex<double> *r)
+nc_sinh(std::complex<T> *x, std::complex<T> *r)
 {
-    double xr=x->real(), xi=x->imag();
-    r->real(cos(xi)*sinh(xr));
-    r->imag(sin(xi)*cosh(xr));
+    T xr=x->real(), xi=x->imag();
+    r->real(std::cos(xi)*std::sinh(xr));
+    r->imag(std::sin(xi)*std::cosh(xr));
     return;
 }
 
+template <typename T>
 static void
-nc_tan(std::complex<double> *x, std::complex<double> *r)
+nc_tan(std::complex<T> *x, std::complex<T> *r)
 {
-    double sr,cr,shi,chi;
-    double rs,is,rc,ic;
-    double d;
-    double xr=x->real(), xi=x->imag();
-    sr = sin(xr);
-    cr = cos(xr);
-    shi = sinh(xi);
-    chi = cosh(xi);
+    T sr,cr,shi,chi;
+    T rs,is,rc,ic;
+    T d;
+    T xr=x->real(), xi=x->imag();
+    sr = std::sin(xr);
+    cr = std::cos(xr);
+    shi = std::sinh(xi);
+    chi = std::cosh(xi);
     rs = sr*chi;
     is = cr*shi;
     rc = cr*chi;
@@ -396,17 +425,18 @@ nc_tan(std::complex<double> *x, std::complex<double> *r)
     return;
 }
 
+template <typename T>
 static void
-nc_tanh(std::complex<double> *x, std::complex<double> *r)
+nc_tanh(std::complex<T> *x, std::complex<T> *r)
 {
-    double si,ci,shr,chr;
-    double rs,is,rc,ic;
-    double d;
-    double xr=x->real(), xi=x->imag();
-    si = sin(xi);
-    ci = cos(xi);
-    shr = sinh(xr);
-    chr = cosh(xr);
+    T si,ci,shr,chr;
+    T rs,is,rc,ic;
+    T d;
+    T xr=x->real(), xi=x->imag();
+    si = std::sin(xi);
+    ci = std::cos(xi);
+    shr = std::sinh(xr);
+    chr = std::cosh(xr);
     rs = ci*shr;
     is = si*chr;
     rc = ci*chr;
@@ -417,10 +447,11 @@ nc_tanh(std::complex<double> *x, std::complex<double> *r)
     return;
 }
 
+template <typename T>
 static void
-nc_abs(std::complex<double> *x, std::complex<double> *r)
+nc_abs(std::complex<T> *x, std::complex<T> *r)
 {
-    r->real(sqrt(x->real()*x->real() + x->imag()*x->imag()));
+    r->real(std::sqrt(x->real()*x->real() + x->imag()*x->imag()));
     r->imag(0);
 }
 
@@ -325,6 +325,42 @@ class LinuxCPUInfo(CPUInfoBase):
     def _has_ssse3(self):
         return re.match(r'.*?\bssse3\b', self.info[0]['flags']) is not None
 
+    def _has_sse4_2(self):
+        return re.match(r'.*?\bsse4_2\b', self.info[0]['flags']) is not None
+
+    def _has_popcnt(self):
+        return re.match(r'.*?\bpopcnt\b', self.info[0]['flags']) is not None
+
+    def _has_avx(self):
+        return re.match(r'.*?\bavx\b', self.info[0]['flags']) is not None
+
+    def _has_avx2(self):
+        return re.match(r'.*?\bavx2\b', self.info[0]['flags']) is not None
+
+    def _has_f16c(self):
+        return re.match(r'.*?\bf16c\b', self.info[0]['flags']) is not None
+
+    def _has_fma(self):
+        return re.match(r'.*?\bfma\b', self.info[0]['flags']) is not None
+
+    def _has_bmi2(self):
+        return re.match(r'.*?\bbmi2\b', self.info[0]['flags']) is not None
+
+    def _has_avx512f(self):
+        return re.match(r'.*?\bavx512f\b', self.info[0]['flags']) is not None
+
+    def _has_avx512bw(self):
+        return re.match(r'.*?\bavx512bw\b', self.info[0]['flags']) is not None
+
+    def _has_avx512cd(self):
+        return re.match(r'.*?\bavx512cd\b', self.info[0]['flags']) is not None
+
+    def _has_avx512dq(self):
+        return re.match(r'.*?\bavx512dq\b', self.info[0]['flags']) is not None
+
+    def _has_avx512vl(self):
+        return re.match(r'.*?\bavx512vl\b', self.info[0]['flags']) is not None
+
     def _has_3dnow(self):
         return re.match(r'.*?\b3dnow\b', self.info[0]['flags']) is not None
 
@@ -24,12 +24,17 @@ double = numpy.double
 default_kind = 'double'
 int_ = numpy.int32
 long_ = numpy.int64
+complex64 = numpy.complex64
 
 type_to_kind = {bool: 'bool', int_: 'int', long_: 'long', float: 'float',
-                double: 'double', complex: 'complex', bytes: 'bytes', str: 'str'}
+                complex64: 'complex64', double: 'double', complex: 'complex',
+                bytes: 'bytes', str: 'str'}
 kind_to_type = {'bool': bool, 'int': int_, 'long': long_, 'float': float,
-                'double': double, 'complex': complex, 'bytes': bytes, 'str': str}
-kind_rank = ('bool', 'int', 'long', 'float', 'double', 'complex', 'none')
+                'complex64': complex64, 'double': double, 'complex': complex,
+                'bytes': bytes, 'str': str}
+# complex64 ranks below double, see commonKind for the mixed case
+kind_rank = ('bool', 'int', 'long', 'float', 'complex64', 'double', 'complex',
+             'none')
 scalar_constant_types = [bool, int_, int, float, double, complex, bytes, str]
 
 scalar_constant_types = tuple(scalar_constant_types)
@@ -110,6 +115,9 @@ def commonKind(nodes):
     n = -1
     for x in nodes:
         n = max(n, kind_rank.index(x.astKind))
+    # complex64 and double only have complex128 in common
+    if kind_rank[n] == 'double' and 'complex64' in node_kinds:
+        return 'complex'
     return kind_rank[n]
 
 
@@ -139,6 +147,8 @@ def bestConstantType(x):
         return double
     if isinstance(x, numpy.float32):
         return float
+    if isinstance(x, numpy.complex64):
+        return complex64
     if isinstance(x, (int, numpy.integer)):
         # Constants needing more than 32 bits are always
         # considered ``long``, *regardless of the platform*, so we
@@ -191,6 +201,9 @@ def func(func, minkind=None, maxkind=None):
             # functions which return ints (for int inputs) on numpy
             # but not on numexpr: copy, abs, fmod, ones_like
             kind = 'double'
+        elif minkind == 'complex' and kind in ('float', 'complex64'):
+            # Single precision arguments give single precision complex
+            kind = 'complex64'
         else:
             # Apply regular casting rules
             if minkind and kind_rank.index(minkind) > kind_rank.index(kind):
@@ -202,6 +215,59 @@ def func(func, minkind=None, maxkind=None):
     return function
 
 
+def part_func(part):
+    # real/imag of complex64 is float, everything else gives double
+    double_func = func(part, 'double', 'double')
+
+    @ophelper
+    def function(a):
+        if a.astType != 'constant' and a.astKind == 'complex64':
+            return FuncNode(part.__name__, [a], 'float')
+        return double_func(a)
+
+    return function
+
+
+@ophelper
+def sincos_func(a):
+    # cos(a) + 1j*sin(a) of a real argument, in the complex kind matching
+    # its precision
+    if a.astType == 'constant':
+        return ConstantNode(complex(numpy.cos(a.value), numpy.sin(a.value)))
+    if a.astKind in ('complex64', 'complex'):
+        raise TypeError("sincos() requires a real argument")
+    kind = 'complex64' if a.astKind == 'float' else 'complex'
+    return FuncNode('sincos', [a], kind)
+
+
+def fft_kind(n, d):
+    # the transform length is read once per block, so it has to be constant
+    if not (isinstance(n, ConstantNode) and n.astKind in ('int', 'long')
+            and 0 < n.value < 2**31):
+        raise TypeError("the transform length must be a positive integer "
+                        "constant")
+    if d.astKind not in ('int', 'long', 'float', 'double'):
+        raise TypeError("the sample spacing must be real")
+    return 'float' if d.astKind == 'float' else 'double'
+
+
+@ophelper
+def fftfreq_func(axis, n, d):
+    # numpy.fft.fftfreq(n, d) at the index of each element along axis
+    if not (isinstance(axis, ConstantNode) and axis.astKind == 'int'):
+        raise TypeError("the axis must be an integer constant")
+    kind = fft_kind(n, d)
+    axis = encode_axis(axis)
+    return FuncNode('fftfreq', [ConstantNode(int(n.value)), d, axis], kind)
+
+
+@ophelper
+def kmag2_func(n, d):
+    # sum of fftfreq(axis, n, d)**2 over all axes
+    kind = fft_kind(n, d)
+    return FuncNode('kmag2', [ConstantNode(int(n.value)), d], kind)
+
+
 @ophelper
 def where_func(a, b, c):
     if isinstance(a, ConstantNode):
@@ -245,7 +311,7 @@ def div_op(a, b):
     if get_optimization() in ('moderate', 'aggressive'):
         if (isinstance(b, ConstantNode) and
                 (a.astKind == b.astKind) and
-                    a.astKind in ('float', 'double', 'complex')):
+                    a.astKind in ('float', 'complex64', 'double', 'complex')):
             return OpNode('mul', [a, ConstantNode(1. / b.value)])
     return OpNode('div', [a, b])
 
@@ -255,7 +321,7 @@ def truediv_op(a, b):
     if get_optimization() in ('moderate', 'aggressive'):
         if (isinstance(b, ConstantNode) and
                 (a.astKind == b.astKind) and
-                    a.astKind in ('float', 'double', 'complex')):
+                    a.astKind in ('float', 'complex64', 'double', 'complex')):
             return OpNode('mul', [a, ConstantNode(1. / b.value)])
     kind = commonKind([a, b])
     if kind in ('bool', 'int', 'long'):
@@ -361,8 +427,8 @@ functions = {
 
     'where': where_func,
 
-    'real': func(numpy.real, 'double', 'double'),
-    'imag': func(numpy.imag, 'double', 'double'),
+    'real': part_func(numpy.real),
+    'imag': part_func(numpy.imag),
     'complex': func(complex, 'complex'),
     'conj': func(numpy.conj, 'complex'),
 
@@ -373,6 +439,12 @@ functions = {
     'contains': contains_func,
 
     'erf': func(sc.erf, 'float', 'double'),
+    'erfinv': func(sc.erfinv, 'float', 'double'),
+    'ndtr': func(sc.ndtr, 'float', 'double'),
+    'ndtri': func(sc.ndtri, 'float', 'double'),
+    'sincos': sincos_func,
+    'fftfreq': fftfreq_func,
+    'kmag2': kmag2_func,
 }
 
 
@@ -398,6 +470,8 @@ class ExpressionNode():
     def get_real(self):
         if self.astType == 'constant':
             return ConstantNode(complex(self.value).real)
+        if self.astKind == 'complex64':
+            return OpNode('real', (self,), 'float')
         return OpNode('real', (self,), 'double')
 
     real = property(get_real)
@@ -405,6 +479,8 @@ class ExpressionNode():
     def get_imag(self):
         if self.astType == 'constant':
             return ConstantNode(complex(self.value).imag)
+        if self.astKind == 'complex64':
+            return OpNode('imag', (self,), 'float')
         return OpNode('imag', (self,), 'double')
 
     imag = property(get_imag)
@@ -37,6 +37,9 @@ FUNC_FF(FUNC_CONJ_FF,    "conjugate_ff",fconjf, fconjf2, vsConj)
 FUNC_FF(FUNC_CEIL_FF,    "ceil_ff",     ceilf,  ceilf2,  vsCeil)
 FUNC_FF(FUNC_FLOOR_FF,   "floor_ff",    floorf, floorf2, vsFloor)
 FUNC_FF(FUNC_ERF_FF,     "erf_ff",      erff,   erff2,   vsEr)
+FUNC_FF(FUNC_NDTR_FF,    "ndtr_ff",     ndtrf,  ndtrf,   vsCdfNorm)
+FUNC_FF(FUNC_NDTRI_FF,   "ndtri_ff",    ndtrif, ndtrif,  vsCdfNormInv)
+FUNC_FF(FUNC_ERFINV_FF,  "erfinv_ff",   erfinvf, erfinvf, vsErfInv)
 FUNC_FF(FUNC_FF_LAST,    NULL,          NULL,   NULL,    NULL)
 #ifdef ELIDE_FUNC_FF
 #undef ELIDE_FUNC_FF
@@ -82,6 +85,9 @@ FUNC_DD(FUNC_CONJ_DD,    "conjugate_dd",fconj, vdConj)
 FUNC_DD(FUNC_CEIL_DD,    "ceil_dd",     ceil,  vdCeil)
 FUNC_DD(FUNC_FLOOR_DD,   "floor_dd",    floor, vdFloor)
 FUNC_DD(FUNC_ERF_DD,     "erf_dd",      erf,   vdErf)
+FUNC_DD(FUNC_NDTR_DD,    "ndtr_dd",     ndtr,  vdCdfNorm)
+FUNC_DD(FUNC_NDTRI_DD,   "ndtri_dd",    ndtri, vdCdfNormInv)
+FUNC_DD(FUNC_ERFINV_DD,  "erfinv_dd",   erfinv, vdErfInv)
 FUNC_DD(FUNC_DD_LAST,    NULL,          NULL,  NULL)
 #ifdef ELIDE_FUNC_DD
 #undef ELIDE_FUNC_DD
@@ -140,3 +146,45 @@ FUNC_CCC(FUNC_CCC_LAST,  NULL,      NULL)
 #undef ELIDE_FUNC_CCC
 #undef FUNC_CCC
 #endif
+
+/* complex64, same functions as complex128 */
+#ifndef FUNC_ZZ
+#define ELIDE_FUNC_ZZ
+#define FUNC_ZZ(...)
+#endif
+FUNC_ZZ(FUNC_SQRT_ZZ,    "sqrt_FF",     nc_sqrt,   vcSqrt)
+FUNC_ZZ(FUNC_SIN_ZZ,     "sin_FF",      nc_sin,    vcSin)
+FUNC_ZZ(FUNC_COS_ZZ,     "cos_FF",      nc_cos,    vcCos)
+FUNC_ZZ(FUNC_TAN_ZZ,     "tan_FF",      nc_tan,    vcTan)
+FUNC_ZZ(FUNC_ARCSIN_ZZ,  "arcsin_FF",   nc_asin,   vcAsin)
+FUNC_ZZ(FUNC_ARCCOS_ZZ,  "arccos_FF",   nc_acos,   vcAcos)
+FUNC_ZZ(FUNC_ARCTAN_ZZ,  "arctan_FF",   nc_atan,   vcAtan)
+FUNC_ZZ(FUNC_SINH_ZZ,    "sinh_FF",     nc_sinh,   vcSinh)
+FUNC_ZZ(FUNC_COSH_ZZ,    "cosh_FF",     nc_cosh,   vcCosh)
+FUNC_ZZ(FUNC_TANH_ZZ,    "tanh_FF",     nc_tanh,   vcTanh)
+FUNC_ZZ(FUNC_ARCSINH_ZZ, "arcsinh_FF",  nc_asinh,  vcAsinh)
+FUNC_ZZ(FUNC_ARCCOSH_ZZ, "arccosh_FF",  nc_acosh,  vcAcosh)
+FUNC_ZZ(FUNC_ARCTANH_ZZ, "arctanh_FF",  nc_atanh,  vcAtanh)
+FUNC_ZZ(FUNC_LOG_ZZ,     "log_FF",      nc_log,    vcLn)
+FUNC_ZZ(FUNC_LOG1P_ZZ,   "log1p_FF",    nc_log1p,  vcLog1p)
+FUNC_ZZ(FUNC_LOG10_ZZ,   "log10_FF",    nc_log10,  vcLog10)
+FUNC_ZZ(FUNC_EXP_ZZ,     "exp_FF",      nc_exp,    vcExp)
+FUNC_ZZ(FUNC_EXPM1_ZZ,   "expm1_FF",    nc_expm1,  vcExpm1)
+FUNC_ZZ(FUNC_ABS_ZZ,     "absolute_FF", nc_abs,    vcAbs_)
+FUNC_ZZ(FUNC_CONJ_ZZ,    "conjugate_FF",nc_conj,   vcConj)
+FUNC_ZZ(FUNC_ZZ_LAST,    NULL,          NULL,      NULL)
+#ifdef ELIDE_FUNC_ZZ
+#undef ELIDE_FUNC_ZZ
+#undef FUNC_ZZ
+#endif
+
+#ifndef FUNC_ZZZ
+#define ELIDE_FUNC_ZZZ
+#define FUNC_ZZZ(...)
+#endif
+FUNC_ZZZ(FUNC_POW_ZZZ,   "pow_FFF", nc_pow)
+FUNC_ZZZ(FUNC_ZZZ_LAST,  NULL,      NULL)
+#ifdef ELIDE_FUNC_ZZZ
+#undef ELIDE_FUNC_ZZZ
+#undef FUNC_ZZZ
+#endif
@@ -0,0 +1,165 @@
+#ifndef NUMEXPR_INDEX_FUNCTIONS_HPP
+#define NUMEXPR_INDEX_FUNCTIONS_HPP
+
+/*********************************************************************
+  Numexpr - Fast numerical array expression evaluator for NumPy.
+
+      License: MIT
+      Author:  See AUTHORS.txt
+
+  See LICENSE.txt for details about copyright and rights to use.
+**********************************************************************/
+
+/* Functions of the position of an element rather than of its operands.
+   Programs using them are iterated in C order, so the elements of a block
+   are the flat indices [start, start + block_size) of the iteration
+   shape.
+
+   fftfreq(axis, n, d) is numpy.fft.fftfreq(n, d) at the index along
+   `axis`, computed the same way (in double, m * (1/(n*d))).  An axis
+   shorter than n holds the first frequencies, which is also right for
+   the last axis of a real-to-complex transform: its n//2 + 1 entries are
+   fftfreq(n, d)[:n//2 + 1].
+
+   kmag2(n, d) is the sum of fftfreq(axis, n, d)**2 over all axes, summed
+   in the type of the result (in the order of kx**2 + ky**2 + kz**2). */
+
+/* FFT frequency index (fftfreq(n)*n) along `axis` of every element */
+static inline void
+fft_index(int *m, npy_intp block_size, npy_intp start,
+          int ndim, const npy_intp *shape, int axis, int n)
+{
+    npy_intp stride = 1, len = shape[axis], i, r, j, k, run;
+    npy_intp half = (n + 1) / 2;
+
+    for (k = axis + 1; k < ndim; k++) {
+        stride *= shape[k];
+    }
+    i = (start / stride) % len;
+    r = start % stride;
+    for (j = 0; j < block_size; j += run) {
+        if (stride == 1) {
+            /* runs of consecutive indices i..end-1 mapping to i or i - n */
+            npy_intp end = i < half && half < len ? half : len;
+            npy_intp shift = i < half ? 0 : n;
+            run = end - i < block_size - j ? end - i : block_size - j;
+            for (k = 0; k < run; k++) {
+                m[j + k] = (int)(i + k - shift);
+            }
+            i += run;
+        }
+        else {
+            int mi = (int)(i < half ? i : i - n);
+            run = stride - r < block_size - j ? stride - r : block_size - j;
+            for (k = 0; k < run; k++) {
+                m[j + k] = mi;
+            }
+            r = 0;
+            i++;
+        }
+        if (i == len) {
+            i = 0;
+        }
+    }
+}
+
+/* 1/(n*d) of every element, d is usually a scalar */
+template <typename T>
+static inline void
+fft_scale(double *val, npy_intp block_size, int n, const char *d, npy_intp sd)
+{
+    npy_intp j;
+
+    if (sd == 0) {
+        double v = 1.0 / (n * (double)*(const T *)d);
+        for (j = 0; j < block_size; j++) {
+            val[j] = v;
+        }
+        return;
+    }
+    for (j = 0; j < block_size; j++) {
+        val[j] = 1.0 / (n * (double)*(const T *)(d + j*sd));
+    }
+}
+
+template <typename T>
+static inline void
+fftfreq_block(T *dest, npy_intp block_size, npy_intp start,
+              int ndim, const npy_intp *shape, int axis, int n,
+              const char *d, npy_intp sd)
+{
+    int m[BLOCK_SIZE1];
+    double val[BLOCK_SIZE1];
+    npy_intp j, k, len;
+
+    /* programs may use larger blocks than the scratch arrays */
+    for (k = 0; k < block_size; k += len) {
+        len = block_size - k < BLOCK_SIZE1 ? block_size - k : BLOCK_SIZE1;
+        fft_index(m, len, start + k, ndim, shape, axis, n);
+        fft_scale<T>(val, len, n, d + k*sd, sd);
+        for (j = 0; j < len; j++) {
+            dest[k + j] = (T)(m[j] * val[j]);
+        }
+    }
+}
+
+template <typename T>
+static inline void
+kmag2_block(T *dest, npy_intp block_size, npy_intp start,
+            int ndim, const npy_intp *shape, int n,
+            const char *d, npy_intp sd)
+{
+    int m[BLOCK_SIZE1];
+    double val[BLOCK_SIZE1];
+    npy_intp idx[NPY_MAXDIMS];
+    npy_intp half = (n + 1) / 2, j, k, run, rem = start;
+    int axis, last = ndim - 1;
+
+    if (sd == 0 && ndim > 0) {
+        /* the other axes are constant along runs of the last one */
+        double v = 1.0 / (n * (double)*(const T *)d);
+        for (axis = last; axis >= 0; axis--) {
+            idx[axis] = rem % shape[axis];
+            rem /= shape[axis];
+        }
+        for (j = 0; j < block_size; j += run) {
+            T outer = 0;
+            for (axis = 0; axis < last; axis++) {
+                npy_intp i = idx[axis];
+                T ka = (T)((i < half ? i : i - n) * v);
+                outer += ka * ka;
+            }
+            npy_intp i0 = idx[last];
+            run = shape[last] - i0 < block_size - j ?
+                  shape[last] - i0 : block_size - j;
+            for (k = 0; k < run; k++) {
+                npy_intp i = i0 + k;
+                T ka = (T)((i < half ? i : i - n) * v);
+                dest[j + k] = outer + ka * ka;
+            }
+            idx[last] += run;
+            for (axis = last; axis > 0 && idx[axis] == shape[axis]; axis--) {
+                idx[axis] = 0;
+                idx[axis - 1]++;
+            }
+        }
+        return;
+    }
+
+    for (k = 0; k < block_size; k += run) {
+        run = block_size - k < BLOCK_SIZE1 ? block_size - k : BLOCK_SIZE1;
+        fft_scale<T>(val, run, n, d + k*sd, sd);
+        for (j = 0; j < run; j++) {
+            dest[k + j] = 0;
+        }
+        for (axis = 0; axis < ndim; axis++) {
+            fft_index(m, run, start + k, ndim, shape, axis, n);
+            for (j = 0; j < run; j++) {
+                T ka = (T)(m[j] * val[j]);
+                dest[k + j] += ka * ka;
+            }
+        }
+    }
+}
+
+#endif // NUMEXPR_INDEX_FUNCTIONS_HPP
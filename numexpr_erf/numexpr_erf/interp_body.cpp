@@ -88,6 +88,30 @@
         VEC_LOOP(expr);                         \
     } break
 
+/* Like VEC_ARG1, but `expr` handles the whole block at once */
+#define VEC_ARG1_BLOCK(expr)                    \
+    BOUNDS_CHECK(store_in);                     \
+    BOUNDS_CHECK(arg1);                         \
+    {                                           \
+        char *dest = mem[store_in];             \
+        char *x1 = mem[arg1];                   \
+        npy_intp sb1 = memsteps[arg1];          \
+        expr;                                   \
+    } break
+
+/* Like VEC_ARG2, but `expr` handles the whole block at once */
+#define VEC_ARG2_BLOCK(expr)                    \
+    BOUNDS_CHECK(store_in);                     \
+    BOUNDS_CHECK(arg1);                         \
+    BOUNDS_CHECK(arg2);                         \
+    {                                           \
+        char *dest = mem[store_in];             \
+        char *x1 = mem[arg1];                   \
+        char *x2 = mem[arg2];                   \
+        npy_intp sb2 = memsteps[arg2];          \
+        expr;                                   \
+    } break
+
 #define VEC_ARG1_VML(expr)                      \
     BOUNDS_CHECK(store_in);                     \
     BOUNDS_CHECK(arg1);                         \
@@ -124,18 +148,35 @@
     int pc;
     unsigned int j;
 
+    // C-order flat index of the first element, for the index functions
+    npy_intp index_start = 0;
+
     // set up pointers to next block of inputs and outputs
 #ifdef SINGLE_ITEM_CONST_LOOP
     mem[0] = params.output;
 #else // SINGLE_ITEM_CONST_LOOP
+    if (params.index_shape != NULL) {
+        index_start = NpyIter_GetIterIndex(iter);
+    }
     // use the iterator's inner loop data
     memcpy(mem, iter_dataptr, (1+params.n_inputs)*sizeof(char*));
 #  ifndef NO_OUTPUT_BUFFERING
     // if output buffering is necessary, first write to the buffer
     if(params.out_buffer != NULL) {
-        mem[0] = params.out_buffer;
+        char *out_buffer = params.out_buffer;
+        for (int k = 0; k < params.n_outputs; k++) {
+            int r = output_register(params, k);
+            mem[r] = out_buffer;
+            out_buffer += params.memsizes[r] * params.block_size;
+        }
     }
 #  endif // NO_OUTPUT_BUFFERING
+#  ifdef REDUCTION_INNER_LOOP
+    // chunked full reductions accumulate into a partial of their own
+    if(params.reduce_out != NULL) {
+        mem[0] = params.reduce_out;
+    }
+#  endif // REDUCTION_INNER_LOOP
     memcpy(memsteps, iter_strides, (1+params.n_inputs)*sizeof(npy_intp));
 #endif // SINGLE_ITEM_CONST_LOOP
 
@@ -157,6 +198,8 @@
         #define d_reduce    *(double *)dest
         #define cr_reduce   *(double *)dest
         #define ci_reduce   *((double *)dest+1)
+        #define zr_reduce   *(float *)dest
+        #define zi_reduce   *((float *)dest+1)
 #else /* Reduce is the outer loop */
         #define i_reduce    i_dest
         #define l_reduce    l_dest
@@ -164,6 +207,8 @@
         #define d_reduce    d_dest
         #define cr_reduce   cr_dest
         #define ci_reduce   ci_dest
+        #define zr_reduce   zr_dest
+        #define zi_reduce   zi_dest
 #endif
         #define b_dest ((char *)dest)[j]
         #define i_dest ((int *)dest)[j]
@@ -172,6 +217,8 @@
         #define d_dest ((double *)dest)[j]
         #define cr_dest ((double *)dest)[2*j]
         #define ci_dest ((double *)dest)[2*j+1]
+        #define zr_dest ((float *)dest)[2*j]
+        #define zi_dest ((float *)dest)[2*j+1]
         #define s_dest ((char *)dest + j*memsteps[store_in])
         #define b1    ((char   *)(x1+j*sb1))[0]
         #define i1    ((int    *)(x1+j*sb1))[0]
@@ -180,6 +227,8 @@
         #define d1    ((double *)(x1+j*sb1))[0]
         #define c1r   ((double *)(x1+j*sb1))[0]
         #define c1i   ((double *)(x1+j*sb1))[1]
+        #define z1r   ((float  *)(x1+j*sb1))[0]
+        #define z1i   ((float  *)(x1+j*sb1))[1]
         #define s1    ((char   *)x1+j*sb1)
         #define b2    ((char   *)(x2+j*sb2))[0]
         #define i2    ((int    *)(x2+j*sb2))[0]
@@ -188,6 +237,8 @@
         #define d2    ((double *)(x2+j*sb2))[0]
         #define c2r   ((double *)(x2+j*sb2))[0]
         #define c2i   ((double *)(x2+j*sb2))[1]
+        #define z2r   ((float  *)(x2+j*sb2))[0]
+        #define z2i   ((float  *)(x2+j*sb2))[1]
         #define s2    ((char   *)x2+j*sb2)
         #define b3    ((char   *)(x3+j*sb3))[0]
         #define i3    ((int    *)(x3+j*sb3))[0]
@@ -196,10 +247,14 @@
         #define d3    ((double *)(x3+j*sb3))[0]
         #define c3r   ((double *)(x3+j*sb3))[0]
         #define c3i   ((double *)(x3+j*sb3))[1]
+        #define z3r   ((float  *)(x3+j*sb3))[0]
+        #define z3i   ((float  *)(x3+j*sb3))[1]
         #define s3    ((char   *)x3+j*sb3)
         /* Some temporaries */
         double da, db;
         std::complex<double> ca, cb;
+        float fa, fb;
+        std::complex<float> za, zb;
 
         switch (op) {
 
@@ -215,6 +270,7 @@
         case OP_COPY_FF: VEC_ARG1(memcpy(&f_dest, s1, sizeof(float)));
         case OP_COPY_DD: VEC_ARG1(memcpy(&d_dest, s1, sizeof(double)));
         case OP_COPY_CC: VEC_ARG1(memcpy(&cr_dest, s1, sizeof(double)*2));
+        case OP_COPY_ZZ: VEC_ARG1(memcpy(&zr_dest, s1, sizeof(float)*2));
 
         /* Bool */
         case OP_INVERT_BB: VEC_ARG1(b_dest = !b1);
@@ -328,6 +384,12 @@
             VEC_ARG1_VML(functions_ff_vml[arg2](BLOCK_SIZE,
                                                 (float*)x1, (float*)dest));
 #else
+            if (arg2 == FUNC_ERF_FF) {
+                VEC_ARG1_BLOCK(vec_erff(BLOCK_SIZE, x1, sb1, dest));
+            }
+            if (arg2 == FUNC_NDTR_FF) {
+                VEC_ARG1_BLOCK(vec_ndtrf(BLOCK_SIZE, x1, sb1, dest));
+            }
             VEC_ARG1(f_dest = functions_ff[arg2](f1));
 #endif
         case OP_FUNC_FFFN:
@@ -379,6 +441,12 @@
             VEC_ARG1_VML(functions_dd_vml[arg2](BLOCK_SIZE,
                                                 (double*)x1, (double*)dest));
 #else
+            if (arg2 == FUNC_ERF_DD) {
+                VEC_ARG1_BLOCK(vec_erf(BLOCK_SIZE, x1, sb1, dest));
+            }
+            if (arg2 == FUNC_NDTR_DD) {
+                VEC_ARG1_BLOCK(vec_ndtr(BLOCK_SIZE, x1, sb1, dest));
+            }
             VEC_ARG1(d_dest = functions_dd[arg2](d1));
 #endif
         case OP_FUNC_DDDN:
@@ -451,13 +519,113 @@
         case OP_COMPLEX_CDD: VEC_ARG2(cr_dest = d1;
                                       ci_dest = d2);
 
+        /* Complex64 */
+        case OP_CAST_ZI: VEC_ARG1(zr_dest = (float)(i1);
+                                  zi_dest = 0);
+        case OP_CAST_ZL: VEC_ARG1(zr_dest = (float)(l1);
+                                  zi_dest = 0);
+        case OP_CAST_ZF: VEC_ARG1(zr_dest = f1;
+                                  zi_dest = 0);
+        case OP_CAST_CZ: VEC_ARG1(cr_dest = z1r;
+                                  ci_dest = z1i);
+        case OP_ONES_LIKE_ZZ: VEC_ARG0(zr_dest = 1;
+                                       zi_dest = 0);
+        case OP_NEG_ZZ: VEC_ARG1(zr_dest = -z1r;
+                                 zi_dest = -z1i);
+
+        case OP_ADD_ZZZ: VEC_ARG2(zr_dest = z1r + z2r;
+                                  zi_dest = z1i + z2i);
+        case OP_SUB_ZZZ: VEC_ARG2(zr_dest = z1r - z2r;
+                                  zi_dest = z1i - z2i);
+        case OP_MUL_ZZZ: VEC_ARG2(fa = z1r*z2r - z1i*z2i;
+                                  zi_dest = z1r*z2i + z1i*z2r;
+                                  zr_dest = fa);
+        case OP_DIV_ZZZ: VEC_ARG2(fa = z2r*z2r + z2i*z2i;
+                                  fb = (z1r*z2r + z1i*z2i) / fa;
+                                  zi_dest = (z1i*z2r - z1r*z2i) / fa;
+                                  zr_dest = fb);
+        case OP_EQ_BZZ: VEC_ARG2(b_dest = (z1r == z2r && z1i == z2i));
+        case OP_NE_BZZ: VEC_ARG2(b_dest = (z1r != z2r || z1i != z2i));
+
+        case OP_WHERE_ZBZZ: VEC_ARG3(zr_dest = b1 ? z2r : z3r;
+                                     zi_dest = b1 ? z2i : z3i);
+        case OP_FUNC_ZZN:
+#ifdef USE_VML
+            VEC_ARG1_VML(functions_zz_vml[arg2](BLOCK_SIZE,
+                                                (const MKL_Complex8*)x1,
+                                                (MKL_Complex8*)dest));
+#else
+            VEC_ARG1(za.real(z1r);
+                     za.imag(z1i);
+                     functions_zz[arg2](&za, &za);
+                     zr_dest = za.real();
+                     zi_dest = za.imag());
+#endif
+        case OP_FUNC_ZZZN: VEC_ARG2(za.real(z1r);
+                                    za.imag(z1i);
+                                    zb.real(z2r);
+                                    zb.imag(z2i);
+                                    functions_zzz[arg3](&za, &zb, &za);
+                                    zr_dest = za.real();
+                                    zi_dest = za.imag());
+
+        case OP_REAL_FZ: VEC_ARG1(f_dest = z1r);
+        case OP_IMAG_FZ: VEC_ARG1(f_dest = z1i);
+        case OP_COMPLEX_ZFF: VEC_ARG2(zr_dest = f1;
+                                      zi_dest = f2);
+
+        /* cos(x) + 1j*sin(x); the compiler merges the two calls into one
+           sincos() where the libm has it */
+        case OP_SINCOS_CD: VEC_ARG1(ca.real(cos(d1));
+                                    ca.imag(sin(d1));
+                                    cr_dest = ca.real();
+                                    ci_dest = ca.imag());
+        case OP_SINCOS_ZF: VEC_ARG1(za.real(cosf(f1));
+                                    za.imag(sinf(f1));
+                                    zr_dest = za.real();
+                                    zi_dest = za.imag());
+
+        /* Index functions, n is a constant */
+        case OP_FFTFREQ_FIFN: VEC_ARG2_BLOCK(
+            fftfreq_block<float>((float *)dest, BLOCK_SIZE, index_start,
+                                 params.index_ndim, params.index_shape, arg3,
+                                 *(int *)x1, x2, sb2));
+        case OP_FFTFREQ_DIDN: VEC_ARG2_BLOCK(
+            fftfreq_block<double>((double *)dest, BLOCK_SIZE, index_start,
+                                  params.index_ndim, params.index_shape, arg3,
+                                  *(int *)x1, x2, sb2));
+        case OP_KMAG2_FIF: VEC_ARG2_BLOCK(
+            kmag2_block<float>((float *)dest, BLOCK_SIZE, index_start,
+                               params.index_ndim, params.index_shape,
+                               *(int *)x1, x2, sb2));
+        case OP_KMAG2_DID: VEC_ARG2_BLOCK(
+            kmag2_block<double>((double *)dest, BLOCK_SIZE, index_start,
+                                params.index_ndim, params.index_shape,
+                                *(int *)x1, x2, sb2));
+
         /* Reductions */
         case OP_SUM_IIN: VEC_ARG1(i_reduce += i1);
         case OP_SUM_LLN: VEC_ARG1(l_reduce += l1);
+#ifdef REDUCTION_INNER_LOOP
+        /* Floating point sums add up each block pairwise first */
+        case OP_SUM_FFN: VEC_ARG1_BLOCK(
+            f_reduce += pairwise_sum<float>(x1, sb1, BLOCK_SIZE));
+        case OP_SUM_DDN: VEC_ARG1_BLOCK(
+            d_reduce += pairwise_sum<double>(x1, sb1, BLOCK_SIZE));
+        case OP_SUM_CCN: VEC_ARG1_BLOCK(
+            cr_reduce += pairwise_sum<double>(x1, sb1, BLOCK_SIZE);
+            ci_reduce += pairwise_sum<double>(x1+sizeof(double), sb1, BLOCK_SIZE));
+        case OP_SUM_ZZN: VEC_ARG1_BLOCK(
+            zr_reduce += pairwise_sum<float>(x1, sb1, BLOCK_SIZE);
+            zi_reduce += pairwise_sum<float>(x1+sizeof(float), sb1, BLOCK_SIZE));
+#else
         case OP_SUM_FFN: VEC_ARG1(f_reduce += f1);
         case OP_SUM_DDN: VEC_ARG1(d_reduce += d1);
         case OP_SUM_CCN: VEC_ARG1(cr_reduce += c1r;
                                   ci_reduce += c1i);
+        case OP_SUM_ZZN: VEC_ARG1(zr_reduce += z1r;
+                                  zi_reduce += z1i);
+#endif
 
         case OP_PROD_IIN: VEC_ARG1(i_reduce *= i1);
         case OP_PROD_LLN: VEC_ARG1(l_reduce *= l1);
@@ -466,6 +634,9 @@
         case OP_PROD_CCN: VEC_ARG1(da = cr_reduce*c1r - ci_reduce*c1i;
                                    ci_reduce = cr_reduce*c1i + ci_reduce*c1r;
                                    cr_reduce = da);
+        case OP_PROD_ZZN: VEC_ARG1(fa = zr_reduce*z1r - zi_reduce*z1i;
+                                   zi_reduce = zr_reduce*z1i + zi_reduce*z1r;
+                                   zr_reduce = fa);
 
         case OP_MIN_IIN: VEC_ARG1(i_reduce = fmin(i_reduce, i1));
         case OP_MIN_LLN: VEC_ARG1(l_reduce = fmin(l_reduce, l1));
@@ -487,12 +658,19 @@
 #ifndef NO_OUTPUT_BUFFERING
     // If output buffering was necessary, copy the buffer to the output
     if(params.out_buffer != NULL) {
-        memcpy(iter_dataptr[0], params.out_buffer, params.memsizes[0] * BLOCK_SIZE);
+        char *out_buffer = params.out_buffer;
+        for (int k = 0; k < params.n_outputs; k++) {
+            int r = output_register(params, k);
+            memcpy(iter_dataptr[r], out_buffer, params.memsizes[r] * BLOCK_SIZE);
+            out_buffer += params.memsizes[r] * params.block_size;
+        }
     }
 #endif // NO_OUTPUT_BUFFERING
 
 #undef VEC_LOOP
 #undef VEC_ARG1
+#undef VEC_ARG1_BLOCK
+#undef VEC_ARG2_BLOCK
 #undef VEC_ARG2
 #undef VEC_ARG3
 
@@ -502,6 +680,8 @@
 #undef d_reduce
 #undef cr_reduce
 #undef ci_reduce
+#undef zr_reduce
+#undef zi_reduce
 #undef b_dest
 #undef i_dest
 #undef l_dest
@@ -509,6 +689,8 @@
 #undef d_dest
 #undef cr_dest
 #undef ci_dest
+#undef zr_dest
+#undef zi_dest
 #undef s_dest
 #undef b1
 #undef i1
@@ -517,6 +699,8 @@
 #undef d1
 #undef c1r
 #undef c1i
+#undef z1r
+#undef z1i
 #undef s1
 #undef b2
 #undef i2
@@ -525,6 +709,8 @@
 #undef d2
 #undef c2r
 #undef c2i
+#undef z2r
+#undef z2i
 #undef s2
 #undef b3
 #undef i3
@@ -533,6 +719,8 @@
 #undef d3
 #undef c3r
 #undef c3i
+#undef z3r
+#undef z3i
 #undef s3
 }
 
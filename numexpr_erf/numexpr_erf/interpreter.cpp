@@ -16,6 +16,8 @@
 
 #include "numexpr_config.hpp"
 #include "complex_functions.hpp"
+#include "erf_functions.hpp"
+#include "index_functions.hpp"
 #include "interpreter.hpp"
 #include "numexpr_object.hpp"
 
@@ -58,9 +60,6 @@
 
 using namespace std;
 
-// Global state
-thread_data th_params;
-
 /* This file and interp_body should really be generated from a description of
    the opcodes -- there's too much repetition here for manually editing */
 
@@ -75,6 +74,7 @@ static char op_signature_table[][NUMEXPR_MAX_ARGS] = {
 #define Tf 'f'
 #define Td 'd'
 #define Tc 'c'
+#define TF 'F'
 #define Ts 's'
 #define Tn 'n'
 #define T0 0
@@ -87,6 +87,7 @@ static char op_signature_table[][NUMEXPR_MAX_ARGS] = {
 #undef Tf
 #undef Td
 #undef Tc
+#undef TF
 #undef Ts
 #undef Tn
 #undef T0
@@ -304,11 +305,68 @@ FuncCCCPtr functions_ccc[] = {
 };
 
 
+typedef void (*FuncZZPtr)(std::complex<float>*, std::complex<float>*);
+
+FuncZZPtr functions_zz[] = {
+#define FUNC_ZZ(fop, s, f, ...) f,
+#include "functions.hpp"
+#undef FUNC_ZZ
+};
+
+#ifdef USE_VML
+/* single precision counterparts of the complex helpers above */
+static void vcExpm1(MKL_INT n, const MKL_Complex8* x1, MKL_Complex8* dest)
+{
+    MKL_INT j;
+    vcExp(n, x1, dest);
+    for (j=0; j<n; j++) {
+        dest[j].real -= 1.0f;
+    };
+};
+
+static void vcLog1p(MKL_INT n, const MKL_Complex8* x1, MKL_Complex8* dest)
+{
+    MKL_INT j;
+    for (j=0; j<n; j++) {
+        dest[j].real = x1[j].real + 1;
+        dest[j].imag = x1[j].imag;
+    };
+    vcLn(n, dest, dest);
+};
+
+static void vcAbs_(MKL_INT n, const MKL_Complex8* x1, MKL_Complex8* dest)
+{
+    MKL_INT j;
+    for (j=0; j<n; j++) {
+        dest[j].real = sqrtf(x1[j].real*x1[j].real + x1[j].imag*x1[j].imag);
+    dest[j].imag = 0;
+    };
+};
+
+typedef void (*FuncZZPtr_vml)(MKL_INT, const MKL_Complex8[], MKL_Complex8[]);
+
+FuncZZPtr_vml functions_zz_vml[] = {
+#define FUNC_ZZ(fop, s, f, f_vml) f_vml,
+#include "functions.hpp"
+#undef FUNC_ZZ
+};
+#endif
+
+
+typedef void (*FuncZZZPtr)(std::complex<float>*, std::complex<float>*, std::complex<float>*);
+
+FuncZZZPtr functions_zzz[] = {
+#define FUNC_ZZZ(fop, s, f) f,
+#include "functions.hpp"
+#undef FUNC_ZZZ
+};
+
+
 char
 get_return_sig(PyObject* program)
 {
     int sig;
-    char last_opcode;
+    unsigned char last_opcode;
     Py_ssize_t end = PyBytes_Size(program);
     char *program_str = PyBytes_AS_STRING(program);
 
@@ -336,10 +394,11 @@ typecode_from_char(char c)
         case 'l': return NPY_LONGLONG;
         case 'f': return NPY_FLOAT;
         case 'd': return NPY_DOUBLE;
+        case 'F': return NPY_CFLOAT;
         case 'c': return NPY_CDOUBLE;
         case 's': return NPY_STRING;
         default:
-            PyErr_SetString(PyExc_TypeError, "signature value not in 'bilfdcs'");
+            PyErr_SetString(PyExc_TypeError, "signature value not in 'bilfdFcs'");
             return -1;
     }
 }
@@ -361,6 +420,57 @@ get_reduction_axis(PyObject* program) {
     return axis;
 }
 
+/*
+ * Largest axis an index function of the program refers to: -1 if it only
+ * uses kmag2, -2 if it has no index functions.
+ */
+static int
+get_index_axis(PyObject* program) {
+    Py_ssize_t end = PyBytes_Size(program), pc;
+    unsigned char *program_str = (unsigned char *)PyBytes_AS_STRING(program);
+    int axis = -2;
+    for (pc = 0; pc < end; pc += 4) {
+        unsigned char op = program_str[pc];
+        if (op == OP_FFTFREQ_FIFN || op == OP_FFTFREQ_DIDN) {
+            if (program_str[pc+5] > axis) {
+                axis = program_str[pc+5];
+            }
+        }
+        else if (op == OP_KMAG2_FIF || op == OP_KMAG2_DID) {
+            if (axis < -1) {
+                axis = -1;
+            }
+        }
+    }
+    return axis;
+}
+
+/* Broadcast shape of the operands, the shape the index functions refer to */
+static int
+get_index_shape(PyArrayObject **operands, int n_operands, npy_intp *shape)
+{
+    int i, idim, ndim = 0;
+    for (i = 0; i < n_operands; i++) {
+        if (operands[i] != NULL && PyArray_NDIM(operands[i]) > ndim) {
+            ndim = PyArray_NDIM(operands[i]);
+        }
+    }
+    for (idim = 0; idim < ndim; idim++) {
+        shape[idim] = 1;
+    }
+    for (i = 0; i < n_operands; i++) {
+        if (operands[i] == NULL) {
+            continue;
+        }
+        int offset = ndim - PyArray_NDIM(operands[i]);
+        for (idim = 0; idim < PyArray_NDIM(operands[i]); idim++) {
+            if (PyArray_DIM(operands[i], idim) != 1) {
+                shape[offset+idim] = PyArray_DIM(operands[i], idim);
+            }
+        }
+    }
+    return ndim;
+}
 
 
 int
@@ -458,6 +568,18 @@ check_program(NumExprObject *self)
                         PyErr_Format(PyExc_RuntimeError, "invalid program: funccode out of range (%i) at %i", arg, argloc);
                         return -1;
                     }
+                } else if (op == OP_FUNC_ZZN) {
+                    if (arg < 0 || arg >= FUNC_ZZ_LAST) {
+                        PyErr_Format(PyExc_RuntimeError, "invalid program: funccode out of range (%i) at %i", arg, argloc);
+                        return -1;
+                    }
+                } else if (op == OP_FUNC_ZZZN) {
+                    if (arg < 0 || arg >= FUNC_ZZZ_LAST) {
+                        PyErr_Format(PyExc_RuntimeError, "invalid program: funccode out of range (%i) at %i", arg, argloc);
+                        return -1;
+                    }
+                } else if (op == OP_FFTFREQ_FIFN || op == OP_FFTFREQ_DIDN) {
+                    ; // the axis is checked against the operands when run
                 } else if (op >= OP_REDUCTION) {
                     ;
                 } else {
@@ -609,8 +731,54 @@ void free_temps_space(const vm_params& params, char **mem)
     }
 }
 
-/* Serial/parallel task iterator version of the VM engine */
-int vm_engine_iter_task(NpyIter *iter, npy_intp *memsteps,
+/*
+ * Pairwise sum of n strided values, the same scheme as NumPy's: eight
+ * running sums for short runs, recursive halving above 128 values.
+ */
+template <typename T>
+static T
+pairwise_sum(const char *x, npy_intp stride, npy_intp n)
+{
+    npy_intp i, k;
+    T res;
+
+    if (n < 8) {
+        res = 0;
+        for (i = 0; i < n; i++) {
+            res += *(const T *)(x + i*stride);
+        }
+        return res;
+    }
+    else if (n <= 128) {
+        T r[8];
+        for (k = 0; k < 8; k++) {
+            r[k] = *(const T *)(x + k*stride);
+        }
+        for (i = 8; i < n - (n % 8); i += 8) {
+            for (k = 0; k < 8; k++) {
+                r[k] += *(const T *)(x + (i + k)*stride);
+            }
+        }
+        res = ((r[0] + r[1]) + (r[2] + r[3])) +
+              ((r[4] + r[5]) + (r[6] + r[7]));
+        for (; i < n; i++) {
+            res += *(const T *)(x + i*stride);
+        }
+        return res;
+    }
+    i = n / 2;
+    i -= i % 8;
+    return pairwise_sum<T>(x, stride, i) +
+           pairwise_sum<T>(x + i*stride, stride, n - i);
+}
+
+/*
+ * Serial/parallel task iterator version of the VM engine, with blocks of
+ * FIXED_SIZE elements compiled for that size
+ */
+template <npy_intp FIXED_SIZE>
+static int
+vm_engine_iter_fixed(NpyIter *iter, npy_intp *memsteps,
                     const vm_params& params,
                     int *pc_error, char **errmsg)
 {
@@ -634,9 +802,9 @@ int vm_engine_iter_task(NpyIter *iter, npy_intp *memsteps,
      * This makes a big difference (30-50% on some tests).
      */
     block_size = *size_ptr;
-    while (block_size == BLOCK_SIZE1) {
+    while (block_size == FIXED_SIZE) {
 #define REDUCTION_INNER_LOOP
-#define BLOCK_SIZE BLOCK_SIZE1
+#define BLOCK_SIZE FIXED_SIZE
 #include "interp_body.cpp"
 #undef BLOCK_SIZE
 #undef REDUCTION_INNER_LOOP
@@ -644,8 +812,10 @@ int vm_engine_iter_task(NpyIter *iter, npy_intp *memsteps,
         block_size = *size_ptr;
     }
 
-    /* Then finish off the rest */
+    /* Then finish off the rest, a shorter last block may follow blocks
+       of another size than BLOCK_SIZE1 */
     if (block_size > 0) do {
+        block_size = *size_ptr;
 #define REDUCTION_INNER_LOOP
 #define BLOCK_SIZE block_size
 #include "interp_body.cpp"
@@ -656,6 +826,33 @@ int vm_engine_iter_task(NpyIter *iter, npy_intp *memsteps,
     return 0;
 }
 
+int vm_engine_iter_task(NpyIter *iter, npy_intp *memsteps,
+                    const vm_params& params,
+                    int *pc_error, char **errmsg)
+{
+    // Block sizes a program is likely to be tuned for get a VM of their own
+    switch (params.block_size) {
+    case BLOCK_SIZE1 / 4:
+        return vm_engine_iter_fixed<BLOCK_SIZE1 / 4>(iter, memsteps, params,
+                                                     pc_error, errmsg);
+    case BLOCK_SIZE1 / 2:
+        return vm_engine_iter_fixed<BLOCK_SIZE1 / 2>(iter, memsteps, params,
+                                                     pc_error, errmsg);
+    case 2 * BLOCK_SIZE1:
+        return vm_engine_iter_fixed<2 * BLOCK_SIZE1>(iter, memsteps, params,
+                                                     pc_error, errmsg);
+    case 4 * BLOCK_SIZE1:
+        return vm_engine_iter_fixed<4 * BLOCK_SIZE1>(iter, memsteps, params,
+                                                     pc_error, errmsg);
+    case 8 * BLOCK_SIZE1:
+        return vm_engine_iter_fixed<8 * BLOCK_SIZE1>(iter, memsteps, params,
+                                                     pc_error, errmsg);
+    default:
+        return vm_engine_iter_fixed<BLOCK_SIZE1>(iter, memsteps, params,
+                                                 pc_error, errmsg);
+    }
+}
+
 static int
 vm_engine_iter_outer_reduce_task(NpyIter *iter, npy_intp *memsteps,
                 const vm_params& params, int *pc_error, char **errmsg)
@@ -690,8 +887,10 @@ vm_engine_iter_outer_reduce_task(NpyIter *iter, npy_intp *memsteps,
         block_size = *size_ptr;
     }
 
-    /* Then finish off the rest */
+    /* Then finish off the rest, a shorter last block may follow blocks
+       of another size than BLOCK_SIZE1 */
     if (block_size > 0) do {
+        block_size = *size_ptr;
 #define BLOCK_SIZE block_size
 #define NO_OUTPUT_BUFFERING // Because it's a reduction
 #include "interp_body.cpp"
@@ -702,12 +901,207 @@ vm_engine_iter_outer_reduce_task(NpyIter *iter, npy_intp *memsteps,
     return 0;
 }
 
+/*
+ * Axis reduction restricted to the outputs [istart, iend) of `iter`.
+ * Every output element is reduced by exactly one task, in the same order
+ * as in the serial engine, so the result does not depend on the number
+ * of threads.
+ */
+int
+vm_engine_iter_reduce_task(NpyIter *iter, NpyIter *reduce_iter,
+                bool reduction_outer_loop, npy_intp istart, npy_intp iend,
+                npy_intp *memsteps, const vm_params& params,
+                int *pc_error, char **errmsg)
+{
+    char **dataptr;
+    NpyIter_IterNextFunc *iternext;
+    int r;
+
+    if (reduction_outer_loop) {
+        dataptr = NpyIter_GetDataPtrArray(reduce_iter);
+        iternext = NpyIter_GetIterNext(reduce_iter, errmsg);
+        if (iternext == NULL ||
+                NpyIter_Reset(reduce_iter, errmsg) != NPY_SUCCEED) {
+            return -1;
+        }
+        do {
+            if (NpyIter_ResetBasePointers(iter, dataptr, errmsg)
+                    != NPY_SUCCEED ||
+                NpyIter_ResetToIterIndexRange(iter, istart, iend, errmsg)
+                    != NPY_SUCCEED) {
+                return -1;
+            }
+            r = vm_engine_iter_outer_reduce_task(iter, memsteps, params,
+                                                 pc_error, errmsg);
+            if (r < 0) {
+                return r;
+            }
+        } while (iternext(reduce_iter));
+    }
+    else {
+        if (NpyIter_ResetToIterIndexRange(iter, istart, iend, errmsg)
+                != NPY_SUCCEED) {
+            return -1;
+        }
+        dataptr = NpyIter_GetDataPtrArray(iter);
+        iternext = NpyIter_GetIterNext(iter, errmsg);
+        if (iternext == NULL) {
+            return -1;
+        }
+        do {
+            if (NpyIter_ResetBasePointers(reduce_iter, dataptr, errmsg)
+                    != NPY_SUCCEED) {
+                return -1;
+            }
+            r = vm_engine_iter_task(reduce_iter, memsteps, params,
+                                    pc_error, errmsg);
+            if (r < 0) {
+                return r;
+            }
+        } while (iternext(iter));
+    }
+    return 0;
+}
+
+/*
+ * Elements per chunk of a full reduction: REDUCTION_CHUNK rounded up to
+ * whole blocks, the buffered iterator can only restart a reduction at a
+ * block boundary.
+ */
+static inline npy_intp
+reduction_chunk(const vm_params& params)
+{
+    return (REDUCTION_CHUNK + params.block_size - 1) / params.block_size *
+           params.block_size;
+}
+
+/*
+ * Serial version of a chunked full reduction: chunk k of reduction_chunk()
+ * elements accumulates into partials[k], exactly like a parallel task.
+ */
+static int
+vm_engine_iter_chunked(NpyIter *iter, char *partials, vm_params params,
+                       int *pc_error, char **errmsg)
+{
+    npy_intp start, vlen, istart, iend, chunk = reduction_chunk(params);
+    int r;
+
+    NpyIter_GetIterIndexRange(iter, &start, &vlen);
+    for (istart = start; istart < vlen; istart += chunk) {
+        iend = istart + chunk;
+        if (iend > vlen) {
+            iend = vlen;
+        }
+        params.reduce_out = partials +
+            (istart - start) / chunk * params.memsizes[0];
+        if (NpyIter_ResetToIterIndexRange(iter, istart, iend, errmsg)
+                != NPY_SUCCEED) {
+            return -1;
+        }
+        r = vm_engine_iter_task(iter, params.memsteps, params,
+                                pc_error, errmsg);
+        if (r < 0) {
+            return r;
+        }
+    }
+    return 0;
+}
+
+template <typename T> static T reduce_sum(T a, T b) { return a + b; }
+template <typename T> static T reduce_prod(T a, T b) { return a * b; }
+template <typename T> static T reduce_min(T a, T b) { return (T)fmin(a, b); }
+template <typename T> static T reduce_max(T a, T b) { return (T)fmax(a, b); }
+
+/* Pairwise combination, the tree only depends on n */
+template <typename T>
+static T
+combine_pairwise(const T *partials, npy_intp n, T (*op)(T, T))
+{
+    npy_intp i;
+    T res;
+
+    if (n <= 8) {
+        res = partials[0];
+        for (i = 1; i < n; i++) {
+            res = op(res, partials[i]);
+        }
+        return res;
+    }
+    i = n / 2;
+    return op(combine_pairwise(partials, i, op),
+              combine_pairwise(partials + i, n - i, op));
+}
+
+template <typename T>
+static void
+combine_partials(int op, const char *partials, npy_intp n, char *dest)
+{
+    T res;
+    if (op < OP_PROD) {
+        res = combine_pairwise((const T *)partials, n, reduce_sum<T>);
+    } else {
+        res = combine_pairwise((const T *)partials, n, reduce_prod<T>);
+    }
+    memcpy(dest, &res, sizeof(T));
+}
+
+template <typename T>
+static void
+combine_real_partials(int op, const char *partials, npy_intp n, char *dest)
+{
+    T res;
+    if (op < OP_MIN) {
+        combine_partials<T>(op, partials, n, dest);
+        return;
+    } else if (op < OP_MAX) {
+        res = combine_pairwise((const T *)partials, n, reduce_min<T>);
+    } else {
+        res = combine_pairwise((const T *)partials, n, reduce_max<T>);
+    }
+    memcpy(dest, &res, sizeof(T));
+}
+
+/* Partial results of a chunked full reduction */
+struct chunked_reduction {
+    char *partials;
+    npy_intp n_partials;
+    char retsig;
+    int op;
+};
+
+/* Combine the partials of a chunked full reduction into the output */
+static int
+finish_chunked_reduction(NpyIter *iter, const chunked_reduction& cr)
+{
+    const char *partials = cr.partials;
+    npy_intp n = cr.n_partials;
+    int op = cr.op;
+    char *dest = PyArray_BYTES(NpyIter_GetOperandArray(iter)[0]);
+
+    switch (cr.retsig) {
+        case 'i': combine_real_partials<int>(op, partials, n, dest); break;
+        case 'l': combine_real_partials<long long>(op, partials, n, dest); break;
+        case 'f': combine_real_partials<float>(op, partials, n, dest); break;
+        case 'd': combine_real_partials<double>(op, partials, n, dest); break;
+        case 'F': combine_partials<std::complex<float> >(op, partials, n, dest); break;
+        case 'c': combine_partials<std::complex<double> >(op, partials, n, dest); break;
+        default:
+            return -1;
+    }
+    return 0;
+}
+
 /* Parallel iterator version of VM engine */
 static int
-vm_engine_iter_parallel(NpyIter *iter, const vm_params& params,
+vm_engine_iter_parallel(thread_pool *pool, NpyIter *iter, NpyIter *reduce_iter,
+                        bool reduction_outer_loop,
+                        const chunked_reduction *chunked,
+                        const vm_params& params,
                         bool need_output_buffering, int *pc_error,
                         char **errmsg)
 {
+    /* The pool is checked out for this call, so are its parameters */
+    thread_data& th_params = pool->th_params;
     int i, ret = -1;
     npy_intp numblocks, taskfactor;
 
@@ -715,31 +1109,37 @@ vm_engine_iter_parallel(NpyIter *iter, const vm_params& params,
         return -1;
     }
 
-    /* Ensure only one parallel job is running at a time (otherwise
-       the global th_params get corrupted). */
-    Py_BEGIN_ALLOW_THREADS;
-    pthread_mutex_lock(&gs.parallel_mutex);
-    Py_END_ALLOW_THREADS;
-
     /* Populate parameters for worker threads */
     NpyIter_GetIterIndexRange(iter, &th_params.start, &th_params.vlen);
     /*
      * Try to make it so each thread gets 16 tasks.  This is a compromise
      * between 1 task per thread and one block per task.
      */
-    taskfactor = 16*BLOCK_SIZE1*gs.nthreads;
+    taskfactor = 16*params.block_size*pool->nthreads;
     numblocks = (th_params.vlen - th_params.start + taskfactor - 1) /
                             taskfactor;
-    th_params.block_size = numblocks * BLOCK_SIZE1;
+    th_params.block_size = numblocks * params.block_size;
+    if (chunked != NULL) {
+        /* Fixed chunks, so the partials do not depend on the threads */
+        th_params.block_size = reduction_chunk(params);
+    }
+    else if (reduce_iter != NULL && !reduction_outer_loop) {
+        /* Each index of `iter` is a whole reduction, not one element */
+        taskfactor = 16*pool->nthreads;
+        th_params.block_size = (th_params.vlen - th_params.start +
+                                taskfactor - 1) / taskfactor;
+    }
 
     th_params.params = params;
     th_params.need_output_buffering = need_output_buffering;
+    th_params.partials = chunked != NULL ? chunked->partials : NULL;
+    th_params.reduction_outer_loop = reduction_outer_loop;
     th_params.ret_code = 0;
     th_params.pc_error = pc_error;
     th_params.errmsg = errmsg;
     th_params.iter[0] = iter;
     /* Make one copy for each additional thread */
-    for (i = 1; i < gs.nthreads; ++i) {
+    for (i = 1; i < pool->nthreads; ++i) {
         th_params.iter[i] = NpyIter_Copy(iter);
         if (th_params.iter[i] == NULL) {
             --i;
@@ -749,9 +1149,27 @@ vm_engine_iter_parallel(NpyIter *iter, const vm_params& params,
             goto end;
         }
     }
+    th_params.reduce_iter[0] = reduce_iter;
+    if (reduce_iter != NULL) {
+        for (i = 1; i < pool->nthreads; ++i) {
+            th_params.reduce_iter[i] = NpyIter_Copy(reduce_iter);
+            if (th_params.reduce_iter[i] == NULL) {
+                --i;
+                for (; i > 0; --i) {
+                    NpyIter_Deallocate(th_params.reduce_iter[i]);
+                }
+                for (i = 1; i < pool->nthreads; ++i) {
+                    NpyIter_Deallocate(th_params.iter[i]);
+                    th_params.reduce_iter[i] = NULL;
+                }
+                th_params.reduce_iter[0] = NULL;
+                goto end;
+            }
+        }
+    }
     th_params.memsteps[0] = params.memsteps;
     /* Make one copy of memsteps for each additional thread */
-    for (i = 1; i < gs.nthreads; ++i) {
+    for (i = 1; i < pool->nthreads; ++i) {
         th_params.memsteps[i] = PyMem_New(npy_intp,
                     1 + params.n_inputs + params.n_constants + params.n_temps);
         if (th_params.memsteps[i] == NULL) {
@@ -759,9 +1177,14 @@ vm_engine_iter_parallel(NpyIter *iter, const vm_params& params,
             for (; i > 0; --i) {
                 PyMem_Del(th_params.memsteps[i]);
             }
-            for (i = 0; i < gs.nthreads; ++i) {
+            for (i = 1; i < pool->nthreads; ++i) {
                 NpyIter_Deallocate(th_params.iter[i]);
+                if (th_params.reduce_iter[i] != NULL) {
+                    NpyIter_Deallocate(th_params.reduce_iter[i]);
+                    th_params.reduce_iter[i] = NULL;
+                }
             }
+            th_params.reduce_iter[0] = NULL;
             goto end;
         }
         memcpy(th_params.memsteps[i], th_params.memsteps[0],
@@ -772,58 +1195,79 @@ vm_engine_iter_parallel(NpyIter *iter, const vm_params& params,
     Py_BEGIN_ALLOW_THREADS;
 
     /* Synchronization point for all threads (wait for initialization) */
-    pthread_mutex_lock(&gs.count_threads_mutex);
-    if (gs.count_threads < gs.nthreads) {
-        gs.count_threads++;
+    pthread_mutex_lock(&pool->count_threads_mutex);
+    if (pool->count_threads < pool->nthreads) {
+        pool->count_threads++;
         /* Beware of spurious wakeups. See issue pydata/numexpr#306. */
         do {
-            pthread_cond_wait(&gs.count_threads_cv, &gs.count_threads_mutex);
-        } while (!gs.barrier_passed);
+            pthread_cond_wait(&pool->count_threads_cv, &pool->count_threads_mutex);
+        } while (!pool->barrier_passed);
     }
     else {
-        gs.barrier_passed = 1;
-        pthread_cond_broadcast(&gs.count_threads_cv);
+        pool->barrier_passed = 1;
+        pthread_cond_broadcast(&pool->count_threads_cv);
     }
-    pthread_mutex_unlock(&gs.count_threads_mutex);
+    pthread_mutex_unlock(&pool->count_threads_mutex);
 
     /* Synchronization point for all threads (wait for finalization) */
-    pthread_mutex_lock(&gs.count_threads_mutex);
-    if (gs.count_threads > 0) {
-        gs.count_threads--;
+    pthread_mutex_lock(&pool->count_threads_mutex);
+    if (pool->count_threads > 0) {
+        pool->count_threads--;
         do {
-            pthread_cond_wait(&gs.count_threads_cv, &gs.count_threads_mutex);
-        } while (gs.barrier_passed);
+            pthread_cond_wait(&pool->count_threads_cv, &pool->count_threads_mutex);
+        } while (pool->barrier_passed);
     }
     else {
-        gs.barrier_passed = 0;
-        pthread_cond_broadcast(&gs.count_threads_cv);
+        pool->barrier_passed = 0;
+        pthread_cond_broadcast(&pool->count_threads_cv);
     }
-    pthread_mutex_unlock(&gs.count_threads_mutex);
+    pthread_mutex_unlock(&pool->count_threads_mutex);
 
     Py_END_ALLOW_THREADS;
 
+    /* Deallocating the copies may resolve the writeback of a copied
+       output, so the partials have to be combined before that */
+    if (chunked != NULL && th_params.ret_code >= 0) {
+        th_params.ret_code = finish_chunked_reduction(iter, *chunked);
+    }
+
     /* Deallocate all the iterator and memsteps copies */
-    for (i = 1; i < gs.nthreads; ++i) {
+    for (i = 1; i < pool->nthreads; ++i) {
         NpyIter_Deallocate(th_params.iter[i]);
+        if (th_params.reduce_iter[i] != NULL) {
+            NpyIter_Deallocate(th_params.reduce_iter[i]);
+            th_params.reduce_iter[i] = NULL;
+        }
         PyMem_Del(th_params.memsteps[i]);
     }
+    th_params.reduce_iter[0] = NULL;
+    th_params.partials = NULL;
 
     ret = th_params.ret_code;
 
 end:
-    pthread_mutex_unlock(&gs.parallel_mutex);
     return ret;
 }
 
 static int
 run_interpreter(NumExprObject *self, NpyIter *iter, NpyIter *reduce_iter,
                      bool reduction_outer_loop, bool need_output_buffering,
-                     int *pc_error)
+                     bool full_reduction, int index_ndim,
+                     const npy_intp *index_shape, npy_intp *memsizes,
+                     int nthreads, int *pc_error)
 {
     int r;
     Py_ssize_t plen;
     vm_params params;
     char *errmsg = NULL;
+    npy_intp i;
+    vector<char> partials;
+    chunked_reduction chunked = {NULL, 0, 0, 0};
+    thread_pool *pool = NULL;
+    // Registers of this call, the program may be running in other threads
+    int n_regs = 1 + self->n_inputs + self->n_constants + self->n_temps;
+    vector<char *> mem(self->mem, self->mem + n_regs);
+    vector<npy_intp> memsteps(self->memsteps, self->memsteps + n_regs);
 
     *pc_error = -1;
     if (PyBytes_AsStringAndSize(self->program, (char **)&(params.program),
@@ -838,24 +1282,65 @@ run_interpreter(NumExprObject *self, NpyIter *iter, NpyIter *reduce_iter,
     params.n_inputs = self->n_inputs;
     params.n_constants = self->n_constants;
     params.n_temps = self->n_temps;
-    params.mem = self->mem;
-    params.memsteps = self->memsteps;
-    params.memsizes = self->memsizes;
+    params.n_outputs = self->n_outputs;
+    params.index_ndim = index_ndim;
+    params.index_shape = index_shape;
+    params.mem = &mem[0];
+    params.memsteps = &memsteps[0];
+    params.memsizes = memsizes;
     params.r_end = (int)PyBytes_Size(self->fullsig);
+    params.block_size = self->block_size;
     params.out_buffer = NULL;
+    params.reduce_out = NULL;
+
+    // Large full reductions are accumulated in fixed chunks, each one
+    // starting from the reduction unit already filled into the output
+    if (full_reduction && NpyIter_GetIterSize(iter) > reduction_chunk(params)) {
+        npy_intp chunk = reduction_chunk(params);
+        char *unit = PyArray_BYTES(NpyIter_GetOperandArray(iter)[0]);
+        chunked.n_partials = (NpyIter_GetIterSize(iter) + chunk - 1) / chunk;
+        partials.resize(chunked.n_partials * memsizes[0]);
+        for (i = 0; i < chunked.n_partials; i++) {
+            memcpy(&partials[i * memsizes[0]], unit, memsizes[0]);
+        }
+        chunked.partials = &partials[0];
+        chunked.retsig = get_return_sig(self->program);
+        chunked.op = last_opcode(self->program);
+    }
+    else if (full_reduction) {
+        // Smaller ones accumulate into the output itself, in one thread
+        nthreads = 1;
+    }
 
-    if ((gs.nthreads == 1) || gs.force_serial) {
+    if (nthreads > 1) {
+        pool = acquire_pool(nthreads);
+    }
+    if (pool == NULL) {
+        if (chunked.partials != NULL) {
+            if(NpyIter_Reset(iter, NULL) != NPY_SUCCEED) {
+                return -1;
+            }
+            get_temps_space(params, params.mem, params.block_size);
+            Py_BEGIN_ALLOW_THREADS;
+            r = vm_engine_iter_chunked(iter, chunked.partials, params,
+                                       pc_error, &errmsg);
+            Py_END_ALLOW_THREADS;
+            free_temps_space(params, params.mem);
+            if (r >= 0) {
+                r = finish_chunked_reduction(iter, chunked);
+            }
+        }
         // Can do it as one "task"
-        if (reduce_iter == NULL) {
+        else if (reduce_iter == NULL) {
             // Allocate memory for output buffering if needed
             vector<char> out_buffer(need_output_buffering ?
-                                (self->memsizes[0] * BLOCK_SIZE1) : 0);
+                                output_buffer_size(params, params.block_size) : 0);
             params.out_buffer = need_output_buffering ? &out_buffer[0] : NULL;
             // Reset the iterator to allocate its buffers
             if(NpyIter_Reset(iter, NULL) != NPY_SUCCEED) {
                 return -1;
             }
-            get_temps_space(params, params.mem, BLOCK_SIZE1);
+            get_temps_space(params, params.mem, params.block_size);
             Py_BEGIN_ALLOW_THREADS;
             r = vm_engine_iter_task(iter, params.memsteps,
                                         params, pc_error, &errmsg);
@@ -873,7 +1358,7 @@ run_interpreter(NumExprObject *self, NpyIter *iter, NpyIter *reduce_iter,
                     return -1;
                 }
 
-                get_temps_space(params, params.mem, BLOCK_SIZE1);
+                get_temps_space(params, params.mem, params.block_size);
                 Py_BEGIN_ALLOW_THREADS;
                 do {
                     r = NpyIter_ResetBasePointers(iter, dataptr, &errmsg);
@@ -899,7 +1384,7 @@ run_interpreter(NumExprObject *self, NpyIter *iter, NpyIter *reduce_iter,
                     return -1;
                 }
 
-                get_temps_space(params, params.mem, BLOCK_SIZE1);
+                get_temps_space(params, params.mem, params.block_size);
                 Py_BEGIN_ALLOW_THREADS;
                 do {
                     r = NpyIter_ResetBasePointers(reduce_iter, dataptr,
@@ -918,14 +1403,11 @@ run_interpreter(NumExprObject *self, NpyIter *iter, NpyIter *reduce_iter,
         }
     }
     else {
-        if (reduce_iter == NULL) {
-            r = vm_engine_iter_parallel(iter, params, need_output_buffering,
-                        pc_error, &errmsg);
-        }
-        else {
-            errmsg = (char *) "Parallel engine doesn't support reduction yet";
-            r = -1;
-        }
+        r = vm_engine_iter_parallel(pool, iter, reduce_iter,
+                        reduction_outer_loop,
+                        chunked.partials != NULL ? &chunked : NULL,
+                        params, need_output_buffering, pc_error, &errmsg);
+        release_pool(pool);
     }
 
     if (r < 0 && errmsg != NULL) {
@@ -942,6 +1424,9 @@ run_interpreter_const(NumExprObject *self, char *output, int *pc_error)
     Py_ssize_t plen;
     char **mem;
     npy_intp *memsteps;
+    // Registers of this call, the program may be running in other threads
+    int n_regs = 1 + self->n_inputs + self->n_constants + self->n_temps;
+    vector<char *> call_mem(self->mem, self->mem + n_regs);
 
     *pc_error = -1;
     if (PyBytes_AsStringAndSize(self->program, (char **)&(params.program),
@@ -958,10 +1443,14 @@ run_interpreter_const(NumExprObject *self, char *output, int *pc_error)
     params.n_inputs = self->n_inputs;
     params.n_constants = self->n_constants;
     params.n_temps = self->n_temps;
-    params.mem = self->mem;
+    params.n_outputs = 1;
+    params.index_ndim = 0;
+    params.index_shape = NULL;
+    params.mem = &call_mem[0];
     memsteps = self->memsteps;
     params.memsizes = self->memsizes;
     params.r_end = (int)PyBytes_Size(self->fullsig);
+    params.block_size = self->block_size;
 
     mem = params.mem;
     get_temps_space(params, mem, 1);
@@ -977,6 +1466,84 @@ run_interpreter_const(NumExprObject *self, char *output, int *pc_error)
     return 0;
 }
 
+/*
+ * Borrowed references to the arrays in the `out` sequence of a program with
+ * several outputs, NULL where an output has to be allocated.
+ */
+static int
+get_output_arrays(PyObject *out, int n_outputs, PyArrayObject **outputs)
+{
+    PyObject *seq;
+    int k;
+
+    memset(outputs, 0, n_outputs * sizeof(PyArrayObject *));
+    if (out == NULL || out == Py_None) {
+        return 0;
+    }
+    seq = PySequence_Fast(out, "out must be a sequence of arrays for a "
+                               "program with several outputs");
+    if (seq == NULL) {
+        return -1;
+    }
+    if (PySequence_Fast_GET_SIZE(seq) != n_outputs) {
+        PyErr_Format(PyExc_ValueError,
+                     "out must have %d entries, one per output", n_outputs);
+        Py_DECREF(seq);
+        return -1;
+    }
+    for (k = 0; k < n_outputs; k++) {
+        PyObject *o = PySequence_Fast_GET_ITEM(seq, k); // borrowed ref
+        if (o == Py_None) {
+            continue;
+        }
+        if (!PyArray_Check(o)) {
+            PyErr_Format(PyExc_ValueError,
+                         "out entry %d is not an array", k);
+            Py_DECREF(seq);
+            return -1;
+        }
+        outputs[k] = (PyArrayObject *)o;
+        // one output would overwrite the other block by block
+        for (int j = 0; j < k; j++) {
+            if (outputs[j] != NULL &&
+                    PyArray_DATA(outputs[j]) == PyArray_DATA(outputs[k])) {
+                PyErr_Format(PyExc_ValueError,
+                             "out entries %d and %d are the same array", j, k);
+                Py_DECREF(seq);
+                return -1;
+            }
+        }
+    }
+    // the items stay referenced by `out` itself
+    Py_DECREF(seq);
+    return 0;
+}
+
+/* New reference to the output, or a tuple of all outputs of a program
+   compiled from a list of expressions */
+static PyObject *
+return_value(PyArrayObject **operands, unsigned int n_args, int n_outputs,
+             int multiple)
+{
+    PyObject *ret, *a;
+    int k;
+
+    if (!multiple) {
+        Py_INCREF(operands[0]);
+        return (PyObject *)operands[0];
+    }
+    ret = PyTuple_New(n_outputs);
+    if (ret == NULL) {
+        return NULL;
+    }
+    for (k = 0; k < n_outputs; k++) {
+        a = (PyObject *)operands[k == 0 ? 0 : n_args + k];
+        Py_INCREF(a);
+        PyTuple_SET_ITEM(ret, k, a);
+    }
+    return ret;
+}
+
 PyObject *
 NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
 {
@@ -986,7 +1553,10 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
     npy_uint32 op_flags[NE_MAXARGS];
     NPY_CASTING casting = NPY_SAFE_CASTING;
     NPY_ORDER order = NPY_KEEPORDER;
-    unsigned int i, n_inputs;
+    PyArrayObject *outputs[NE_MAXARGS];
+    unsigned int i, k, n_inputs, n_args;
+    int n_outputs = self->n_outputs;
+    int multiple = self->multiple;
     int r, pc_error = 0;
     int reduction_axis = -1;
     npy_intp reduction_size = -1; // For #277 change this 1 -> -1 to be in-line with NumPy 1.8,
@@ -994,6 +1564,8 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
     int ex_uses_vml = 0;
 #endif
     int is_reduction = 0;
+    int index_axis, index_ndim = 0;
+    npy_intp index_shape[NPY_MAXDIMS];
     bool reduction_outer_loop = false, need_output_buffering = false, full_reduction = false;
 
     // To specify axes when doing a reduction
@@ -1005,29 +1577,51 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
 
     NpyIter *iter = NULL, *reduce_iter = NULL;
 
-    // Check whether we need to restart threads
-    if (!gs.init_threads_done || gs.pid != getpid()) {
-        numexpr_set_nthreads(gs.nthreads);
-    }
-
-    // Don't force serial mode by default
-    gs.force_serial = 0;
+    // Threads of this call, the default unless given as num_threads
+    int nthreads = gs.nthreads;
+    // Sizes of the registers of this call
+    vector<npy_intp> memsizes(self->memsizes, self->memsizes + 1 +
+                              self->n_inputs + self->n_constants +
+                              self->n_temps);
 
     // Check whether there's a reduction as the final step
     is_reduction = last_opcode(self->program) > OP_REDUCTION;
 
-    n_inputs = (int)PyTuple_Size(args);
+    // The outputs after the first one are operands right after the inputs
+    n_args = (int)PyTuple_Size(args);
+    n_inputs = n_args + n_outputs - 1;
     if (PyBytes_Size(self->signature) != n_inputs) {
         return PyErr_Format(PyExc_ValueError,
                             "number of inputs doesn't match program");
     }
+    else if (multiple && is_reduction) {
+        return PyErr_Format(PyExc_ValueError,
+                            "a reduction can only have one output");
+    }
+    else if (multiple && n_args == 0) {
+        return PyErr_Format(PyExc_ValueError,
+                            "a program with several outputs needs inputs");
+    }
     else if (n_inputs+1 > NPY_MAXARGS) {
         return PyErr_Format(PyExc_ValueError,
                             "too many inputs");
     }
 
+    // Programs with index functions run in C order over the operands' shape
+    index_axis = get_index_axis(self->program);
+    if (index_axis > -2 && n_inputs == 0) {
+        return PyErr_Format(PyExc_ValueError,
+                            "index functions need an array operand");
+    }
+    else if (index_axis > -2 && is_reduction &&
+             get_reduction_axis(self->program) != 255) {
+        return PyErr_Format(PyExc_ValueError,
+                            "index functions only support full reductions");
+    }
+
     memset(operands, 0, sizeof(operands));
     memset(dtypes, 0, sizeof(dtypes));
+    memset(outputs, 0, sizeof(outputs));
 
     if (kwds) {
         tmp = PyDict_GetItemString(kwds, "casting"); // borrowed ref
@@ -1038,6 +1632,19 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
         if (tmp != NULL && !PyArray_OrderConverter(tmp, &order)) {
             return NULL;
         }
+        tmp = PyDict_GetItemString(kwds, "num_threads"); // borrowed ref
+        if (tmp != NULL && tmp != Py_None) {
+            long n = PyLong_AsLong(tmp);
+            if (n == -1 && PyErr_Occurred()) {
+                return NULL;
+            }
+            if (n <= 0 || n > global_max_threads) {
+                return PyErr_Format(PyExc_ValueError,
+                        "num_threads must be between 1 and %ld",
+                        global_max_threads);
+            }
+            nthreads = (int)n;
+        }
         tmp = PyDict_GetItemString(kwds, "ex_uses_vml"); // borrowed ref
         if (tmp == NULL) {
             return PyErr_Format(PyExc_ValueError,
@@ -1048,23 +1655,43 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
             ex_uses_vml = 1;
         }
 #endif
-            // borrowed ref
-        operands[0] = (PyArrayObject *)PyDict_GetItemString(kwds, "out");
-        if (operands[0] != NULL) {
-            if ((PyObject *)operands[0] == Py_None) {
-                operands[0] = NULL;
+        if (multiple) {
+            if (get_output_arrays(PyDict_GetItemString(kwds, "out"),
+                                  n_outputs, outputs) < 0) {
+                return NULL;
             }
-            else if (!PyArray_Check(operands[0])) {
-                return PyErr_Format(PyExc_ValueError,
-                                    "out keyword parameter is not an array");
+            operands[0] = outputs[0];
+            for (k = 1; k < (unsigned int)n_outputs; k++) {
+                operands[n_args+k] = outputs[k];
             }
-            else {
-                Py_INCREF(operands[0]);
+            for (k = 0; k < (unsigned int)n_outputs; k++) {
+                Py_XINCREF(outputs[k]);
             }
         }
+        else {
+            // borrowed ref
+            operands[0] = (PyArrayObject *)PyDict_GetItemString(kwds, "out");
+            if (operands[0] != NULL) {
+                if ((PyObject *)operands[0] == Py_None) {
+                    operands[0] = NULL;
+                }
+                else if (!PyArray_Check(operands[0])) {
+                    return PyErr_Format(PyExc_ValueError,
+                                        "out keyword parameter is not an array");
+                }
+                else {
+                    Py_INCREF(operands[0]);
+                }
+            }
+            outputs[0] = operands[0];
+        }
+    }
+
+    if (index_axis > -2) {
+        order = NPY_CORDER;
     }
 
-    for (i = 0; i < n_inputs; i++) {
+    for (i = 0; i < n_args; i++) {
         PyObject *o = PyTuple_GET_ITEM(args, i); // borrowed ref
         PyObject *a;
         char c = PyBytes_AS_STRING(self->signature)[i];
@@ -1081,11 +1708,12 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
         operands[i+1] = (PyArrayObject *)a;
         dtypes[i+1] = PyArray_DescrFromType(typecode);
 
-        if (operands[0] != NULL) {
+        for (k = 0; k < (unsigned int)n_outputs; k++) {
             // Check for the case where "out" is one of the inputs
             // TODO: Probably should deal with the general overlap case,
             //       but NumPy ufuncs don't do that yet either.
-            if (PyArray_DATA(operands[0]) == PyArray_DATA(operands[i+1])) {
+            if (outputs[k] != NULL && operands[i+1] != NULL &&
+                    PyArray_DATA(outputs[k]) == PyArray_DATA(operands[i+1])) {
                 need_output_buffering = true;
             }
         }
@@ -1104,6 +1732,23 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
                         ;
     }
 
+    // The other outputs, flagged like a non-reduction output 0 below
+    for (i = n_args; i < n_inputs; i++) {
+        char c = PyBytes_AS_STRING(self->signature)[i];
+        dtypes[i+1] = PyArray_DescrFromType(typecode_from_char(c));
+        if (dtypes[i+1] == NULL) {
+            goto fail;
+        }
+        op_flags[i+1] = NPY_ITER_WRITEONLY|
+                        NPY_ITER_ALLOCATE|
+                        NPY_ITER_CONTIG|
+                        NPY_ITER_NBO|
+#ifndef USE_UNALIGNED_ACCESS
+                        NPY_ITER_ALIGNED|
+#endif
+                        NPY_ITER_NO_BROADCAST;
+    }
+
     if (is_reduction) {
         // A reduction can not result in a string,
         // so we don't need to worry about item sizes here.
@@ -1225,7 +1870,7 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
 
         // Check length for all inputs
         int zeroi, zerolen = 0;
-        for (i=0; i < n_inputs; i++) {
+        for (i=0; i < n_args; i++) {
             if (PyArray_SIZE(operands[i+1]) == 0) {
                 zerolen = 1;
                 zeroi = i+1;
@@ -1234,17 +1879,21 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
         }
 
         if (zerolen != 0) {
-            // Allocate the output
+            // Allocate the outputs
             int ndim = PyArray_NDIM(operands[zeroi]);
             npy_intp *dims = PyArray_DIMS(operands[zeroi]);
-            operands[0] = (PyArrayObject *)PyArray_SimpleNew(ndim, dims,
-                                              typecode_from_char(retsig));
-            if (operands[0] == NULL) {
-                goto fail;
+            for (k = 0; k < (unsigned int)n_outputs; k++) {
+                i = k == 0 ? 0 : n_args + k;
+                char c = k == 0 ? retsig : PyBytes_AS_STRING(self->signature)[i-1];
+                Py_XDECREF(operands[i]);
+                operands[i] = (PyArrayObject *)PyArray_SimpleNew(ndim, dims,
+                                                  typecode_from_char(c));
+                if (operands[i] == NULL) {
+                    goto fail;
+                }
             }
 
-            ret = (PyObject *)operands[0];
-            Py_INCREF(ret);
+            ret = return_value(operands, n_args, n_outputs, multiple);
             goto cleanup_and_exit;
         }
     }
@@ -1310,6 +1959,16 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
     }
 
 
+    if (index_axis > -2) {
+        index_ndim = get_index_shape(operands, n_inputs+1, index_shape);
+        if (index_axis >= index_ndim) {
+            PyErr_Format(PyExc_ValueError,
+                    "fftfreq axis %d is out of bounds for %d dimensions",
+                    index_axis, index_ndim);
+            goto fail;
+        }
+    }
+
     /* Allocate the iterator or nested iterators */
     if (reduction_size < 0 || full_reduction) {
         /* When there's no reduction, reduction_size is 1 as well */
@@ -1327,7 +1986,7 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
                             order, casting,
                             op_flags, dtypes,
                             -1, NULL, NULL,
-                            BLOCK_SIZE1);
+                            self->block_size);
         if (iter == NULL) {
             goto fail;
         }
@@ -1351,7 +2010,7 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
                                 order, casting,
                                 op_flags, dtypes,
                                 oa_ndim, op_axes, NULL,
-                                BLOCK_SIZE1);
+                                self->block_size);
             if (iter == NULL) {
                 goto fail;
             }
@@ -1414,7 +2073,7 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
                                 order, casting,
                                 op_flags, dtypes,
                                 1, op_axes, NULL,
-                                BLOCK_SIZE1);
+                                self->block_size);
             if (reduce_iter == NULL) {
                 goto fail;
             }
@@ -1449,22 +2108,26 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
     /* Get the sizes of all the operands */
     dtypes_tmp = NpyIter_GetDescrArray(iter);
     for (i = 0; i < n_inputs+1; ++i) {
-        self->memsizes[i] = dtypes_tmp[i]->elsize;
+        memsizes[i] = dtypes_tmp[i]->elsize;
     }
 
     /* For small calculations, just use 1 thread */
-    if (NpyIter_GetIterSize(iter) < 2*BLOCK_SIZE1) {
-        gs.force_serial = 1;
+    if (NpyIter_GetIterSize(iter) *
+            (reduce_iter != NULL ? reduction_size : 1) <
+            2*self->block_size) {
+        nthreads = 1;
     }
 
-    /* Reductions do not support parallel execution yet */
-    if (is_reduction) {
-        gs.force_serial = 1;
+    /* Reductions write to the output directly, never through a buffer */
+    if (is_reduction && need_output_buffering) {
+        nthreads = 1;
     }
 
     r = run_interpreter(self, iter, reduce_iter,
                              reduction_outer_loop, need_output_buffering,
-                             &pc_error);
+                             full_reduction, index_ndim,
+                             index_axis > -2 ? index_shape : NULL,
+                             &memsizes[0], nthreads, &pc_error);
 
     if (r < 0) {
         if (r == -1) {
@@ -1485,9 +2148,9 @@ NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds)
         goto fail;
     }
 
-    /* Get the output from the iterator */
-    ret = (PyObject *)NpyIter_GetOperandArray(iter)[0];
-    Py_INCREF(ret);
+    /* Get the outputs from the iterator */
+    ret = return_value(NpyIter_GetOperandArray(iter), n_args, n_outputs,
+                       multiple);
 
     NpyIter_Deallocate(iter);
     if (reduce_iter != NULL) {
@@ -48,24 +48,66 @@ enum FuncCCCCodes {
 #undef FUNC_CCC
 };
 
+enum FuncZZCodes {
+#define FUNC_ZZ(fop, ...) fop,
+#include "functions.hpp"
+#undef FUNC_ZZ
+};
+
+enum FuncZZZCodes {
+#define FUNC_ZZZ(fop, ...) fop,
+#include "functions.hpp"
+#undef FUNC_ZZZ
+};
+
 struct vm_params {
     int prog_len;
     unsigned char *program;
     int n_inputs;
     int n_constants;
     int n_temps;
+    int n_outputs;
     unsigned int r_end;
+    // Elements per block, the size of the temporaries and constants
+    npy_intp block_size;
     char *output;
     char **inputs;
     char **mem;
     npy_intp *memsteps;
     npy_intp *memsizes;
     struct index_data *index_data;
+    // Iteration shape for the index functions (iterated in C order),
+    // NULL if the program has none
+    int index_ndim;
+    const npy_intp *index_shape;
     // Memory for output buffering. If output buffering is unneeded,
     // it contains NULL.
     char *out_buffer;
+    // Private accumulator of a chunked full reduction, NULL otherwise.
+    char *reduce_out;
 };
 
+/*
+ * Register of output k.  Output 0 is register 0, the others follow the
+ * inputs (they are the last n_outputs-1 entries of the signature).
+ */
+static inline int
+output_register(const vm_params& params, int k)
+{
+    return k == 0 ? 0 : params.n_inputs - params.n_outputs + 1 + k;
+}
+
+/* Bytes of the buffer that holds one block of every output */
+static inline npy_intp
+output_buffer_size(const vm_params& params, npy_intp block_size)
+{
+    npy_intp size = 0;
+    for (int k = 0; k < params.n_outputs; k++) {
+        size += params.memsizes[output_register(params, k)] * block_size;
+    }
+    return size;
+}
+
 // Structure for parameters in worker threads
 struct thread_data {
     npy_intp start;
@@ -75,25 +117,54 @@ struct thread_data {
     int ret_code;
     int *pc_error;
     char **errmsg;
-    // NOTE: memsteps, iter, and reduce_iter are arrays, they MUST be allocated 
-    // to length `global_max_threads` before module load.
+    // NOTE: memsteps, iter, and reduce_iter are arrays with one entry per
+    // thread of the pool.
     // One memsteps array per thread
-    // npy_intp *memsteps[MAX_THREADS];
     npy_intp **memsteps;
     // One iterator per thread */
-    // NpyIter *iter[MAX_THREADS];
     NpyIter **iter;
     // When doing nested iteration for a reduction
-    // NpyIter *reduce_iter[MAX_THREADS]
     NpyIter **reduce_iter;
     // Flag indicating reduction is the outer loop instead of the inner
     bool reduction_outer_loop;
     // Flag indicating whether output buffering is needed
     bool need_output_buffering;
+    // One partial result per task of a chunked full reduction, NULL
+    // for everything else
+    char *partials;
+};
+
+struct thread_pool;
+
+// Argument of a worker thread
+struct worker_arg {
+    thread_pool *pool;
+    int tid;
 };
 
-// Global state which holds thread parameters
-extern thread_data th_params;
+// A pool of worker threads, running the parallel part of one call at a time
+struct thread_pool {
+    int nthreads;                    /* number of threads in the pool */
+    int end_threads;                 /* should the threads end? */
+    pthread_t *threads;              /* opaque structure for threads */
+    worker_arg *args;                /* argument of each thread */
+    npy_intp gindex;                 /* global index for all threads */
+    int init_sentinels_done;         /* sentinels initialized? */
+    int giveup;                      /* should parallel code giveup? */
+
+    /* Synchronization variables for threadpool state */
+    pthread_mutex_t count_mutex;
+    int count_threads;
+    int barrier_passed;         /* indicates if the thread pool's thread barrier 
+                                   is unlocked and ready for the VM to process.*/
+    pthread_mutex_t count_threads_mutex;
+    pthread_cond_t count_threads_cv;
+
+    /* Parameters of the current job */
+    thread_data th_params;
+    /* Next pool in the list of idle pools */
+    thread_pool *next;
+};
 
 PyObject *NumExpr_run(NumExprObject *self, PyObject *args, PyObject *kwds);
 
@@ -103,5 +174,9 @@ int get_temps_space(const vm_params& params, char **mem, size_t block_size);
 void free_temps_space(const vm_params& params, char **mem);
 int vm_engine_iter_task(NpyIter *iter, npy_intp *memsteps,
                     const vm_params& params, int *pc_error, char **errmsg);
+int vm_engine_iter_reduce_task(NpyIter *iter, NpyIter *reduce_iter,
+                    bool reduction_outer_loop, npy_intp istart, npy_intp iend,
+                    npy_intp *memsteps, const vm_params& params,
+                    int *pc_error, char **errmsg);
 
 #endif // NUMEXPR_INTERPRETER_HPP
@@ -20,20 +20,21 @@
 
 using namespace std;
 
-// Global state. The file interpreter.hpp also has some global state
-// in its 'th_params' variable
+// Global state. The worker threads and their parameters are in the pools
 global_state gs;
 long global_max_threads=DEFAULT_MAX_THREADS;
 
 /* Do the worker job for a certain thread */
-void *th_worker(void *tidptr)
+void *th_worker(void *argptr)
 {
-    int tid = *(int *)tidptr;
+    thread_pool *pool = ((worker_arg *)argptr)->pool;
+    thread_data& th_params = pool->th_params;
+    int tid = ((worker_arg *)argptr)->tid;
     /* Parameters for threads */
     npy_intp start;
     npy_intp vlen;
     npy_intp block_size;
-    NpyIter *iter;
+    NpyIter *iter, *reduce_iter;
     vm_params params;
     int *pc_error;
     int ret;
@@ -51,26 +52,26 @@ void *th_worker(void *tidptr)
     while (1) {
 
         /* Sentinels have to be initialised yet */
-        gs.init_sentinels_done = 0;
+        pool->init_sentinels_done = 0;
 
         /* Meeting point for all threads (wait for initialization) */
-        pthread_mutex_lock(&gs.count_threads_mutex);
-        if (gs.count_threads < gs.nthreads) {
-            gs.count_threads++;
+        pthread_mutex_lock(&pool->count_threads_mutex);
+        if (pool->count_threads < pool->nthreads) {
+            pool->count_threads++;
             /* Beware of spurious wakeups. See issue pydata/numexpr#306. */
             do {
-                pthread_cond_wait(&gs.count_threads_cv,
-                                  &gs.count_threads_mutex);
-            } while (!gs.barrier_passed);
+                pthread_cond_wait(&pool->count_threads_cv,
+                                  &pool->count_threads_mutex);
+            } while (!pool->barrier_passed);
         }
         else {
-            gs.barrier_passed = 1;
-            pthread_cond_broadcast(&gs.count_threads_cv);
+            pool->barrier_passed = 1;
+            pthread_cond_broadcast(&pool->count_threads_cv);
         }
-        pthread_mutex_unlock(&gs.count_threads_mutex);
+        pthread_mutex_unlock(&pool->count_threads_mutex);
 
         /* Check if thread has been asked to return */
-        if (gs.end_threads) {
+        if (pool->end_threads) {
             return(0);
         }
 
@@ -83,7 +84,7 @@ void *th_worker(void *tidptr)
 
         // If output buffering is needed, allocate it
         if (th_params.need_output_buffering) {
-            out_buffer.resize(params.memsizes[0] * BLOCK_SIZE1);
+            out_buffer.resize(output_buffer_size(params, params.block_size));
             params.out_buffer = &out_buffer[0];
         } else {
             params.out_buffer = NULL;
@@ -103,20 +104,20 @@ void *th_worker(void *tidptr)
         params.mem = mem;
 
         /* Loop over blocks */
-        pthread_mutex_lock(&gs.count_mutex);
-        if (!gs.init_sentinels_done) {
+        pthread_mutex_lock(&pool->count_mutex);
+        if (!pool->init_sentinels_done) {
             /* Set sentinels and other global variables */
-            gs.gindex = start;
-            istart = gs.gindex;
+            pool->gindex = start;
+            istart = pool->gindex;
             iend = istart + block_size;
             if (iend > vlen) {
                 iend = vlen;
             }
-            gs.init_sentinels_done = 1;  /* sentinels have been initialised */
-            gs.giveup = 0;            /* no giveup initially */
+            pool->init_sentinels_done = 1;  /* sentinels have been initialised */
+            pool->giveup = 0;            /* no giveup initially */
         } else {
-            gs.gindex += block_size;
-            istart = gs.gindex;
+            pool->gindex += block_size;
+            istart = pool->gindex;
             iend = istart + block_size;
             if (iend > vlen) {
                 iend = vlen;
@@ -124,62 +125,78 @@ void *th_worker(void *tidptr)
         }
         /* Grab one of the iterators */
         iter = th_params.iter[tid];
+        reduce_iter = th_params.reduce_iter[tid];
         if (iter == NULL) {
             th_params.ret_code = -1;
-            gs.giveup = 1;
+            pool->giveup = 1;
         }
         memsteps = th_params.memsteps[tid];
         /* Get temporary space for each thread */
-        ret = get_temps_space(params, mem, BLOCK_SIZE1);
+        ret = get_temps_space(params, mem, params.block_size);
         if (ret < 0) {
             /* Propagate error to main thread */
             th_params.ret_code = ret;
-            gs.giveup = 1;
+            pool->giveup = 1;
         }
-        pthread_mutex_unlock(&gs.count_mutex);
-
-        while (istart < vlen && !gs.giveup) {
-            /* Reset the iterator to the range for this task */
-            ret = NpyIter_ResetToIterIndexRange(iter, istart, iend,
-                                                errmsg);
-            /* Execute the task */
-            if (ret >= 0) {
-                ret = vm_engine_iter_task(iter, memsteps, params, pc_error, errmsg);
+        pthread_mutex_unlock(&pool->count_mutex);
+
+        while (istart < vlen && !pool->giveup) {
+            if (reduce_iter != NULL) {
+                /* Axis reduction, the task owns a range of the outputs */
+                ret = vm_engine_iter_reduce_task(iter, reduce_iter,
+                                    th_params.reduction_outer_loop,
+                                    istart, iend, memsteps, params,
+                                    pc_error, errmsg);
+            }
+            else {
+                /* Full reductions keep one partial per task (chunk) */
+                if (th_params.partials != NULL) {
+                    params.reduce_out = th_params.partials +
+                        (istart - start) / block_size * params.memsizes[0];
+                }
+                /* Reset the iterator to the range for this task */
+                ret = NpyIter_ResetToIterIndexRange(iter, istart, iend,
+                                                    errmsg);
+                /* Execute the task */
+                if (ret >= 0) {
+                    ret = vm_engine_iter_task(iter, memsteps, params,
+                                              pc_error, errmsg);
+                }
             }
 
             if (ret < 0) {
-                pthread_mutex_lock(&gs.count_mutex);
-                gs.giveup = 1;
+                pthread_mutex_lock(&pool->count_mutex);
+                pool->giveup = 1;
                 /* Propagate error to main thread */
                 th_params.ret_code = ret;
-                pthread_mutex_unlock(&gs.count_mutex);
+                pthread_mutex_unlock(&pool->count_mutex);
                 break;
             }
 
-            pthread_mutex_lock(&gs.count_mutex);
-            gs.gindex += block_size;
-            istart = gs.gindex;
+            pthread_mutex_lock(&pool->count_mutex);
+            pool->gindex += block_size;
+            istart = pool->gindex;
             iend = istart + block_size;
             if (iend > vlen) {
                 iend = vlen;
             }
-            pthread_mutex_unlock(&gs.count_mutex);
+            pthread_mutex_unlock(&pool->count_mutex);
         }
 
         /* Meeting point for all threads (wait for finalization) */
-        pthread_mutex_lock(&gs.count_threads_mutex);
-        if (gs.count_threads > 0) {
-            gs.count_threads--;
+        pthread_mutex_lock(&pool->count_threads_mutex);
+        if (pool->count_threads > 0) {
+            pool->count_threads--;
             do {
-                pthread_cond_wait(&gs.count_threads_cv,
-                                  &gs.count_threads_mutex);
-            } while (gs.barrier_passed);
+                pthread_cond_wait(&pool->count_threads_cv,
+                                  &pool->count_threads_mutex);
+            } while (pool->barrier_passed);
         }
         else {
-            gs.barrier_passed = 0;
-            pthread_cond_broadcast(&gs.count_threads_cv);
+            pool->barrier_passed = 0;
+            pthread_cond_broadcast(&pool->count_threads_cv);
         }
-        pthread_mutex_unlock(&gs.count_threads_mutex);
+        pthread_mutex_unlock(&pool->count_threads_mutex);
 
         /* Release resources */
         free_temps_space(params, mem);
@@ -191,25 +208,88 @@ void *th_worker(void *tidptr)
     return(0);
 }
 
-/* Initialize threads */
-int init_threads(void)
+/* Tell the threads of a pool to finish, join them and free the pool */
+static void
+stop_pool(thread_pool *pool)
 {
+    int t, rc;
+    void *status;
+
+    pool->end_threads = 1;
+    pthread_mutex_lock(&pool->count_threads_mutex);
+    if (pool->count_threads < pool->nthreads) {
+        pool->count_threads++;
+        do {
+            pthread_cond_wait(&pool->count_threads_cv,
+                              &pool->count_threads_mutex);
+        } while (!pool->barrier_passed);
+    }
+    else {
+        pool->barrier_passed = 1;
+        pthread_cond_broadcast(&pool->count_threads_cv);
+    }
+    pthread_mutex_unlock(&pool->count_threads_mutex);
+
+    /* Join exiting threads */
+    for (t=0; t<pool->nthreads; t++) {
+        rc = pthread_join(pool->threads[t], &status);
+        if (rc) {
+            fprintf(stderr,
+                    "ERROR; return code from pthread_join() is %d\n",
+                    rc);
+            fprintf(stderr, "\tError detail: %s\n", strerror(rc));
+            exit(-1);
+        }
+    }
+
+    pthread_mutex_destroy(&pool->count_mutex);
+    pthread_mutex_destroy(&pool->count_threads_mutex);
+    pthread_cond_destroy(&pool->count_threads_cv);
+    free(pool->threads);
+    free(pool->args);
+    free(pool->th_params.memsteps);
+    free(pool->th_params.iter);
+    free(pool->th_params.reduce_iter);
+    free(pool);
+}
+
+/* Start a pool of nthreads threads, NULL if that fails */
+static thread_pool *
+new_pool(int nthreads)
+{
+    thread_pool *pool;
     int tid, rc;
 
-    if ( !(gs.nthreads > 1 && (!gs.init_threads_done || gs.pid != getpid())) ) {
-        /* Thread pool must always be initialized once and once only. */
-        return(0);
+    pool = (thread_pool *)calloc(1, sizeof(thread_pool));
+    if (pool == NULL) {
+        return NULL;
+    }
+    pool->threads = (pthread_t*)calloc(sizeof(pthread_t), nthreads);
+    pool->args = (worker_arg*)calloc(sizeof(worker_arg), nthreads);
+    pool->th_params.memsteps = (npy_intp**)calloc(sizeof(npy_intp*), nthreads);
+    pool->th_params.iter = (NpyIter**)calloc(sizeof(NpyIter*), nthreads);
+    pool->th_params.reduce_iter = (NpyIter**)calloc(sizeof(NpyIter*), nthreads);
+    if (pool->threads == NULL || pool->args == NULL ||
+            pool->th_params.memsteps == NULL ||
+            pool->th_params.iter == NULL ||
+            pool->th_params.reduce_iter == NULL) {
+        free(pool->threads);
+        free(pool->args);
+        free(pool->th_params.memsteps);
+        free(pool->th_params.iter);
+        free(pool->th_params.reduce_iter);
+        free(pool);
+        return NULL;
     }
 
     /* Initialize mutex and condition variable objects */
-    pthread_mutex_init(&gs.count_mutex, NULL);
-    pthread_mutex_init(&gs.parallel_mutex, NULL);
+    pthread_mutex_init(&pool->count_mutex, NULL);
 
     /* Barrier initialization */
-    pthread_mutex_init(&gs.count_threads_mutex, NULL);
-    pthread_cond_init(&gs.count_threads_cv, NULL);
-    gs.count_threads = 0;      /* Reset threads counter */
-    gs.barrier_passed = 0;
+    pthread_mutex_init(&pool->count_threads_mutex, NULL);
+    pthread_cond_init(&pool->count_threads_cv, NULL);
+    pool->count_threads = 0;      /* Reset threads counter */
+    pool->barrier_passed = 0;
 
     /*
      * Our worker threads should not deal with signals from the rest of the
@@ -231,15 +311,16 @@ int init_threads(void)
     }
 
     /* Now create the threads */
-    for (tid = 0; tid < gs.nthreads; tid++) {
-        gs.tids[tid] = tid;
-        rc = pthread_create(&gs.threads[tid], NULL, th_worker,
-                            (void *)&gs.tids[tid]);
+    for (tid = 0; tid < nthreads; tid++) {
+        pool->args[tid].pool = pool;
+        pool->args[tid].tid = tid;
+        pool->nthreads = tid + 1;
+        rc = pthread_create(&pool->threads[tid], NULL, th_worker,
+                            (void *)&pool->args[tid]);
         if (rc) {
-            fprintf(stderr,
-                    "ERROR; return code from pthread_create() is %d\n", rc);
-            fprintf(stderr, "\tError detail: %s\n", strerror(rc));
-            exit(-1);
+            /* the threads started so far make a smaller pool */
+            pool->nthreads = tid;
+            break;
         }
     }
 
@@ -255,25 +336,54 @@ int init_threads(void)
         exit(-1);
     }
 
-    gs.init_threads_done = 1;                 /* Initialization done! */
-    gs.pid = (int)getpid();                   /* save the PID for this process */
+    if (pool->nthreads < nthreads) {
+        stop_pool(pool);
+        return NULL;
+    }
+    return pool;
+}
+
+/*
+ * Check out a pool of nthreads threads for one call, starting a new one if
+ * no idle pool has that size.  Must be called with the GIL held.  Returns
+ * NULL if the threads can not be started, the call then runs serially.
+ */
+thread_pool *
+acquire_pool(int nthreads)
+{
+    thread_pool **p, *pool;
 
-    return(0);
+    /* Pools started in the parent of a forked process have no threads
+       here, forget about them */
+    if (gs.pid != getpid()) {
+        gs.idle_pools = NULL;
+        gs.pid = (int)getpid();
+    }
+    for (p = &gs.idle_pools; *p != NULL; p = &(*p)->next) {
+        if ((*p)->nthreads == nthreads) {
+            pool = *p;
+            *p = pool->next;
+            pool->next = NULL;
+            return pool;
+        }
+    }
+    return new_pool(nthreads);
 }
 
-/* Set the number of threads in numexpr's VM */
+/* Return a pool checked out by `acquire_pool`.  Needs the GIL. */
+void
+release_pool(thread_pool *pool)
+{
+    pool->next = gs.idle_pools;
+    gs.idle_pools = pool;
+}
+
+/* Set the default number of threads in numexpr's VM */
 int numexpr_set_nthreads(int nthreads_new)
 {
     int nthreads_old = gs.nthreads;
-    int t, rc;
-    void *status;
+    thread_pool *pool;
 
-    // if (nthreads_new > MAX_THREADS) {
-    //     fprintf(stderr,
-    //             "Error.  nthreads cannot be larger than MAX_THREADS (%d)",
-    //             MAX_THREADS);
-    //     return -1;
-    // }
     if (nthreads_new > global_max_threads) {
         fprintf(stderr,
                 "Error.  nthreads cannot be larger than environment variable \"NUMEXPR_MAX_THREADS\" (%ld)",
@@ -285,44 +395,18 @@ int numexpr_set_nthreads(int nthreads_new)
         return -1;
     }
 
-    /* Only join threads if they are not initialized or if our PID is
-       different from that in pid var (probably means that we are a
-       subprocess, and thus threads are non-existent). */
-    if (gs.nthreads > 1 && gs.init_threads_done && gs.pid == getpid()) {
-        /* Tell all existing threads to finish */
-        gs.end_threads = 1;
-        pthread_mutex_lock(&gs.count_threads_mutex);
-        if (gs.count_threads < gs.nthreads) {
-            gs.count_threads++;
-            do {
-                pthread_cond_wait(&gs.count_threads_cv,
-                                  &gs.count_threads_mutex);
-            } while (!gs.barrier_passed);
-        }
-        else {
-            gs.barrier_passed = 1;
-            pthread_cond_broadcast(&gs.count_threads_cv);
-        }
-        pthread_mutex_unlock(&gs.count_threads_mutex);
-
-        /* Join exiting threads */
-        for (t=0; t<gs.nthreads; t++) {
-            rc = pthread_join(gs.threads[t], &status);
-            if (rc) {
-                fprintf(stderr,
-                        "ERROR; return code from pthread_join() is %d\n",
-                        rc);
-                fprintf(stderr, "\tError detail: %s\n", strerror(rc));
-                exit(-1);
-            }
+    /* Stop the idle pools, they are started again when needed.  Only
+       join threads if our PID is the one they were started in (otherwise
+       we are a subprocess, and thus threads are non-existent). */
+    if (gs.pid == getpid()) {
+        while ((pool = gs.idle_pools) != NULL) {
+            gs.idle_pools = pool->next;
+            stop_pool(pool);
         }
-        gs.init_threads_done = 0;
-        gs.end_threads = 0;
     }
-
-    /* Launch a new pool of threads (if necessary) */
+    gs.idle_pools = NULL;
+    gs.pid = (int)getpid();
     gs.nthreads = nthreads_new;
-    init_threads();
 
     return nthreads_old;
 }
@@ -461,14 +545,6 @@ PyInit_interpreter(void) {
 
 
 
-    th_params.memsteps    = (npy_intp**)calloc(sizeof(npy_intp*), global_max_threads);
-    th_params.iter        = (NpyIter**)calloc(sizeof(NpyIter*),   global_max_threads);
-    th_params.reduce_iter = (NpyIter**)calloc(sizeof(NpyIter*),   global_max_threads);
-    gs.threads            = (pthread_t*)calloc(sizeof(pthread_t), global_max_threads);
-    gs.tids               = (int*)calloc(sizeof(int),             global_max_threads);
-    // TODO: for Py3, deallocate: https://docs.python.org/3/c-api/module.html#c.PyModuleDef.m_free
-    // For Python 2.7, people have to exit the process to reclaim the memory.
-
     if (PyType_Ready(&NumExprType) < 0)
         INITERROR;
 
@@ -503,7 +579,11 @@ PyInit_interpreter(void) {
 #define FUNC_DDD(name, sname, ...) add_func(name, sname);
 #define FUNC_CC(name, sname, ...)  add_func(name, sname);
 #define FUNC_CCC(name, sname, ...) add_func(name, sname);
+#define FUNC_ZZ(name, sname, ...)  add_func(name, sname);
+#define FUNC_ZZZ(name, sname, ...) add_func(name, sname);
 #include "functions.hpp"
+#undef FUNC_ZZZ
+#undef FUNC_ZZ
 #undef FUNC_CCC
 #undef FUNC_CC
 #undef FUNC_DDD
@@ -522,6 +602,7 @@ PyInit_interpreter(void) {
 
     // Let's export the block sizes to Python side for benchmarking comparisons
     if(PyModule_AddIntConstant(m, "__BLOCK_SIZE1__", BLOCK_SIZE1) < 0) INITERROR;
+    if(PyModule_AddIntConstant(m, "MAX_BLOCK_SIZE", MAX_BLOCK_SIZE) < 0) INITERROR;
     // Export if we are using VML or not
 #ifdef USE_VML
     if(PyModule_AddObject(m, "use_vml", Py_True) < 0) INITERROR;
@@ -16,45 +16,28 @@
 
 #include "numexpr_config.hpp"
 
+struct thread_pool;
+
 struct global_state {
     /* Global variables for threads */
-    int nthreads;                    /* number of desired threads in pool */
-    int init_threads_done;           /* pool of threads initialized? */
-    int end_threads;                 /* should exisiting threads end? */
-    // pthread_t threads[MAX_THREADS];  /* opaque structure for threads */
-    // int tids[MAX_THREADS];           /* ID per each thread */
-    /* NOTE: threads and tids are arrays, they MUST be allocated to length 
-       `global_max_threads` before module load. */
-    pthread_t *threads;              /* opaque structure for threads */
-    int *tids;                       /* ID per each thread */
-    npy_intp gindex;                 /* global index for all threads */
-    int init_sentinels_done;         /* sentinels initialized? */
-    int giveup;                      /* should parallel code giveup? */
-    int force_serial;                /* force serial code instead of parallel? */
-    int pid;                         /* the PID for this process */
-
-    /* Synchronization variables for threadpool state */
-    pthread_mutex_t count_mutex;
-    int count_threads;
-    int barrier_passed;         /* indicates if the thread pool's thread barrier 
-                                   is unlocked and ready for the VM to process.*/
-    pthread_mutex_t count_threads_mutex;
-    pthread_cond_t count_threads_cv;
-
-    /* Mutual exclusion for access to global thread params (th_params) */
-    pthread_mutex_t parallel_mutex;
+    int nthreads;                    /* threads of a call by default */
+    int pid;                         /* the PID the pools were started in */
+    /* Pools not running a job.  Every call running in parallel checks one
+       out for itself, so the list is only touched with the GIL held. */
+    thread_pool *idle_pools;
 
     global_state() {
         nthreads = 1;
-        init_threads_done = 0;
-        barrier_passed = 0;
-        end_threads = 0;
         pid = 0;
+        idle_pools = NULL;
     }
 };
 
 extern global_state gs;
+extern long global_max_threads;
 
 int numexpr_set_nthreads(int nthreads_new);
+thread_pool *acquire_pool(int nthreads);
+void release_pool(thread_pool *pool);
 
 #endif // NUMEXPR_MODULE_HPP
@@ -8,7 +8,7 @@
 #  rights to use.
 ####################################################################
 
-from typing import Optional, Dict
+from typing import Optional, Dict, Sequence, Tuple, Union
 import __future__
 import sys
 import os
@@ -28,12 +28,14 @@ double = numpy.double
 int_ = numpy.int32
 long_ = numpy.int64
 
+complex64 = numpy.complex64
+
 typecode_to_kind = {'b': 'bool', 'i': 'int', 'l': 'long', 'f': 'float', 'd': 'double', 
-                    'c': 'complex', 'n': 'none', 's': 'str'}
+                    'F': 'complex64', 'c': 'complex', 'n': 'none', 's': 'str'}
 kind_to_typecode = {'bool': 'b', 'int': 'i', 'long': 'l', 'float': 'f', 'double': 'd',
-                    'complex': 'c', 'bytes': 's', 'str': 's', 'none': 'n'}
+                    'complex64': 'F', 'complex': 'c', 'bytes': 's', 'str': 's', 'none': 'n'}
 type_to_typecode = {bool: 'b', int_: 'i', long_: 'l', float: 'f',
-                    double: 'd', complex: 'c', bytes: 's', str: 's'}
+                    complex64: 'F', double: 'd', complex: 'c', bytes: 's', str: 's'}
 type_to_kind = expressions.type_to_kind
 kind_to_type = expressions.kind_to_type
 default_type = kind_to_type[expressions.default_kind]
@@ -69,7 +71,10 @@ vml_functions = [
     "fmod",
     "ceil",
     "floor",
-    "erf"
+    "erf",
+    "erfinv",
+    "ndtr",
+    "ndtri",
     ]
 
 
@@ -164,12 +169,13 @@ def sigPerms(s):
     """Generate all possible signatures derived by upcasting the given
     signature.
     """
-    codes = 'bilfdc'
+    # complex64 ('F') can go up to complex128 but not to double
+    upcasts = {'b': 'bilfFdc', 'i': 'ilfFdc', 'l': 'lfFdc', 'f': 'fFdc',
+               'F': 'Fc', 'd': 'dc', 'c': 'c'}
     if not s:
         yield ''
-    elif s[0] in codes:
-        start = codes.index(s[0])
-        for x in codes[start:]:
+    elif s[0] in upcasts:
+        for x in upcasts[s[0]]:
             for y in sigPerms(s[1:]):
                 yield x + y
     elif s[0] == 's':  # numbers shall not be cast to strings
@@ -432,17 +438,16 @@ def optimizeTemporariesAllocation(ast):
 
     node_regs = dict((n, set(c.reg for c in n.children if c.reg.temporary))
                      for n in nodes)
-    if nodes and nodes[-1] is not ast:
-        nodes_to_check = nodes + [ast]
-    else:
-        nodes_to_check = nodes
+    # ops writing to an output register read temporaries as well: the root
+    # of a single output, every output of several
+    nodes_to_check = [n for n in ast.postorderWalk() if n.children]
     for n in nodes_to_check:
         for c in n.children:
             if c.reg.temporary:
                 users_of[c.reg].add(n)
 
     unused = dict([(tc, set()) for tc in scalar_constant_kinds])
-    for n in nodes:
+    for n in nodes_to_check:
         for c in n.children:
             reg = c.reg
             if reg.temporary:
@@ -450,7 +455,7 @@ def optimizeTemporariesAllocation(ast):
                 users.discard(n)
                 if not users:
                     unused[reg.node.astKind].add(reg)
-        if unused[n.astKind]:
+        if n.reg.temporary and unused[n.astKind]:
             reg = unused[n.astKind].pop()
             users_of[reg] = users_of[n.reg]
             n.reg = reg
@@ -519,7 +524,7 @@ def compileThreeAddrForm(program):
             return bytes([reg.n])
 
     def quadrupleToString(opcode, store, a1=None, a2=None):
-        cop = chr(interpreter.opcodes[opcode]).encode('ascii')
+        cop = bytes([interpreter.opcodes[opcode]])
         cs = nToChr(store)
         ca1 = nToChr(a1)
         ca2 = nToChr(a2)
@@ -567,27 +572,81 @@ def getContext(kwargs, _frame_depth=1):
     return context
 
 
+def isMultipleOutputs(ex):
+    """
+    Whether `ex` is a sequence of expressions, compiled into a single
+    program with one output per expression.
+    """
+    return isinstance(ex, (list, tuple))
+
+
+def outputsToAST(asts):
+    """
+    Join the ASTs of several outputs under one root node, which is not an
+    op itself.  The first output comes last, so that its op ends the program
+    (the VM takes the type of output 0 from the last opcode).
+    """
+    root = ASTNode('outputs', children=list(asts[1:]) + [asts[0]])
+    # never a temporary and never numbered, see setRegisterNumbersForTemporaries
+    root.reg = Register(root)
+    root.reg.n = -1
+    return root
+
+
+def copyAliasedOutputs(outputs, aliases):
+    """
+    Outputs whose whole tree was eliminated as a duplicate become a copy of
+    the original result, they need a register of their own.
+    """
+    for a in outputs:
+        if a.astType == 'alias':
+            target = ASTNode('alias', a.astKind, a.value)
+            aliases[:] = [x for x in aliases if x is not a] + [target]
+            a.astType = 'op'
+            a.value = ('copy_' + 2 * a.typecode()).encode('ascii')
+            a.children = (target,)
+
+
 def precompile(ex, signature=(), context={}, sanitize: bool=True):
     """
     Compile the expression to an intermediate form.
+
+    `ex` can also be a sequence of expressions. They are compiled into one
+    program with one output each and common subexpressions are shared.
     """
     types = dict(signature)
     input_order = [name for (name, type_) in signature]
 
-    if isinstance(ex, str):
-        ex = stringToExpression(ex, types, context, sanitize)
+    multiple = isMultipleOutputs(ex)
+    outputs = []
+    for ex in (ex if multiple else [ex]):
+        if isinstance(ex, str):
+            ex = stringToExpression(ex, types, context, sanitize)
 
-    # the AST is like the expression, but the node objects don't have
-    # any odd interpretations
+        # the AST is like the expression, but the node objects don't have
+        # any odd interpretations
 
-    ast = expressionToAST(ex)
+        ast = expressionToAST(ex)
 
-    if ex.astType != 'op':
-        ast = ASTNode('op', value='copy', astKind=ex.astKind, children=(ast,))
+        if ex.astType != 'op':
+            ast = ASTNode('op', value='copy', astKind=ex.astKind, children=(ast,))
 
-    ast = typeCompileAst(ast)
+        outputs.append(typeCompileAst(ast))
+
+    if multiple:
+        if not outputs:
+            raise ValueError("no expressions to compile")
+        for ast in outputs:
+            if isReduction(ast):
+                raise ValueError("a reduction can only have one output")
+            if ast.astKind == 'bytes':
+                raise ValueError("strings can only be a single output")
+        ast = outputsToAST(outputs)
+    else:
+        ast = outputs[0]
 
     aliases = collapseDuplicateSubtrees(ast)
+    copyAliasedOutputs(outputs, aliases)
 
     assignLeafRegisters(ast.allOf('raw'), Immediate)
     assignLeafRegisters(ast.allOf('variable', 'constant'), Register)
@@ -600,17 +659,26 @@ def precompile(ex, signature=(), context={}, sanitize: bool=True):
     input_order = getInputOrder(ast, input_order)
     constants_order, constants = getConstants(ast)
 
-    if isReduction(ast):
+    if multiple:
+        # no output register may be reused for a later temporary
+        for a in outputs:
+            a.reg.temporary = False
+    elif isReduction(ast):
         ast.reg.temporary = False
 
     optimizeTemporariesAllocation(ast)
 
-    ast.reg.temporary = False
+    for a in outputs:
+        a.reg.temporary = False
+
+    # output 0 is register 0, the others follow the inputs and are
+    # passed to the VM as part of the signature
     r_output = 0
-    ast.reg.n = 0
+    outputs[0].reg.n = r_output
 
     r_inputs = r_output + 1
-    r_constants = setOrderedRegisterNumbers(input_order, r_inputs)
+    r_outputs = setOrderedRegisterNumbers(input_order, r_inputs)
+    r_constants = setOrderedRegisterNumbers(outputs[1:], r_outputs)
     r_temps = setOrderedRegisterNumbers(constants_order, r_constants)
     r_end, tempsig = setRegisterNumbersForTemporaries(ast, r_temps)
 
@@ -618,18 +686,25 @@ def precompile(ex, signature=(), context={}, sanitize: bool=True):
     input_names = tuple([a.value for a in input_order])
     signature = ''.join(type_to_typecode[types.get(x, default_type)]
                         for x in input_names)
+    signature += ''.join(a.typecode() for a in outputs[1:])
     return threeAddrProgram, signature, tempsig, constants, input_names
 
 
-def NumExpr(ex,  signature=(), sanitize: bool=True, **kwargs):
+def NumExpr(ex,  signature=(), sanitize: bool=True,
+            block_size: Optional[int] = None, **kwargs):
     """
     Compile an expression built using E.<variable> variables to a function.
 
-    ex can also be specified as a string "2*a+3*b".
+    ex can also be specified as a string "2*a+3*b", or as a list of them
+    for a function with several outputs, which returns a tuple of arrays
+    (also for a list of one expression).
 
     The order of the input variables and their types can be specified using the
     signature parameter, which is a list of (name, type) pairs.
 
+    block_size is the number of elements the virtual machine processes at
+    once, `__BLOCK_SIZE1__` by default and at most `MAX_BLOCK_SIZE`.
+
     Returns a `NumExpr` object containing the compiled function.
     """
 
@@ -640,9 +715,15 @@ def NumExpr(ex,  signature=(), sanitize: bool=True, **kwargs):
     context = getContext(kwargs, _frame_depth=_frame_depth)
     threeAddrProgram, inputsig, tempsig, constants, input_names = precompile(ex, signature, context, sanitize=sanitize)
     program = compileThreeAddrForm(threeAddrProgram)
+    multiple = isMultipleOutputs(ex)
+    n_outputs = len(ex) if multiple else 1
+    if block_size is None:
+        block_size = interpreter.__BLOCK_SIZE1__
     return interpreter.NumExpr(inputsig.encode('ascii'),
                                tempsig.encode('ascii'),
-                               program, constants, input_names)
+                               program, constants, input_names,
+                               n_outputs=n_outputs, block_size=block_size,
+                               multiple=multiple)
 
 
 def disassemble(nex):
@@ -674,8 +755,10 @@ def disassemble(nex):
         if code != b'n':
             if arg == 0:
                 return b'r0'
-            elif arg < r_constants:
+            elif arg <= len(nex.input_names):
                 return ('r%d[%s]' % (arg, nex.input_names[arg - 1])).encode('ascii')
+            elif arg < r_constants:
+                return ('r%d' % (arg,)).encode('ascii')
             elif arg < r_temps:
                 return ('c%d[%s]' % (arg, nex.constants[arg - r_constants])).encode('ascii')
             else:
@@ -711,7 +794,9 @@ def getType(a):
             return double  # ``double`` is for floats of more than 32 bits
         return float
     if kind == 'c':
-        return complex
+        if a.dtype.itemsize > 8:
+            return complex
+        return complex64
     if kind == 'S':
         return bytes
     if kind == 'U':
@@ -720,8 +805,13 @@ def getType(a):
 
 
 def getExprNames(text, context, sanitize: bool=True):
-    ex = stringToExpression(text, {}, context, sanitize)
-    ast = expressionToAST(ex)
+    if isMultipleOutputs(text):
+        ast = ASTNode('outputs', children=[
+            expressionToAST(stringToExpression(t, {}, context, sanitize))
+            for t in text])
+    else:
+        ex = stringToExpression(text, {}, context, sanitize)
+        ast = expressionToAST(ex)
     input_order = getInputOrder(ast, None)
     #try to figure out if vml operations are used by expression
     if not use_vml:
@@ -776,12 +866,12 @@ def getArguments(names, local_dict=None, global_dict=None, _frame_depth: int=2):
 # Dictionaries for caching variable names and compiled expressions
 _names_cache = CacheDict(256)
 _numexpr_cache = CacheDict(256)
-_numexpr_last = {}
-evaluate_lock = threading.Lock()
+# The last validated expression of each thread, for re_evaluate
+_numexpr_last = threading.local()
 
 # MAYBE: decorate this function to add attributes instead of having the 
 # _numexpr_last dictionary?
-def validate(ex: str, 
+def validate(ex: Union[str, Sequence[str]], 
              local_dict: Optional[Dict] = None, 
              global_dict: Optional[Dict] = None,
              out: numpy.ndarray = None, 
@@ -789,6 +879,7 @@ def validate(ex: str,
              casting: str = 'safe', 
              _frame_depth: int = 2,
              sanitize: Optional[bool] = None,
+             num_threads: Optional[int] = None,
              **kwargs) -> Optional[Exception]:
     r"""
     Validate a NumExpr expression with the given `local_dict` or `locals()`.
@@ -798,12 +889,17 @@ def validate(ex: str,
 
     Parameters
     ----------
-    ex: str
+    ex: str or sequence of str
         a string forming an expression, like "2*a+3*b". The values for "a"
         and "b" will by default be taken from the calling function's frame
         (through use of sys._getframe()). Alternatively, they can be specified
         using the 'local_dict' or 'global_dict' arguments.
 
+        A list of expressions, like ["a*b", "a+b"], is evaluated in a single
+        pass with one output per expression. Inputs are read once per block
+        and common subexpressions are computed once. Reductions can not be
+        part of such a list.
+
     local_dict: dictionary, optional
         A dictionary that replaces the local operands in current frame.
 
@@ -816,6 +912,9 @@ def validate(ex: str,
         actual outcome of the computation.  Useful for avoiding unnecessary
         new array allocations.
 
+        With several expressions, a sequence with one array (or None, to
+        allocate it) per expression.  The result is then a tuple of arrays.
+
     order: {'C', 'F', 'A', or 'K'}, optional
         Controls the iteration order for operands. 'C' means C order, 'F'
         means Fortran order, 'A' means 'F' order if all the arrays are
@@ -846,6 +945,11 @@ def validate(ex: str,
         `NUMEXPR_SANITIZE=0` is set, in which case the default is `False`. 
         Nominally this can be set via `os.environ` before `import numexpr`.
 
+    num_threads: int, optional
+        The number of threads for this expression instead of the one set
+        with `set_num_threads`. Expressions evaluated from different Python
+        threads run concurrently, each with threads of its own.
+
     _frame_depth: int
         The calling frame depth. Unless you are a NumExpr developer you should 
         not set this value.
@@ -854,11 +958,13 @@ def validate(ex: str,
     ----
     
     """
-    global _numexpr_last
-
     try:
         
-        if not isinstance(ex, str):
+        if isMultipleOutputs(ex):
+            if not all(isinstance(e, str) for e in ex):
+                raise ValueError("must specify expressions as strings")
+            ex = tuple(ex)
+        elif not isinstance(ex, str):
             raise ValueError("must specify expression as a string")
         
         if sanitize is None:
@@ -870,9 +976,11 @@ def validate(ex: str,
         # Get the names for this expression
         context = getContext(kwargs)
         expr_key = (ex, tuple(sorted(context.items())))
-        if expr_key not in _names_cache:
-            _names_cache[expr_key] = getExprNames(ex, context, sanitize=sanitize)
-        names, ex_uses_vml = _names_cache[expr_key]
+        try:
+            names, ex_uses_vml = _names_cache[expr_key]
+        except KeyError:
+            names, ex_uses_vml = _names_cache[expr_key] = getExprNames(
+                ex, context, sanitize=sanitize)
         arguments = getArguments(names, local_dict, global_dict, _frame_depth=_frame_depth)
 
         # Create a signature
@@ -886,32 +994,38 @@ def validate(ex: str,
         except KeyError:
             compiled_ex = _numexpr_cache[numexpr_key] = NumExpr(ex, signature, sanitize=sanitize, **context)
         kwargs = {'out': out, 'order': order, 'casting': casting,
-                'ex_uses_vml': ex_uses_vml}
-        _numexpr_last = dict(ex=compiled_ex, argnames=names, kwargs=kwargs)
+                'num_threads': num_threads, 'ex_uses_vml': ex_uses_vml}
+        _numexpr_last.last = dict(ex=compiled_ex, argnames=names, kwargs=kwargs)
     except Exception as e:
         return e
     return None
 
-def evaluate(ex: str, 
+def evaluate(ex: Union[str, Sequence[str]], 
              local_dict: Optional[Dict] = None, 
              global_dict: Optional[Dict] = None,
              out: numpy.ndarray = None, 
              order: str = 'K', 
              casting: str = 'safe', 
              sanitize: Optional[bool] = None,
+             num_threads: Optional[int] = None,
              _frame_depth: int = 3,
-             **kwargs) -> numpy.ndarray:
+             **kwargs) -> Union[numpy.ndarray, Tuple[numpy.ndarray, ...]]:
     r"""
     Evaluate a simple array expression element-wise using the virtual machine.
 
     Parameters
     ----------
-    ex: str
+    ex: str or sequence of str
         a string forming an expression, like "2*a+3*b". The values for "a"
         and "b" will by default be taken from the calling function's frame
         (through use of sys._getframe()). Alternatively, they can be specified
         using the 'local_dict' or 'global_dict' arguments.
 
+        A list of expressions, like ["a*b", "a+b"], is evaluated in a single
+        pass with one output per expression. Inputs are read once per block
+        and common subexpressions are computed once. Reductions can not be
+        part of such a list.
+
     local_dict: dictionary, optional
         A dictionary that replaces the local operands in current frame.
 
@@ -924,6 +1038,9 @@ def evaluate(ex: str,
         actual outcome of the computation.  Useful for avoiding unnecessary
         new array allocations.
 
+        With several expressions, a sequence with one array (or None, to
+        allocate it) per expression.  The result is then a tuple of arrays.
+
     order: {'C', 'F', 'A', or 'K'}, optional
         Controls the iteration order for operands. 'C' means C order, 'F'
         means Fortran order, 'A' means 'F' order if all the arrays are
@@ -954,6 +1071,11 @@ def evaluate(ex: str,
         `NUMEXPR_SANITIZE=0` is set, in which case the default is `False`. 
         Nominally this can be set via `os.environ` before `import numexpr`.
 
+    num_threads: int, optional
+        The number of threads for this expression instead of the one set
+        with `set_num_threads`. Expressions evaluated from different Python
+        threads run concurrently, each with threads of its own.
+
     _frame_depth: int
         The calling frame depth. Unless you are a NumExpr developer you should 
         not set this value.
@@ -970,7 +1092,8 @@ def evaluate(ex: str,
     # `getArguments`
     e = validate(ex, local_dict=local_dict, global_dict=global_dict, 
                  out=out, order=order, casting=casting, 
-                 _frame_depth=_frame_depth, sanitize=sanitize, **kwargs)
+                 _frame_depth=_frame_depth, sanitize=sanitize,
+                 num_threads=num_threads, **kwargs)
     if e is None:
         return re_evaluate(local_dict=local_dict, global_dict=global_dict, _frame_depth=_frame_depth)
     else:
@@ -981,6 +1104,7 @@ def re_evaluate(local_dict: Optional[Dict] = None,
                 _frame_depth: int=2) -> numpy.ndarray:
     """
     Re-evaluate the previous executed array expression without any check.
+    The previous expression is the last one validated in the calling thread.
 
     This is meant for accelerating loops that are re-evaluating the same
     expression repeatedly without changing anything else than the operands.
@@ -994,14 +1118,12 @@ def re_evaluate(local_dict: Optional[Dict] = None,
         The calling frame depth. Unless you are a NumExpr developer you should 
         not set this value.
     """
-    global _numexpr_last
-
     try:
-        compiled_ex = _numexpr_last['ex']
-    except KeyError:
+        last = _numexpr_last.last
+    except AttributeError:
         raise RuntimeError("A previous evaluate() execution was not found, please call `validate` or `evaluate` once before `re_evaluate`")
-    argnames = _numexpr_last['argnames']
+    compiled_ex = last['ex']
+    argnames = last['argnames']
     args = getArguments(argnames, local_dict, global_dict, _frame_depth=_frame_depth)
-    kwargs = _numexpr_last['kwargs']
-    with evaluate_lock:
-        return compiled_ex(*args, **kwargs)
+    kwargs = last['kwargs']
+    return compiled_ex(*args, **kwargs)
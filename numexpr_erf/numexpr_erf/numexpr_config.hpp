@@ -19,6 +19,15 @@
 #define BLOCK_SIZE1 1024
 #endif
 
+// Programs can be compiled for other block sizes, up to this many elements.
+// BLOCK_SIZE1 times 1/4, 1/2, 2, 4 and 8 run as fast as BLOCK_SIZE1 itself,
+// the VM is compiled for each of them.
+#define MAX_BLOCK_SIZE (64*BLOCK_SIZE1)
+
+// Full reductions accumulate one partial per chunk of this many elements
+// and combine the partials pairwise, independent of the number of threads
+#define REDUCTION_CHUNK (4*BLOCK_SIZE1)
+
 // The default threadpool size. It's prefer that the user set this via an 
 // environment variable, "NUMEXPR_MAX_THREADS"
 #define DEFAULT_MAX_THREADS 64
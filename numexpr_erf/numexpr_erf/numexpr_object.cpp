@@ -23,10 +23,11 @@ size_from_char(char c)
         case 'l': return sizeof(long long);
         case 'f': return sizeof(float);
         case 'd': return sizeof(double);
+        case 'F': return 2*sizeof(float);
         case 'c': return 2*sizeof(double);
         case 's': return 0;  /* strings are ok but size must be computed */
         default:
-            PyErr_SetString(PyExc_TypeError, "signature value not in 'bilfdcs'");
+            PyErr_SetString(PyExc_TypeError, "signature value not in 'bilfdFcs'");
             return -1;
     }
 }
@@ -76,6 +77,9 @@ NumExpr_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
         self->n_inputs = 0;
         self->n_constants = 0;
         self->n_temps = 0;
+        self->n_outputs = 1;
+        self->multiple = 0;
+        self->block_size = BLOCK_SIZE1;
 #undef INIT_WITH
     }
     return (PyObject *)self;
@@ -87,7 +91,8 @@ static int
 NumExpr_init(NumExprObject *self, PyObject *args, PyObject *kwds)
 {
     int i, j, mem_offset;
-    int n_inputs, n_constants, n_temps;
+    int n_inputs, n_constants, n_temps, n_outputs = 1, multiple = 0;
+    int block_size = BLOCK_SIZE1;
     PyObject *signature = NULL, *tempsig = NULL, *constsig = NULL;
     PyObject *fullsig = NULL, *program = NULL, *constants = NULL;
     PyObject *input_names = NULL, *o_constants = NULL;
@@ -98,19 +103,36 @@ NumExpr_init(NumExprObject *self, PyObject *args, PyObject *kwds)
     int rawmemsize;
     static char *kwlist[] = {CHARP("signature"), CHARP("tempsig"),
 			     CHARP("program"),  CHARP("constants"),
-			     CHARP("input_names"), NULL};
+			     CHARP("input_names"), CHARP("n_outputs"),
+			     CHARP("block_size"), CHARP("multiple"), NULL};
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "SSS|OO", kwlist,
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "SSS|OOiip", kwlist,
                                      &signature,
                                      &tempsig,
                                      &program, &o_constants,
-                                     &input_names)) {
+                                     &input_names, &n_outputs,
+                                     &block_size, &multiple)) {
+        return -1;
+    }
+    // a program with several outputs always is one
+    multiple = multiple || n_outputs > 1;
+
+    if (block_size < 1 || block_size > MAX_BLOCK_SIZE) {
+        PyErr_Format(PyExc_ValueError,
+                     "block_size must be between 1 and %d", MAX_BLOCK_SIZE);
         return -1;
     }
 
     n_inputs = (int)PyBytes_Size(signature);
     n_temps = (int)PyBytes_Size(tempsig);
 
+    /* The outputs after the first one are part of the signature */
+    if (n_outputs < 1 || n_outputs > n_inputs + 1) {
+        PyErr_SetString(PyExc_ValueError,
+                        "n_outputs must be between 1 and len(signature)+1");
+        return -1;
+    }
+
     if (o_constants) {
         if (!PySequence_Check(o_constants) ) {
                 PyErr_SetString(PyExc_TypeError, "constants must be a sequence");
@@ -165,6 +187,12 @@ NumExpr_init(NumExprObject *self, PyObject *args, PyObject *kwds)
                 itemsizes[i] = size_from_char('d');
                 continue;
             }
+            /* Same for the Complex64 ones, before the generic complex check */
+            if (PyArray_IsScalar(o, Complex64)) {
+                PyBytes_AS_STRING(constsig)[i] = 'F';
+                itemsizes[i] = size_from_char('F');
+                continue;
+            }
             if (PyComplex_Check(o)) {
                 PyBytes_AS_STRING(constsig)[i] = 'c';
                 itemsizes[i] = size_from_char('c');
@@ -175,7 +203,7 @@ NumExpr_init(NumExprObject *self, PyObject *args, PyObject *kwds)
                 itemsizes[i] = (int)PyBytes_GET_SIZE(o);
                 continue;
             }
-            PyErr_SetString(PyExc_TypeError, "constants must be of type bool/int/long/float/double/complex/bytes");
+            PyErr_SetString(PyExc_TypeError, "constants must be of type bool/int/long/float/double/complex64/complex/bytes");
             Py_DECREF(constsig);
             Py_DECREF(constants);
             PyMem_Del(itemsizes);
@@ -210,7 +238,7 @@ NumExpr_init(NumExprObject *self, PyObject *args, PyObject *kwds)
     rawmemsize = 0;
     for (i = 0; i < n_constants; i++)
         rawmemsize += itemsizes[i];
-    rawmemsize *= BLOCK_SIZE1;
+    rawmemsize *= block_size;
 
     mem = PyMem_New(char *, 1 + n_inputs + n_constants + n_temps);
     rawmem = PyMem_New(char, rawmemsize);
@@ -229,7 +257,8 @@ NumExpr_init(NumExprObject *self, PyObject *args, PyObject *kwds)
     }
     /*
        0                                                  -> output
-       [1, n_inputs+1)                                    -> inputs
+       [1, n_inputs+1)                                    -> inputs (the
+                                         last n_outputs-1 are more outputs)
        [n_inputs+1, n_inputs+n_consts+1)                  -> constants
        [n_inputs+n_consts+1, n_inputs+n_consts+n_temps+1) -> temps
     */
@@ -239,25 +268,25 @@ NumExpr_init(NumExprObject *self, PyObject *args, PyObject *kwds)
         char c = PyBytes_AS_STRING(constsig)[i];
         int size = itemsizes[i];
         mem[i+n_inputs+1] = rawmem + mem_offset;
-        mem_offset += BLOCK_SIZE1 * size;
+        mem_offset += block_size * size;
         memsteps[i+n_inputs+1] = memsizes[i+n_inputs+1] = size;
         /* fill in the constants */
         if (c == 'b') {
             char *bmem = (char*)mem[i+n_inputs+1];
             char value = (char)PyLong_AsLong(PyTuple_GET_ITEM(constants, i));
-            for (j = 0; j < BLOCK_SIZE1; j++) {
+            for (j = 0; j < block_size; j++) {
                 bmem[j] = value;
             }
         } else if (c == 'i') {
             int *imem = (int*)mem[i+n_inputs+1];
             int value = (int)PyLong_AsLong(PyTuple_GET_ITEM(constants, i));
-            for (j = 0; j < BLOCK_SIZE1; j++) {
+            for (j = 0; j < block_size; j++) {
                 imem[j] = value;
             }
         } else if (c == 'l') {
             long long *lmem = (long long*)mem[i+n_inputs+1];
             long long value = PyLong_AsLongLong(PyTuple_GET_ITEM(constants, i));
-            for (j = 0; j < BLOCK_SIZE1; j++) {
+            for (j = 0; j < block_size; j++) {
                 lmem[j] = value;
             }
         } else if (c == 'f') {
@@ -266,26 +295,34 @@ NumExpr_init(NumExprObject *self, PyObject *args, PyObject *kwds)
             float *fmem = (float*)mem[i+n_inputs+1];
             float value = PyArrayScalar_VAL(PyTuple_GET_ITEM(constants, i),
                                             Float);
-            for (j = 0; j < BLOCK_SIZE1; j++) {
+            for (j = 0; j < block_size; j++) {
                 fmem[j] = value;
             }
         } else if (c == 'd') {
             double *dmem = (double*)mem[i+n_inputs+1];
             double value = PyFloat_AS_DOUBLE(PyTuple_GET_ITEM(constants, i));
-            for (j = 0; j < BLOCK_SIZE1; j++) {
+            for (j = 0; j < block_size; j++) {
                 dmem[j] = value;
             }
+        } else if (c == 'F') {
+            float *zmem = (float*)mem[i+n_inputs+1];
+            npy_cfloat value = PyArrayScalar_VAL(PyTuple_GET_ITEM(constants, i),
+                                                 CFloat);
+            for (j = 0; j < 2*block_size; j+=2) {
+                zmem[j] = value.real;
+                zmem[j+1] = value.imag;
+            }
         } else if (c == 'c') {
             double *cmem = (double*)mem[i+n_inputs+1];
             Py_complex value = PyComplex_AsCComplex(PyTuple_GET_ITEM(constants, i));
-            for (j = 0; j < 2*BLOCK_SIZE1; j+=2) {
+            for (j = 0; j < 2*block_size; j+=2) {
                 cmem[j] = value.real;
                 cmem[j+1] = value.imag;
             }
         } else if (c == 's') {
             char *smem = (char*)mem[i+n_inputs+1];
             char *value = PyBytes_AS_STRING(PyTuple_GET_ITEM(constants, i));
-            for (j = 0; j < size*BLOCK_SIZE1; j+=size) {
+            for (j = 0; j < size*block_size; j+=size) {
                 memcpy(smem + j, value, size);
             }
         }
@@ -339,6 +376,9 @@ NumExpr_init(NumExprObject *self, PyObject *args, PyObject *kwds)
     self->n_inputs = n_inputs;
     self->n_constants = n_constants;
     self->n_temps = n_temps;
+    self->n_outputs = n_outputs;
+    self->multiple = multiple;
+    self->block_size = block_size;
 
     #undef REPLACE_OBJ
     #undef INCREF_REPLACE_OBJ
@@ -362,6 +402,9 @@ static PyMemberDef NumExpr_members[] = {
     {CHARP("constants"), T_OBJECT_EX, offsetof(NumExprObject, constants),
      READONLY, NULL},
     {CHARP("input_names"), T_OBJECT, offsetof(NumExprObject, input_names), 0, NULL},
+    {CHARP("n_outputs"), T_INT, offsetof(NumExprObject, n_outputs), READONLY, NULL},
+    {CHARP("multiple"), T_INT, offsetof(NumExprObject, multiple), READONLY, NULL},
+    {CHARP("block_size"), T_INT, offsetof(NumExprObject, block_size), READONLY, NULL},
     {NULL},
 };
 
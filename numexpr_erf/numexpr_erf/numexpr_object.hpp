@@ -27,6 +27,11 @@ struct NumExprObject
     int  n_inputs;
     int  n_constants;
     int  n_temps;
+    int  n_outputs;         /* the last n_outputs-1 signature entries are
+                               outputs, not inputs */
+    int  multiple;          /* compiled from a list of expressions: `out` is
+                               a sequence and the result a tuple */
+    int  block_size;        /* elements per block of the VM */
 };
 
 extern PyTypeObject NumExprType;
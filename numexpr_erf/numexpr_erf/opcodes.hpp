@@ -12,9 +12,13 @@ OPCODE(n, enum_name, exported, return_type, arg1_type, arg2_type, arg3_type)
 
 `exported` is NULL if the opcode shouldn't exported by the Python module.
 
-Types are Tb, Ti, Tl, Tf, Td, Tc, Ts, Tn, and T0; these symbols should be
+Types are Tb, Ti, Tl, Tf, Td, Tc, TF, Ts, Tn, and T0; these symbols should be
 #defined to whatever is needed. (T0 is the no-such-arg type.)
 
+TF is complex64 ('F' in the exported signatures, Z in the enum names).
+Reductions must stay at the end of the table, the interpreter tells them
+apart from elementwise opcodes by their number.
+
 */
 OPCODE(0, OP_NOOP, "noop", T0, T0, T0, T0)
 
@@ -145,35 +149,69 @@ OPCODE(104, OP_WHERE_BBBB, "where_bbbb", Tb, Tb, Tb, Tb)
 
 OPCODE(105, OP_CONTAINS_BSS, "contains_bss", Tb, Ts, Ts, T0)
 
-OPCODE(106, OP_REDUCTION, NULL, T0, T0, T0, T0)
+OPCODE(106, OP_EQ_BZZ, "eq_bFF", Tb, TF, TF, T0)
+OPCODE(107, OP_NE_BZZ, "ne_bFF", Tb, TF, TF, T0)
+
+OPCODE(108, OP_CAST_ZI, "cast_Fi", TF, Ti, T0, T0)
+OPCODE(109, OP_CAST_ZL, "cast_Fl", TF, Tl, T0, T0)
+OPCODE(110, OP_CAST_ZF, "cast_Ff", TF, Tf, T0, T0)
+OPCODE(111, OP_CAST_CZ, "cast_cF", Tc, TF, T0, T0)
+OPCODE(112, OP_ONES_LIKE_ZZ, "ones_like_FF", TF, T0, T0, T0)
+OPCODE(113, OP_COPY_ZZ, "copy_FF", TF, TF, T0, T0)
+OPCODE(114, OP_NEG_ZZ, "neg_FF", TF, TF, T0, T0)
+OPCODE(115, OP_ADD_ZZZ, "add_FFF", TF, TF, TF, T0)
+OPCODE(116, OP_SUB_ZZZ, "sub_FFF", TF, TF, TF, T0)
+OPCODE(117, OP_MUL_ZZZ, "mul_FFF", TF, TF, TF, T0)
+OPCODE(118, OP_DIV_ZZZ, "div_FFF", TF, TF, TF, T0)
+OPCODE(119, OP_WHERE_ZBZZ, "where_FbFF", TF, Tb, TF, TF)
+OPCODE(120, OP_FUNC_ZZN, "func_FFn", TF, TF, Tn, T0)
+OPCODE(121, OP_FUNC_ZZZN, "func_FFFn", TF, TF, TF, Tn)
+
+OPCODE(122, OP_REAL_FZ, "real_fF", Tf, TF, T0, T0)
+OPCODE(123, OP_IMAG_FZ, "imag_fF", Tf, TF, T0, T0)
+OPCODE(124, OP_COMPLEX_ZFF, "complex_Fff", TF, Tf, Tf, T0)
+
+OPCODE(125, OP_SINCOS_CD, "sincos_cd", Tc, Td, T0, T0)
+OPCODE(126, OP_SINCOS_ZF, "sincos_Ff", TF, Tf, T0, T0)
+
+/* FFT wavenumbers of the element's position in the iteration shape; the
+   last argument of fftfreq is the axis */
+OPCODE(127, OP_FFTFREQ_FIFN, "fftfreq_fifn", Tf, Ti, Tf, Tn)
+OPCODE(128, OP_FFTFREQ_DIDN, "fftfreq_didn", Td, Ti, Td, Tn)
+OPCODE(129, OP_KMAG2_FIF, "kmag2_fif", Tf, Ti, Tf, T0)
+OPCODE(130, OP_KMAG2_DID, "kmag2_did", Td, Ti, Td, T0)
+
+OPCODE(131, OP_REDUCTION, NULL, T0, T0, T0, T0)
 
 /* Last argument in a reduction is the axis of the array the
    reduction should be applied along. */
 
-OPCODE(107, OP_SUM_IIN, "sum_iin", Ti, Ti, Tn, T0)
-OPCODE(108, OP_SUM_LLN, "sum_lln", Tl, Tl, Tn, T0)
-OPCODE(109, OP_SUM_FFN, "sum_ffn", Tf, Tf, Tn, T0)
-OPCODE(110, OP_SUM_DDN, "sum_ddn", Td, Td, Tn, T0)
-OPCODE(111, OP_SUM_CCN, "sum_ccn", Tc, Tc, Tn, T0)
-
-OPCODE(112, OP_PROD, NULL, T0, T0, T0, T0)
-OPCODE(113, OP_PROD_IIN, "prod_iin", Ti, Ti, Tn, T0)
-OPCODE(114, OP_PROD_LLN, "prod_lln", Tl, Tl, Tn, T0)
-OPCODE(115, OP_PROD_FFN, "prod_ffn", Tf, Tf, Tn, T0)
-OPCODE(116, OP_PROD_DDN, "prod_ddn", Td, Td, Tn, T0)
-OPCODE(117, OP_PROD_CCN, "prod_ccn", Tc, Tc, Tn, T0)
-
-OPCODE(118, OP_MIN, NULL, T0, T0, T0, T0)
-OPCODE(119, OP_MIN_IIN, "min_iin", Ti, Ti, Tn, T0)
-OPCODE(120, OP_MIN_LLN, "min_lln", Tl, Tl, Tn, T0)
-OPCODE(121, OP_MIN_FFN, "min_ffn", Tf, Tf, Tn, T0)
-OPCODE(122, OP_MIN_DDN, "min_ddn", Td, Td, Tn, T0)
-
-OPCODE(123, OP_MAX, NULL, T0, T0, T0, T0)
-OPCODE(124, OP_MAX_IIN, "max_iin", Ti, Ti, Tn, T0)
-OPCODE(125, OP_MAX_LLN, "max_lln", Tl, Tl, Tn, T0)
-OPCODE(126, OP_MAX_FFN, "max_ffn", Tf, Tf, Tn, T0)
-OPCODE(127, OP_MAX_DDN, "max_ddn", Td, Td, Tn, T0)
+OPCODE(132, OP_SUM_IIN, "sum_iin", Ti, Ti, Tn, T0)
+OPCODE(133, OP_SUM_LLN, "sum_lln", Tl, Tl, Tn, T0)
+OPCODE(134, OP_SUM_FFN, "sum_ffn", Tf, Tf, Tn, T0)
+OPCODE(135, OP_SUM_DDN, "sum_ddn", Td, Td, Tn, T0)
+OPCODE(136, OP_SUM_CCN, "sum_ccn", Tc, Tc, Tn, T0)
+OPCODE(137, OP_SUM_ZZN, "sum_FFn", TF, TF, Tn, T0)
+
+OPCODE(138, OP_PROD, NULL, T0, T0, T0, T0)
+OPCODE(139, OP_PROD_IIN, "prod_iin", Ti, Ti, Tn, T0)
+OPCODE(140, OP_PROD_LLN, "prod_lln", Tl, Tl, Tn, T0)
+OPCODE(141, OP_PROD_FFN, "prod_ffn", Tf, Tf, Tn, T0)
+OPCODE(142, OP_PROD_DDN, "prod_ddn", Td, Td, Tn, T0)
+OPCODE(143, OP_PROD_CCN, "prod_ccn", Tc, Tc, Tn, T0)
+OPCODE(144, OP_PROD_ZZN, "prod_FFn", TF, TF, Tn, T0)
+
+OPCODE(145, OP_MIN, NULL, T0, T0, T0, T0)
+OPCODE(146, OP_MIN_IIN, "min_iin", Ti, Ti, Tn, T0)
+OPCODE(147, OP_MIN_LLN, "min_lln", Tl, Tl, Tn, T0)
+OPCODE(148, OP_MIN_FFN, "min_ffn", Tf, Tf, Tn, T0)
+OPCODE(149, OP_MIN_DDN, "min_ddn", Td, Td, Tn, T0)
+
+OPCODE(150, OP_MAX, NULL, T0, T0, T0, T0)
+OPCODE(151, OP_MAX_IIN, "max_iin", Ti, Ti, Tn, T0)
+OPCODE(152, OP_MAX_LLN, "max_lln", Tl, Tl, Tn, T0)
+OPCODE(153, OP_MAX_FFN, "max_ffn", Tf, Tf, Tn, T0)
+OPCODE(154, OP_MAX_DDN, "max_ddn", Td, Td, Tn, T0)
 
 /* Should be the last opcode */
-OPCODE(128, OP_END, NULL, T0, T0, T0, T0)
+OPCODE(155, OP_END, NULL, T0, T0, T0, T0)
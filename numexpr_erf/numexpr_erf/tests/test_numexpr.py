@@ -16,6 +16,7 @@ import platform
 import warnings
 from contextlib import contextmanager
 import subprocess
+import itertools
 
 import numpy as np
 from numpy import (
@@ -30,9 +31,9 @@ from numpy.testing import (assert_equal, assert_array_equal,
                            assert_array_almost_equal, assert_allclose)
 from numpy import shape, allclose, array_equal, ravel, isnan, isinf
 
-import numexpr
-from numexpr import E, NumExpr, evaluate, re_evaluate, validate, disassemble, use_vml
-from numexpr.expressions import ConstantNode
+import numexpr_erf as numexpr
+from numexpr_erf import E, NumExpr, evaluate, re_evaluate, validate, disassemble, use_vml
+from numexpr_erf.expressions import ConstantNode
 
 import unittest
 
@@ -320,7 +321,7 @@ class test_numexpr(TestCase):
         # if in the top-frame. This cannot be done inside `unittest` as it is always 
         # executing code in a child frame.
         script = r';'.join([
-                r"import numexpr as ne",
+                r"import numexpr_erf as ne",
                 r"a=10",
                 r"ne.evaluate('1')",
                 r"a += 1",
@@ -1096,6 +1097,461 @@ class test_zerodim(TestCase):
         assert_array_equal(r1, a1)
 
 
+class test_complex64(TestCase):
+    def setUp(self):
+        self.a = (arange(1, 101) + 1j * arange(100, 0, -1)).astype(np.complex64)
+        self.b = (arange(1, 101) - 0.5j * arange(100)).astype(np.complex64)
+        self.f = arange(100, dtype=np.float32)
+
+    def test_arithmetic(self):
+        local_dict = {'a': self.a, 'b': self.b, 'f': self.f}
+        for expr in ('a+b', 'a-b', 'a*b', 'a/b', '-a', 'a*2', 'a+f',
+                     'where(f>50, a, b)'):
+            x = eval(expr.replace('where', 'np.where'), {'np': np}, local_dict)
+            y = evaluate(expr, local_dict)
+            assert_equal(y.dtype, np.complex64)
+            assert_allclose(y, x, rtol=1e-6)
+
+    def test_functions(self):
+        a = self.a / 100
+        for func in ('sqrt', 'sin', 'cos', 'tan', 'arcsin', 'arccos', 'arctan',
+                     'sinh', 'cosh', 'tanh', 'arcsinh', 'arccosh', 'arctanh',
+                     'log', 'log1p', 'log10', 'exp', 'expm1', 'conj'):
+            x = getattr(np, func)(a)
+            y = evaluate('%s(a)' % func)
+            assert_equal(y.dtype, np.complex64)
+            assert_allclose(y, x, rtol=1e-5)
+        assert_allclose(evaluate('a**a'), a**a, rtol=1e-5)
+
+    def test_real_imag_complex(self):
+        a, f = self.a, self.f
+        for expr, x in (('real(a)', a.real), ('imag(a)', a.imag),
+                        ('a.real', a.real), ('a.imag', a.imag)):
+            y = evaluate(expr)
+            assert_equal(y.dtype, np.float32)
+            assert_array_equal(y, x)
+        y = evaluate('complex(f, 2*f)')
+        assert_equal(y.dtype, np.complex64)
+        assert_array_equal(y, f + 2j * f)
+
+    def test_reductions(self):
+        a = self.a / 100
+        y = evaluate('sum(a)')
+        assert_equal(y.dtype, np.complex64)
+        assert_allclose(y, a.sum(), rtol=1e-5)
+        y = evaluate('prod(1 + a/10)')
+        assert_equal(y.dtype, np.complex64)
+        assert_allclose(y, np.prod(1 + a / 10), rtol=1e-4)
+
+    def test_upcast(self):
+        local_dict = {'a': self.a, 'b': self.b.astype(np.complex128),
+                      'd': self.f.astype(np.float64)}
+        for expr in ('a+b', 'a*d', 'a+1.5', 'a*1j'):
+            x = eval(expr, {}, local_dict)
+            y = evaluate(expr, local_dict)
+            assert_equal(y.dtype, np.complex128)
+            assert_allclose(y, x, rtol=1e-6)
+
+    def test_out(self):
+        a = self.a
+        out = np.empty_like(a)
+        evaluate('a*a + 1', out=out)
+        assert_allclose(out, a * a + 1, rtol=1e-6)
+
+
+class test_parallel_reductions(TestCase):
+    exprs = ['sum(a**2)', 'sum(f)', 'sum(z)', 'prod(1 + a*1e-6)', 'min(a)',
+             'max(f)', 'sum(a, 0)', 'sum(f, 1)', 'max(a, 2)', 'prod(z, 0)']
+
+    def setUp(self):
+        self.nthreads = numexpr.get_num_threads()
+        rng = np.random.RandomState(0)
+        self.a = rng.standard_normal((3, 96, 128))
+        self.f = self.a.astype(np.float32)
+        self.z = (self.a + 0.5j * self.a[::-1]).astype(np.complex64)
+
+    def tearDown(self):
+        numexpr.set_num_threads(self.nthreads)
+
+    def _evaluate(self, nthreads):
+        numexpr.set_num_threads(nthreads)
+        local_dict = {'a': self.a, 'f': self.f, 'z': self.z}
+        return [evaluate(expr, local_dict) for expr in self.exprs]
+
+    def test_deterministic(self):
+        serial = self._evaluate(1)
+        for nthreads in (2, 3, 4):
+            for expr, x, y in zip(self.exprs, serial, self._evaluate(nthreads)):
+                assert_array_equal(y, x, err_msg=expr)
+
+    def test_against_numpy(self):
+        local_dict = {'a': self.a, 'f': self.f, 'z': self.z}
+        numpy_exprs = ['(a**2).sum()', 'f.sum()', 'z.sum()',
+                       'np.prod(1 + a*1e-6)', 'a.min()', 'f.max()', 'a.sum(0)',
+                       'f.sum(1)', 'a.max(2)', 'z.prod(0)']
+        expected = [eval(ex, {'np': np}, local_dict) for ex in numpy_exprs]
+        for expr, x, y in zip(self.exprs, expected, self._evaluate(4)):
+            assert_allclose(y, x, rtol=1e-5, atol=1e-4, err_msg=expr)
+
+    def test_float32_sum_accuracy(self):
+        # a naive float32 running sum of these is off in the fourth digit
+        numexpr.set_num_threads(3)
+        x = np.ones(2**22, dtype=np.float32) + np.float32(1e-4)
+        assert_allclose(evaluate('sum(x)'), x.astype(double).sum(), rtol=1e-6)
+
+    def test_out(self):
+        numexpr.set_num_threads(4)
+        a = self.a
+        out = np.zeros((), dtype=np.float32)
+        evaluate('sum(a)', out=out, casting='same_kind')
+        assert_allclose(out, a.sum(), rtol=1e-6)
+
+
+class test_multiple_outputs(TestCase):
+    cross = ['a1*b2 - a2*b1', 'a2*b0 - a0*b2', 'a0*b1 - a1*b0']
+
+    def setUp(self):
+        self.nthreads = numexpr.get_num_threads()
+        rng = np.random.RandomState(0)
+        self.a = rng.standard_normal((3, 1000, 20))
+        self.b = rng.standard_normal((3, 1000, 20))
+        self.local_dict = {'a%d' % i: self.a[i] for i in range(3)}
+        self.local_dict.update({'b%d' % i: self.b[i] for i in range(3)})
+        self.ref = np.cross(self.a, self.b, axis=0)
+
+    def tearDown(self):
+        numexpr.set_num_threads(self.nthreads)
+
+    def test_cross(self):
+        for nthreads in (1, 3):
+            numexpr.set_num_threads(nthreads)
+            res = evaluate(self.cross, self.local_dict)
+            assert_equal(type(res), tuple)
+            for x, y in zip(res, self.ref):
+                assert_allclose(x, y)
+
+    def test_out(self):
+        out = [np.empty_like(x) for x in self.ref]
+        res = evaluate(self.cross, self.local_dict, out=[out[0], None, out[2]])
+        assert res[0] is out[0] and res[2] is out[2]
+        for x, y in zip(res, self.ref):
+            assert_allclose(x, y)
+        self.assertRaises(ValueError, evaluate, self.cross, self.local_dict,
+                          out=out[:2])
+        self.assertRaises(ValueError, evaluate, self.cross, self.local_dict,
+                          out=[out[0], out[1], 0])
+
+    def test_single_output(self):
+        # a list of one expression is still a program with a tuple of outputs
+        x = arange(10.)
+        res = evaluate(['x+1'])
+        assert isinstance(res, tuple) and len(res) == 1
+        assert_array_equal(res[0], x + 1)
+        out = np.empty_like(x)
+        res = evaluate(('x+1',), out=[out])
+        assert isinstance(res, tuple) and res[0] is out
+        assert_array_equal(out, x + 1)
+        # also in place, and with a compiled program
+        res = evaluate(['x*2'], out=[x])
+        assert res[0] is x
+        assert_array_equal(x, 2 * arange(10.))
+        nex = NumExpr(['x-1'], [('x', double)])
+        assert nex.multiple and not NumExpr('x-1', [('x', double)]).multiple
+        res = nex(x, out=[None], ex_uses_vml=False)
+        assert isinstance(res, tuple)
+        assert_array_equal(res[0], x - 1)
+        local_dict = {'x': x}
+        self.assertRaises(ValueError, evaluate, ['x+1'], local_dict, out=out)
+        self.assertRaises(ValueError, evaluate, ['sum(x)'], local_dict)
+
+    def test_duplicate_out(self):
+        out = [np.empty_like(x) for x in self.ref]
+        for dup in ([out[0], out[1], out[0]], [out[2], out[2][:], out[1]]):
+            self.assertRaises(ValueError, evaluate, self.cross, self.local_dict,
+                              out=dup)
+        # unused slots may be left to allocate
+        res = evaluate(self.cross, self.local_dict, out=[None, out[1], None])
+        assert res[1] is out[1] and res[0] is not res[2]
+
+    def test_inplace(self):
+        # each output is also read by the later ones
+        for nthreads in (1, 3):
+            numexpr.set_num_threads(nthreads)
+            a = self.a.copy()
+            local_dict = dict(self.local_dict, a0=a[0], a1=a[1], a2=a[2])
+            evaluate(self.cross, local_dict, out=list(a))
+            assert_allclose(a, self.ref)
+
+    def test_common_subexpressions(self):
+        nex = NumExpr(['exp(x)*cos(y)', 'exp(x)*sin(y)', 'exp(x)', 'x'],
+                      [('x', double), ('y', double)])
+        assert_equal(nex.n_outputs, 4)
+        funcs = [op for op, _, _, _ in disassemble(nex) if op == b'func_ddn']
+        assert_equal(len(funcs), 3)
+        x = linspace(0, 1, 11)
+        res = nex(x, 2 * x, ex_uses_vml=False)
+        for r, y in zip(res, [exp(x) * cos(2 * x), exp(x) * sin(2 * x),
+                              exp(x), x]):
+            assert_allclose(r, y)
+
+    def test_shared_temporaries(self):
+        # exp(o) must stay alive until the last output that reads it, for
+        # every order the temporaries are allocated in
+        a = 'exp(o)*sqrt((1-t)*(1+t))'
+        ex = [a + '*real(sincos(p))', a + '*imag(sincos(p))', 'exp(o)*t']
+        o, t, p = np.random.RandomState(0).rand(3, 5000)
+        amplitude = np.exp(o) * np.sqrt(1 - t * t)
+        for perm in itertools.permutations(range(3)):
+            res = evaluate([ex[i] for i in perm])
+            ref = [amplitude * np.cos(p), amplitude * np.sin(p), np.exp(o) * t]
+            for r, i in zip(res, perm):
+                assert_allclose(r, ref[i])
+
+    def test_kinds_and_broadcasting(self):
+        x = arange(3.).reshape(3, 1)
+        y = arange(4, dtype=np.float32)
+        b, z, f = evaluate(['x > y', 'x*y', '2*y'])
+        assert_equal((b.dtype, z.dtype, f.dtype),
+                     (np.bool_, np.float64, np.float32))
+        assert_array_equal(b, x > y)
+        assert_array_equal(z, x * y)
+        assert_array_equal(f, np.broadcast_to(2 * y, (3, 4)))
+
+    def test_empty(self):
+        res = evaluate(['x', 'x > 0'], {'x': arange(0.)})
+        assert_equal([r.dtype for r in res], [np.float64, np.bool_])
+        assert_equal([r.shape for r in res], [(0,), (0,)])
+
+    def test_errors(self):
+        local_dict = {'x': arange(10.)}
+        self.assertRaises(ValueError, evaluate, ['sum(x)', 'x'], local_dict)
+        self.assertRaises(ValueError, evaluate, ['x', 1], local_dict)
+        self.assertRaises(ValueError, NumExpr, [])
+
+
+class test_index_functions(TestCase):
+    def setUp(self):
+        self.nthreads = numexpr.get_num_threads()
+
+    def tearDown(self):
+        numexpr.set_num_threads(self.nthreads)
+
+    def grid(self, n, dtype):
+        kx = np.fft.fftfreq(n, 1. / n).astype(dtype)
+        return np.meshgrid(kx, kx, kx[:n // 2 + 1], sparse=True,
+                           indexing='ij')
+
+    def test_fftfreq(self):
+        for n in (8, 9):
+            g = np.ones((n, n, n // 2 + 1))
+            local_dict = {'g': g, 'd': 0.5}
+            for axis, k in enumerate(np.meshgrid(
+                    np.fft.fftfreq(n, 0.5), np.fft.fftfreq(n, 0.5),
+                    np.fft.fftfreq(n, 0.5)[:n // 2 + 1], indexing='ij')):
+                res = evaluate('g*fftfreq(%d, %d, d)' % (axis, n), local_dict)
+                assert_array_equal(res, k)
+
+    def test_kmag2(self):
+        # identical to the sum of the broadcast wavenumbers
+        for dtype in (np.float32, np.float64):
+            for n in (32, 33):
+                kx, ky, kz = self.grid(n, dtype)
+                a = np.random.RandomState(0).rand(n, n, n // 2 + 1)
+                a = a.astype(dtype)
+                d = dtype(1. / n)
+                for nthreads in (1, 3):
+                    numexpr.set_num_threads(nthreads)
+                    res = evaluate('a*kmag2(%d, d)' % n)
+                    assert_equal(res.dtype, dtype)
+                    assert_array_equal(res, evaluate('a*(kx**2+ky**2+kz**2)'))
+                # spacing given per element
+                assert_array_equal(
+                    evaluate('a*kmag2(%d, dd)' % n,
+                             {'a': a, 'dd': np.full_like(a, d)}),
+                    evaluate('a*(kx**2+ky**2+kz**2)'))
+
+    def test_layout(self):
+        # C order regardless of the memory layout of the operands
+        n = 6
+        a = np.asfortranarray(np.ones((n, n)))
+        kx = np.fft.fftfreq(n, 1. / n)
+        assert_array_equal(evaluate('a*kmag2(%d, 1./%d)' % (n, n), {'a': a}),
+                           kx[:, None]**2 + kx**2)
+        out = np.empty((n, n))
+        evaluate('kmag2(%d, d)' % n, {'d': 1. / n}, out=out)
+        assert_array_equal(out, kx[:, None]**2 + kx**2)
+
+    def test_full_reduction(self):
+        n = 16
+        kx, ky, kz = self.grid(n, np.float64)
+        a = np.ones((n, n, n // 2 + 1))
+        assert_allclose(evaluate('sum(a*kmag2(%d, 1./%d))' % (n, n)),
+                        np.sum(a * (kx**2 + ky**2 + kz**2)))
+
+    def test_errors(self):
+        local_dict = {'a': np.ones((4, 4)), 'n': 4}
+        for ex, error in [('kmag2(n, a)', TypeError),
+                          ('kmag2(4.5, a)', TypeError),
+                          ('fftfreq(0, 4, a+1j)', TypeError),
+                          ('fftfreq(-1, 4, a)', ValueError),
+                          ('fftfreq(2, 4, a)', ValueError),
+                          ('kmag2(4, 1.)', ValueError),
+                          ('sum(kmag2(4, a), axis=0)', ValueError)]:
+            self.assertRaises(error, evaluate, ex, local_dict)
+
+
+class test_block_size(TestCase):
+    sizes = (1, 100, 4096, numexpr.MAX_BLOCK_SIZE)
+
+    def setUp(self):
+        self.nthreads = numexpr.get_num_threads()
+        rng = np.random.RandomState(0)
+        self.a = rng.standard_normal((24, 50, 60))
+        self.b = rng.standard_normal((24, 50, 60)).astype(np.float32)
+
+    def tearDown(self):
+        numexpr.set_num_threads(self.nthreads)
+
+    def _check(self, ex, signature, args, **kwargs):
+        ref = NumExpr(ex, signature)(*args, ex_uses_vml=False, **kwargs)
+        for block_size in self.sizes:
+            nex = NumExpr(ex, signature, block_size=block_size)
+            assert_equal(nex.block_size, block_size)
+            for nthreads in (1, 3):
+                res = nex(*args, num_threads=nthreads, ex_uses_vml=False,
+                          **kwargs)
+                assert_allclose(res, ref, rtol=1e-6, err_msg=ex)
+
+    def test_elementwise(self):
+        sig = [('a', double), ('b', float)]
+        for ex in ('2*a + 3.5*b', 'exp(a)*cos(b) + a*b', 'where(a > b, a, 1j*b)',
+                   'erf(a) + sqrt(b**2 + 1)'):
+            self._check(ex, sig, (self.a, self.b))
+
+    def test_multiple_outputs(self):
+        sig = [('a', double), ('b', float)]
+        ex = ['sin(a)*b', 'cos(a)*b + 1']
+        ref = NumExpr(ex, sig)(self.a, self.b, ex_uses_vml=False)
+        for block_size in self.sizes:
+            res = NumExpr(ex, sig, block_size=block_size)(
+                self.a, self.b, num_threads=3, ex_uses_vml=False)
+            for x, y in zip(res, ref):
+                assert_allclose(x, y)
+
+    def test_output_buffering(self):
+        # a strided output of another type goes through the output buffer
+        out = np.empty((60, 50, 24), dtype=np.float32).transpose()
+        self._check('a*b + 1', [('a', double), ('b', float)],
+                    (self.a, self.b), out=out, casting='same_kind')
+
+    def test_reductions(self):
+        for ex in ('sum(a*a)', 'max(a)', 'sum(a, 1)', 'prod(1 + a*1e-3, 2)'):
+            self._check(ex, [('a', double)], (self.a,))
+
+    def test_index_functions(self):
+        n = 64
+        a = np.ones((n, n, n // 2 + 1))
+        self._check('a*kmag2(%d, 1./%d)' % (n, n), [('a', double)], (a,))
+        self._check('a*fftfreq(1, %d, d)' % n, [('a', double), ('d', double)],
+                    (a, np.full_like(a, 1. / n)))
+
+    def test_errors(self):
+        for block_size in (0, numexpr.MAX_BLOCK_SIZE + 1):
+            self.assertRaises(ValueError, NumExpr, 'a+1', [('a', double)],
+                              block_size=block_size)
+
+
+class test_erf(TestCase):
+    # glibc's erf is correctly rounded to within 1 ulp, the inline
+    # approximations used without VML are documented to within 2 ulp
+    def _check(self, x, ulps):
+        import math
+        ref = array([math.erf(v) for v in x.astype(double)]).astype(x.dtype)
+        y = evaluate('erf(x)')
+        assert_equal(y.dtype, x.dtype)
+        tol = ulps * np.spacing(abs(ref))
+        assert alltrue(abs(y - ref) <= tol), abs((y - ref) / tol).max()
+
+    def test_double(self):
+        self._check(linspace(-7, 7, 100001), 2)
+
+    def test_float(self):
+        self._check(linspace(-5, 5, 100001).astype(np.float32), 2)
+
+    def test_special_values(self):
+        for dtype in (double, np.float32):
+            x = array([np.nan, np.inf, -np.inf, 0., -0., 1e-30], dtype=dtype)
+            y = evaluate('erf(x)', {'x': x})
+            assert isnan(y[0])
+            assert_array_equal(y[1:5], [1, -1, 0, 0])
+            assert_equal(np.signbit(y[4]), True)
+            assert_allclose(y[5], 2 / sqrt(np.pi) * 1e-30, rtol=1e-6)
+
+    def test_strided_and_inplace(self):
+        x = linspace(-3, 3, 3001)
+        y = evaluate('erf(x)')
+        assert_array_equal(evaluate('erf(x)', {'x': x[::3]}), y[::3])
+        evaluate('erf(x)', out=x)
+        assert_array_equal(x, y)
+
+
+class test_gaussian_transforms(TestCase):
+    def _check(self, name, x, ulps):
+        from scipy import special
+        ref = getattr(special, name)(x.astype(double)).astype(x.dtype)
+        y = evaluate('%s(x)' % name)
+        assert_equal(y.dtype, x.dtype)
+        tol = ulps * np.spacing(abs(ref))
+        assert alltrue(abs(y - ref) <= tol), abs((y - ref) / tol).max()
+
+    def test_ndtr(self):
+        # the error grows in the lower tail with the rounding of x/sqrt(2)
+        self._check('ndtr', linspace(-5, 10, 100001), 32)
+        self._check('ndtr', linspace(-37, -5, 10001), 600)
+        self._check('ndtr', linspace(-5, 6, 100001).astype(np.float32), 32)
+
+    def test_ndtri(self):
+        self._check('ndtri', linspace(0, 1, 100001)[1:-1], 8)
+        self._check('ndtri', np.logspace(-300, -1, 1001), 8)
+        self._check('ndtri', linspace(0, 1, 10001)[1:-1].astype(np.float32), 2)
+
+    def test_erfinv(self):
+        self._check('erfinv', linspace(-1, 1, 100001)[1:-1], 4)
+        self._check('erfinv', linspace(-1, 1, 10001)[1:-1].astype(np.float32), 2)
+
+    def test_special_values(self):
+        for dtype in (double, np.float32):
+            x = array([np.nan, np.inf, -np.inf, 0.], dtype=dtype)
+            assert_array_equal(evaluate('ndtr(x)', {'x': x}),
+                               [np.nan, 1, 0, 0.5])
+            p = array([np.nan, 0, 1, 0.5, -1, 2], dtype=dtype)
+            assert_array_equal(evaluate('ndtri(p)', {'p': p}),
+                               [np.nan, -np.inf, np.inf, 0, np.nan, np.nan])
+            x = array([np.nan, 0, 1, -1, 2], dtype=dtype)
+            assert_array_equal(evaluate('erfinv(x)', {'x': x}),
+                               [np.nan, 0, np.inf, -np.inf, np.nan])
+
+    def test_ndtr_inplace(self):
+        x = linspace(-12, 3, 3001)
+        y = evaluate('ndtr(x)')
+        evaluate('ndtr(x)', out=x)
+        assert_array_equal(x, y)
+
+    def test_sincos(self):
+        x = linspace(-10, 10, 1001)
+        z = evaluate('sincos(x)')
+        assert_equal(z.dtype, np.complex128)
+        assert_allclose(z, np.exp(1j * x), rtol=1e-15, atol=1e-15)
+        z = evaluate('sincos(x)', {'x': x.astype(np.float32)})
+        assert_equal(z.dtype, np.complex64)
+        assert_allclose(z, np.exp(1j * x), rtol=1e-6, atol=1e-6)
+        assert_allclose(evaluate('sincos(1.5)'), np.exp(1.5j))
+
+    def test_sincos_complex_argument(self):
+        self.assertRaises(TypeError, evaluate, 'sincos(z)',
+                          {'z': array([1j])})
+
+
 @contextmanager
 def _environment(key, value):
     old = os.environ.get(key)
@@ -1117,7 +1573,7 @@ class test_threading_config(TestCase):
                 "import os",
                 "if 'NUMEXPR_MAX_THREADS' in os.environ: os.environ.pop('NUMEXPR_MAX_THREADS')",
                 "if 'OMP_NUM_THREADS' in os.environ: os.environ.pop('OMP_NUM_THREADS')",
-                "import numexpr",
+                "import numexpr_erf as numexpr",
                 "assert(numexpr.nthreads <= 8)",
                 "exit(0)"])
         subprocess.check_call([sys.executable, '-c', script])
@@ -1128,7 +1584,7 @@ class test_threading_config(TestCase):
         script = '\n'.join([
                 "import os",
                 "os.environ['NUMEXPR_MAX_THREADS'] = '4'",
-                "import numexpr",
+                "import numexpr_erf as numexpr",
                 "assert(numexpr.MAX_THREADS == 4)",
                 "exit(0)"])
         subprocess.check_call([sys.executable, '-c', script])
@@ -1193,6 +1649,71 @@ class test_threading(TestCase):
         for t in threads:
             t.join()
 
+    def test_concurrent_program(self):
+        import threading
+
+        # one program run from several threads, each with threads of its own
+        nex = NumExpr('exp(a)*cos(b)', [('a', double), ('b', double)])
+        red = NumExpr('sum(a*b)', [('a', double), ('b', double)])
+        rng = np.random.RandomState(0)
+        a, b = rng.standard_normal((2, 200, 1000))
+        ref = (exp(a) * cos(b), red(a, b, num_threads=1, ex_uses_vml=False))
+        errors = []
+
+        def work(nthreads):
+            for _ in range(20):
+                res = (nex(a, b, num_threads=nthreads, ex_uses_vml=False),
+                       red(a, b, num_threads=nthreads, ex_uses_vml=False))
+                try:
+                    assert_allclose(res[0], ref[0])
+                    assert_array_equal(res[1], ref[1])
+                except AssertionError as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(n,))
+                   for n in (1, 2, 3, 2, 4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert_equal(errors, [])
+
+    def test_re_evaluate(self):
+        import threading
+
+        # the previous expression is the one of the calling thread
+        a = arange(10.)
+        barrier = threading.Barrier(2)
+        results = {}
+
+        def work(ex):
+            assert validate(ex, {'a': a}) is None
+            barrier.wait()
+            results[ex] = re_evaluate({'a': a})
+
+        threads = [threading.Thread(target=work, args=(ex,))
+                   for ex in ('a+1', 'a*2')]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert_array_equal(results['a+1'], a + 1)
+        assert_array_equal(results['a*2'], a * 2)
+
+    def test_num_threads(self):
+        nthreads = numexpr.set_num_threads(1)
+        try:
+            local_dict = {'a': arange(1e5)}
+            assert_array_equal(evaluate('a*a', local_dict, num_threads=3),
+                               local_dict['a']**2)
+            assert_equal(numexpr.get_num_threads(), 1)
+            self.assertRaises(ValueError, evaluate, 'a*a', local_dict,
+                              num_threads=0)
+            self.assertRaises(ValueError, evaluate, 'a*a', local_dict,
+                              num_threads=numexpr.MAX_THREADS + 1)
+        finally:
+            numexpr.set_num_threads(nthreads)
+
 
 # The worker function for the subprocess (needs to be here because Windows
 # has problems pickling nested functions with the multiprocess module :-/)
@@ -1228,7 +1749,7 @@ class test_subprocess(TestCase):
 def print_versions():
     """Print the versions of software that numexpr relies on."""
     # from pkg_resources import parse_version
-    from numexpr.cpuinfo import cpu
+    from numexpr_erf.cpuinfo import cpu
     import platform
 
     print('-=' * 38)
@@ -1302,6 +1823,13 @@ def suite():
         theSuite.addTest(
             unittest.makeSuite(test_irregular_stride))
         theSuite.addTest(unittest.makeSuite(test_zerodim))
+        theSuite.addTest(unittest.makeSuite(test_complex64))
+        theSuite.addTest(unittest.makeSuite(test_parallel_reductions))
+        theSuite.addTest(unittest.makeSuite(test_multiple_outputs))
+        theSuite.addTest(unittest.makeSuite(test_index_functions))
+        theSuite.addTest(unittest.makeSuite(test_block_size))
+        theSuite.addTest(unittest.makeSuite(test_erf))
+        theSuite.addTest(unittest.makeSuite(test_gaussian_transforms))
         theSuite.addTest(unittest.makeSuite(test_threading_config))
 
         # multiprocessing module is not supported on Hurd/kFreeBSD
@@ -106,6 +106,9 @@ def set_num_threads(nthreads):
 
     During initialization time NumExpr sets this number to the number
     of detected cores in the system (see `detect_number_of_cores()`).
+
+    This is the default for expressions evaluated without `num_threads`.
+    Changing it stops the idle worker threads.
     """
     old_nthreads = _set_num_threads(nthreads)
     return old_nthreads
@@ -222,6 +225,7 @@ class CacheDict(dict):
             # Remove a 10% of (arbitrary) elements from the cache
             entries_to_remove = self.maxentries // 10
             for k in list(self.keys())[:entries_to_remove]:
-                super(CacheDict, self).__delitem__(k)
+                # another thread may have removed it already
+                self.pop(k, None)
         super(CacheDict, self).__setitem__(key, value)
 